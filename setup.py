@@ -241,6 +241,9 @@ setup_args = {
     'install_requires'  :  ['radical.utils', 'pika', 'radical.pilot',
                             'pytest','hypothesis','sphinx'],
 
+    # radical.entk.utils.analytics and the benchmarks
+    'extras_require'    :  {'analytics': ['numpy']},
+
     'zip_safe'          : False,
 
     'data_files'        : [
@@ -6,7 +6,8 @@ from radical.entk.stage.stage import Stage
 from radical.entk.task.task import Task
 
 from radical.entk.appman.appmanager import AppManager
+from radical.entk.appman.resource_pool import ResourcePool
 import states
 
-# from radical.entk.utils.profiler import Profiler
+from radical.entk.utils.profiler import Profiler
 from utils import version_short, version_detail, version_base, version_branch
@@ -9,13 +9,21 @@ from radical.entk.stage.stage import Stage
 from radical.entk.task.task import Task
 from radical.entk.utils.prof_utils import write_session_description
 from radical.entk.utils.prof_utils import write_workflow
+from radical.entk.utils.logger import get_logger
+from radical.entk.utils.metrics import get_registry, read_metrics, SAMPLING_INTERVAL
+from radical.entk.utils.state_table import StateTable
+from radical.entk.utils.scaling import GROW, SHRINK
 from wfprocessor import WFprocessor
+from local_engine import LocalEngine
+from resource_pool import ResourcePool
 import time
 import os
 import Queue
 import pika
 import json
+import glob
 from threading import Thread, Event
+from contextlib import contextmanager
 from radical.entk import states
 
 
@@ -37,7 +45,17 @@ class AppManager(object):
         :rts: Specify RTS to use. Current options: 'mock', 'radical.pilot' (default if unspecified)
         :rmq_cleanup: Cleanup all queues created in RabbitMQ server for current execution (default is True)
         :rts_config: Configuration for the RTS, accepts {"sandbox_cleanup": True/False,"db_cleanup": True/False} when RTS is RP
+                     and the model of the task execution (runtime, failure_probability, seed) when RTS is mock
         :name: Name of the Application. It should be unique between executions. (default is randomly assigned)
+        :pool: ResourcePool whose resources, TaskManager and queues are shared with other AppManagers and runs. The
+               name of the pool is used as name of the Application.
+        :shared_state: Share the states of the workflow with the WFProcessor process in shared memory instead of
+                       synchronizing every state transition by messages (True/False)
+        :engine: Engine which executes the workflow: 'rmq' (default) runs the WFProcessor and the TaskManager in
+                 separate processes which communicate via RabbitMQ, 'local' runs them as coroutines in the process of
+                 the AppManager and does not need RabbitMQ (see `LocalEngine`)
+        :collapse_wfp: Run the WFProcessor as threads of the AppManager which work on its workflow, instead of a
+                       separate process which synchronizes every state transition by messages (True/False)
     """
 
     def __init__(self,
@@ -51,10 +69,23 @@ class AppManager(object):
                  rts=None,
                  rmq_cleanup=None,
                  rts_config=None,
-                 name=None):
-
-        # Create a session for each EnTK script execution
-        if name:
+                 name=None,
+                 pool=None,
+                 shared_state=None,
+                 engine=None,
+                 collapse_wfp=None):
+
+        if pool is not None and not isinstance(pool, ResourcePool):
+            raise TypeError(expected_type=ResourcePool, actual_type=type(pool))
+
+        # Create a session for each EnTK script execution, AppManagers which
+        # share a pool share its session
+        if pool is not None:
+            if name and name != pool.sid:
+                raise ValueError(obj='AppManager', attribute='name', expected_value=pool.sid, actual_value=name)
+            self._name = pool.sid
+            self._sid = pool.sid
+        elif name:
             self._name = name
             self._sid = name
         else:
@@ -63,13 +94,14 @@ class AppManager(object):
 
         self._read_config(config_path, hostname, port, reattempts,
                           resubmit_failed, autoterminate, write_workflow,
-                          rts, rmq_cleanup, rts_config)
+                          rts, rmq_cleanup, rts_config, shared_state, engine, collapse_wfp)
 
         # Create an uid + logger + profiles for AppManager, under the sid
         # namespace
         path = os.getcwd() + '/' + self._sid
+        self._path = path
         self._uid = ru.generate_id('appmanager.%(item_counter)04d', ru.ID_CUSTOM, namespace=self._sid)
-        self._logger = ru.Logger('radical.entk.%s' % self._uid, path=path, targets=['2','.'])
+        self._logger = get_logger('radical.entk.%s' % self._uid, path=path, targets=['2','.'])
         self._prof = ru.Profiler(name='radical.entk.%s' % self._uid, path=path)
         self._report = ru.Reporter(name='radical.entk.%s' % self._uid)
 
@@ -89,6 +121,11 @@ class AppManager(object):
         self._workflow = None
         self._cur_attempt = 1
         self._shared_data = list()
+        self._state_table = None
+
+        self._pool = pool
+        if self._pool is not None:
+            self._resource_manager = self._pool.resource_manager
 
         self._rmq_ping_interval = os.getenv('RMQ_PING_INTERVAL', 10)
 
@@ -98,7 +135,7 @@ class AppManager(object):
 
     def _read_config(self, config_path, hostname, port, reattempts,
                      resubmit_failed, autoterminate, write_workflow,
-                     rts, rmq_cleanup, rts_config):
+                     rts, rmq_cleanup, rts_config, shared_state=None, engine=None, collapse_wfp=None):
 
         if not config_path:
             config_path = os.path.dirname(os.path.abspath(__file__))
@@ -114,6 +151,9 @@ class AppManager(object):
         self._rts = rts if rts in ['radical.pilot', 'mock'] else str(config['rts'])
         self._rmq_cleanup = rmq_cleanup if rmq_cleanup is not None else config['rmq_cleanup']
         self._rts_config = rts_config if rts_config is not None else config['rts_config']
+        self._shared_state = shared_state if shared_state is not None else config.get('shared_state', False)
+        self._engine = engine if engine in ['rmq', 'local'] else str(config.get('engine', 'rmq'))
+        self._collapse_wfp = collapse_wfp if collapse_wfp is not None else config.get('collapse_wfp', False)
 
         self._num_pending_qs = config['pending_qs']
         self._num_completed_qs = config['completed_qs']
@@ -191,6 +231,18 @@ class AppManager(object):
     @resource_desc.setter
     def resource_desc(self, value):
 
+        # The resource of a pool is described once, by its first AppManager
+        if self._pool is not None and self._pool.resource_manager:
+
+            if value != self._pool.resource_manager._resource_desc:
+                raise ValueError(obj=self._uid,
+                                 attribute='resource_desc',
+                                 expected_value=self._pool.resource_manager._resource_desc,
+                                 actual_value=value)
+
+            self._resource_manager = self._pool.resource_manager
+            return
+
         if self._rts == 'radical.pilot':
             from radical.entk.execman.rp import ResourceManager
             self._resource_manager = ResourceManager(resource_desc=value,
@@ -199,13 +251,16 @@ class AppManager(object):
         elif self._rts == 'mock':
             from radical.entk.execman.mock import ResourceManager
             self._resource_manager = ResourceManager(resource_desc=value,
-                                                     sid=self._sid)
+                                                     sid=self._sid,
+                                                     rts_config=self._rts_config)
 
         self._report.info('Validating and assigning resource manager')
 
         if self._resource_manager._validate_resource_desc():
             self._resource_manager._populate()
             self._resource_manager.shared_data = self._shared_data
+            if self._pool is not None:
+                self._pool._set_resource_manager(self._resource_manager)
         else:
             self._logger.error('Could not validate resource description')
             raise
@@ -251,196 +306,66 @@ class AppManager(object):
         submission of all the tasks.
         """
 
+        if not self._workflow:
+            self._logger.error('No workflow assigned currently, please check your script')
+            raise MissingError(obj=self._uid, missing_attribute='workflow')
+
+        # Components created by previous runs of the pool are reused. A pool
+        # which is busy or closed is not touched.
+        if self._pool is not None:
+            self._pool._acquire(self)
+
+        if not self._resource_manager:
+
+            # Nothing was started, the pool is handed back as it was
+            if self._pool is not None:
+                self._pool._release(self)
+
+            self._logger.error(
+                'No resource manager assigned currently, please create and add a valid resource manager')
+            raise MissingError(obj=self._uid, missing_attribute='resource_manager')
+
         try:
 
             # Set None objects local to each run
             self._wfp = None
             self._sync_thread = None
+            self._state_table = None
             self._terminate_sync = Event()
             self._resubmit_failed = False
             self._cur_attempt = 1
 
-            if not self._workflow:
-                self._logger.error('No workflow assigned currently, please check your script')
-                raise MissingError(obj=self._uid, missing_attribute='workflow')
-
-            if not self._resource_manager:
-                self._logger.error(
-                    'No resource manager assigned currently, please create and add a valid resource manager')
-                raise MissingError(obj=self._uid, missing_attribute='resource_manager')
-
             self._prof.prof('amgr run started', uid=self._uid)
 
-            # Setup rabbitmq stuff
-            if not self._mqs_setup:
-
-                self._report.info('Setting up RabbitMQ system')
-                setup = self._setup_mqs()
-
-                if not setup:
-                    self._logger.error('RabbitMQ system not available')
-                    raise EnTKError("RabbitMQ setup failed")
-
-                self._mqs_setup = True
-
-                self._report.ok('>>ok\n')
-
-            # Create WFProcessor object
-            self._prof.prof('creating wfp obj', uid=self._uid)
-            self._wfp = WFprocessor(sid=self._sid,
-                                    workflow=self._workflow,
-                                    pending_queue=self._pending_queue,
-                                    completed_queue=self._completed_queue,
-                                    mq_hostname=self._mq_hostname,
-                                    port=self._port,
-                                    resubmit_failed=self._resubmit_failed)
-            self._wfp._initialize_workflow()
-            self._workflow = self._wfp.workflow
-
+            get_registry().start_exporter(path='%s/radical.entk.%s.prom' % (self._path, self._uid), name=self._uid)
 
             # Submit resource request if not resource allocation done till now or
-            # resubmit a new one if the old one has completed
-            if self._resource_manager:
-                res_alloc_state = self._resource_manager.get_resource_allocation_state()
-                if (not res_alloc_state) or (res_alloc_state in self._resource_manager.get_completed_states()):
-
-                    self._logger.info('Starting resource request submission')
-                    self._prof.prof('init rreq submission', uid=self._uid)
-                    self._resource_manager._submit_resource_request()
-
+            # resubmit a new one if the old one has completed. The request does
+            # not wait for the resource, so that it waits in the batch queue
+            # while the other components are set up.
+            res_alloc_state = self._resource_manager.get_resource_allocation_state()
+            if (not res_alloc_state) or (res_alloc_state in self._resource_manager.get_completed_states()):
+
+                self._logger.info('Starting resource request submission')
+                self._prof.prof('init rreq submission', uid=self._uid)
+                self._resource_manager._submit_resource_request()
+
+            if self._engine == 'local':
+                self._run_local()
             else:
+                self._run_components()
 
-                self._logger.error(
-                    'Cannot run without resource manager, please create and assign a resource manager')
-                raise EnTKError(text='Missing resource manager')
-
-            # Start synchronizer thread
-            if not self._sync_thread:
-                self._logger.info('Starting synchronizer thread')
-                self._sync_thread = Thread(target=self._synchronizer, name='synchronizer-thread')
-                self._prof.prof('starting synchronizer thread', uid=self._uid)
-                self._sync_thread.start()
-
-            # Start WFprocessor
-            self._logger.info('Starting WFProcessor process from AppManager')
-            self._wfp.start_processor()
-
-            self._report.ok('All components created\n')
-
-            # Create tmgr object only if it does not already exist
-            if self._rts == 'radical.pilot':
-                from radical.entk.execman.rp import TaskManager
-            elif self._rts == 'mock':
-                from radical.entk.execman.mock import TaskManager
-
-            if not self._task_manager:
-                self._prof.prof('creating tmgr obj', uid=self._uid)
-                self._task_manager = TaskManager(sid=self._sid,
-                                                 pending_queue=self._pending_queue,
-                                                 completed_queue=self._completed_queue,
-                                                 mq_hostname=self._mq_hostname,
-                                                 rmgr=self._resource_manager,
-                                                 port=self._port
-                                                 )
-                self._logger.info('Starting task manager process from AppManager')
-                self._task_manager.start_manager()
-                self._task_manager.start_heartbeat()
-
-            active_pipe_count = len(self._workflow)
-            finished_pipe_uids = []
-
-            # We wait till all pipelines of the workflow are marked
-            # complete
-            while ((active_pipe_count > 0) and
-                    (self._wfp.workflow_incomplete()) and
-                    (self._resource_manager.get_resource_allocation_state() not
-                     in self._resource_manager.get_completed_states())):
-
-                if active_pipe_count > 0:
-
-                    for pipe in self._workflow:
-
-                        with pipe.lock:
-
-                            if (pipe.completed) and (pipe.uid not in finished_pipe_uids):
-
-                                self._logger.info('Pipe %s completed' % pipe.uid)
-                                finished_pipe_uids.append(pipe.uid)
-                                active_pipe_count -= 1
-                                self._logger.info('Active pipes: %s' % active_pipe_count)
-
-                if (not self._sync_thread.is_alive()) and (self._cur_attempt <= self._reattempts):
-
-                    self._sync_thread = Thread(target=self._synchronizer,
-                                               name='synchronizer-thread')
-                    self._logger.info('Restarting synchronizer thread')
-                    self._prof.prof('restarting synchronizer', uid=self._uid)
-                    self._sync_thread.start()
-
-                    self._cur_attempt += 1
-
-                if (not self._wfp.check_processor()) and (self._cur_attempt <= self._reattempts):
-
-                    """
-                    If WFP dies, both child threads are also cleaned out.
-                    We simply recreate the wfp object with a copy of the workflow
-                    in the appmanager and start the processor.
-                    """
-
-                    self._prof.prof('recreating wfp obj', uid=self._uid)
-                    self._wfp = WFProcessor(
-                        sid=self._sid,
-                        workflow=self._workflow,
-                        pending_queue=self._pending_queue,
-                        completed_queue=self._completed_queue,
-                        mq_hostname=self._mq_hostname,
-                        port=self._port,
-                        resubmit_failed=self._resubmit_failed)
-
-                    self._logger.info('Restarting WFProcessor process from AppManager')
-                    self._wfp.start_processor()
-
-                    self._cur_attempt += 1
-
-                if (not self._task_manager.check_heartbeat()) and (self._cur_attempt <= self._reattempts):
-
-                    """
-                    If the tmgr process or heartbeat dies, we simply start a
-                    new process using the start_manager method. We do not
-                    need to create a new instance of the TaskManager object
-                    itself. We stop and start a new instance of the
-                    heartbeat thread as well.
-                    """
-                    self._prof.prof('restarting tmgr process and heartbeat', uid=self._uid)
-
-                    self._logger.info('Terminating heartbeat thread')
-                    self._task_manager.terminate_heartbeat()
-                    self._logger.info('Terminating tmgr process')
-                    self._task_manager.terminate_manager()
-                    self._logger.info('Restarting task manager process')
-                    self._task_manager.start_manager()
-                    self._logger.info('Restarting heartbeat thread')
-                    self._task_manager.start_heartbeat()
-
-                    self._cur_attempt += 1
-
-            self._prof.prof('start termination', uid=self._uid)
-
-            # Terminate threads in following order: wfp, helper, synchronizer
-            self._logger.info('Terminating WFprocessor')
-            self._wfp.terminate_processor()
-
-            self._logger.info('Terminating synchronizer thread')
-            self._terminate_sync.set()
-            self._sync_thread.join()
-            self._logger.info('Synchronizer thread terminated')
+            if self._pool is not None:
+                self._pool._release(self)
 
-            if self._autoterminate:
+            elif self._autoterminate:
                 self.resource_terminate()
 
             if self._write_workflow:
                 write_workflow(self._workflow, self._sid)
 
+            get_registry().stop_exporter()
+
             self._prof.prof('termination done', uid=self._uid)
 
         except KeyboardInterrupt:
@@ -466,9 +391,17 @@ class AppManager(object):
                 self._sync_thread.join()
                 self._logger.info('Synchronizer thread terminated')
 
+            if self._state_table:
+                self._state_table.close()
+
             if self._resource_manager:
                 self._resource_manager._terminate_resource_request()
 
+            if self._pool is not None:
+                self._pool._release(self, terminated=True)
+
+            get_registry().stop_exporter()
+
             self._prof.prof('termination done', uid=self._uid)
 
             raise KeyboardInterrupt
@@ -495,13 +428,254 @@ class AppManager(object):
                 self._sync_thread.join()
                 self._logger.info('Synchronizer thread terminated')
 
+            if self._state_table:
+                self._state_table.close()
+
             if self._resource_manager:
                 self._resource_manager._terminate_resource_request()
 
+            if self._pool is not None:
+                self._pool._release(self, terminated=True)
+
+            get_registry().stop_exporter()
+
             self._prof.prof('termination done', uid=self._uid)
             raise
 
     def resource_terminate(self):
+        """
+        **Purpose**: Terminate the TaskManager, the resource request and the queues. For an AppManager with a
+        ResourcePool, the pool is closed, which terminates the components shared by all its AppManagers.
+        """
+
+        if self._pool is not None:
+            self._pool.close()
+        else:
+            self._terminate_resources()
+
+    def metrics(self):
+        """
+        **Purpose**: Get the current metrics of all EnTK components of this
+        session. The metrics of the AppManager are read directly, the metrics
+        of the WFprocessor and TaskManager processes are read from the files
+        they export periodically to the session directory (see
+        `RADICAL_ENTK_METRICS_INTERVAL`).
+
+        :return: dictionary {component uid: {series: value}}, where series is
+                 the name of the metric including its labels in the Prometheus
+                 notation, e.g. 'entk_queue_depth{component="appmanager.0000",queue="pendingq-1"}'
+        """
+
+        ret = dict()
+
+        for path in glob.glob('%s/radical.entk.*.prom' % self._path):
+
+            component = os.path.basename(path)[len('radical.entk.'):-len('.prom')]
+
+            try:
+                ret[component] = read_metrics(path)
+            except (IOError, ValueError), ex:
+                self._logger.warning('Could not read metrics of %s: %s' % (component, ex))
+
+        ret[self._uid] = get_registry().snapshot()
+
+        return ret
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Private methods
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def _run_components(self):
+        """
+        **Purpose**: Execute the workflow with the WFprocessor process, the synchronizer thread and the TaskManager
+        process, which communicate via RabbitMQ. Returns once all pipelines completed or the resource allocation ended.
+        """
+
+        # Setup rabbitmq stuff
+        if not self._mqs_setup:
+
+            self._report.info('Setting up RabbitMQ system')
+            setup = self._setup_mqs()
+
+            if not setup:
+                self._logger.error('RabbitMQ system not available')
+                raise EnTKError("RabbitMQ setup failed")
+
+            self._mqs_setup = True
+
+            self._report.ok('>>ok\n')
+
+        # Create WFProcessor object
+        self._prof.prof('creating wfp obj', uid=self._uid)
+        self._wfp = WFprocessor(sid=self._sid,
+                                workflow=self._workflow,
+                                pending_queue=self._pending_queue,
+                                completed_queue=self._completed_queue,
+                                mq_hostname=self._mq_hostname,
+                                port=self._port,
+                                resubmit_failed=self._resubmit_failed,
+                                collapsed=self._collapse_wfp)
+        self._wfp._initialize_workflow()
+        self._workflow = self._wfp.workflow
+
+        # The state table can only be created once all objects have their
+        # uids, and has to exist before the WFprocessor process is forked. A
+        # collapsed WFprocessor changes the workflow of the AppManager itself
+        if self._shared_state and not self._collapse_wfp:
+            self._state_table = StateTable(self._workflow)
+            self._wfp._state_table = self._state_table
+            self._logger.info('Sharing the states of %s objects with the WFprocessor' % self._state_table.size)
+
+        # Start synchronizer thread
+        if not self._sync_thread:
+            self._logger.info('Starting synchronizer thread')
+            self._sync_thread = Thread(target=self._synchronizer, name='synchronizer-thread')
+            self._prof.prof('starting synchronizer thread', uid=self._uid)
+            self._sync_thread.start()
+
+        # Start WFprocessor
+        self._logger.info('Starting WFProcessor process from AppManager')
+        self._wfp.start_processor()
+
+        self._report.ok('All components created\n')
+
+        # Create tmgr object only if it does not already exist
+        if self._rts == 'radical.pilot':
+            from radical.entk.execman.rp import TaskManager
+        elif self._rts == 'mock':
+            from radical.entk.execman.mock import TaskManager
+
+        if not self._task_manager:
+            self._prof.prof('creating tmgr obj', uid=self._uid)
+            self._task_manager = TaskManager(sid=self._sid,
+                                             pending_queue=self._pending_queue,
+                                             completed_queue=self._completed_queue,
+                                             mq_hostname=self._mq_hostname,
+                                             rmgr=self._resource_manager,
+                                             port=self._port
+                                             )
+            self._logger.info('Starting task manager process from AppManager')
+            self._task_manager.start_manager()
+            self._task_manager.start_heartbeat()
+
+        active_pipe_count = len(self._workflow)
+        finished_pipe_uids = []
+
+        # We wait till all pipelines of the workflow are marked
+        # complete
+        while ((active_pipe_count > 0) and
+                (self._wfp.workflow_incomplete()) and
+                (self._resource_manager.get_resource_allocation_state() not
+                 in self._resource_manager.get_completed_states())):
+
+            if active_pipe_count > 0:
+
+                for pipe in self._workflow:
+
+                    with pipe.lock:
+
+                        if (pipe.completed) and (pipe.uid not in finished_pipe_uids):
+
+                            self._logger.info('Pipe %s completed' % pipe.uid)
+                            finished_pipe_uids.append(pipe.uid)
+                            active_pipe_count -= 1
+                            self._logger.info('Active pipes: %s' % active_pipe_count)
+
+            if (not self._sync_thread.is_alive()) and (self._cur_attempt <= self._reattempts):
+
+                self._sync_thread = Thread(target=self._synchronizer,
+                                           name='synchronizer-thread')
+                self._logger.info('Restarting synchronizer thread')
+                self._prof.prof('restarting synchronizer', uid=self._uid)
+                self._sync_thread.start()
+
+                self._cur_attempt += 1
+
+            if (not self._wfp.check_processor()) and (self._cur_attempt <= self._reattempts):
+
+                """
+                If WFP dies, both child threads are also cleaned out.
+                We simply recreate the wfp object with a copy of the workflow
+                in the appmanager and start the processor.
+                """
+
+                self._prof.prof('recreating wfp obj', uid=self._uid)
+                self._wfp = WFprocessor(
+                    sid=self._sid,
+                    workflow=self._workflow,
+                    pending_queue=self._pending_queue,
+                    completed_queue=self._completed_queue,
+                    mq_hostname=self._mq_hostname,
+                    port=self._port,
+                    resubmit_failed=self._resubmit_failed,
+                    state_table=self._state_table,
+                    collapsed=self._collapse_wfp)
+
+                self._logger.info('Restarting WFProcessor process from AppManager')
+                self._wfp.start_processor()
+
+                self._cur_attempt += 1
+
+            if (not self._task_manager.check_heartbeat()) and (self._cur_attempt <= self._reattempts):
+
+                """
+                If the tmgr process or heartbeat dies, we simply start a
+                new process using the start_manager method. We do not
+                need to create a new instance of the TaskManager object
+                itself. We stop and start a new instance of the
+                heartbeat thread as well.
+                """
+                self._prof.prof('restarting tmgr process and heartbeat', uid=self._uid)
+
+                self._logger.info('Terminating heartbeat thread')
+                self._task_manager.terminate_heartbeat()
+                self._logger.info('Terminating tmgr process')
+                self._task_manager.terminate_manager()
+                self._logger.info('Restarting task manager process')
+                self._task_manager.start_manager()
+                self._logger.info('Restarting heartbeat thread')
+                self._task_manager.start_heartbeat()
+
+                self._cur_attempt += 1
+
+        self._prof.prof('start termination', uid=self._uid)
+
+        # Terminate threads in following order: wfp, helper, synchronizer
+        self._logger.info('Terminating WFprocessor')
+        self._wfp.terminate_processor()
+
+        self._logger.info('Terminating synchronizer thread')
+        self._terminate_sync.set()
+        self._sync_thread.join()
+        self._logger.info('Synchronizer thread terminated')
+
+        if self._state_table:
+            self._state_table.close()
+
+    def _run_local(self):
+        """
+        **Purpose**: Execute the workflow with the local engine, which works on the workflow of the AppManager in this
+        thread and needs neither RabbitMQ nor further processes (see `LocalEngine`).
+        """
+
+        self._prof.prof('creating local engine', uid=self._uid)
+        self._wfp = LocalEngine(sid=self._sid,
+                                workflow=self._workflow,
+                                rmgr=self._resource_manager,
+                                rts=self._rts,
+                                resubmit_failed=self._resubmit_failed)
+        self._wfp._initialize_workflow()
+        self._workflow = self._wfp.workflow
+
+        self._report.ok('All components created\n')
+
+        self._logger.info('Executing workflow with the local engine')
+        self._wfp.run()
+
+        self._prof.prof('start termination', uid=self._uid)
+        self._wfp.terminate_processor()
+
+    def _terminate_resources(self):
 
         if self._task_manager:
             self._logger.info('Terminating task manager process')
@@ -514,22 +688,21 @@ class AppManager(object):
         if os.environ.get('RADICAL_ENTK_PROFILE', False):
             write_session_description(self)
 
-        if self._rmq_cleanup:
+        # No queues were set up for the local engine
+        if self._rmq_cleanup and self._pending_queue:
             self._cleanup_mqs()
 
         self._report.info('All components terminated\n')
 
-    # ------------------------------------------------------------------------------------------------------------------
-    # Private methods
-    # ------------------------------------------------------------------------------------------------------------------
-
     def _setup_mqs(self):
         """
         **Purpose**: Setup RabbitMQ system on the client side. We instantiate queue(s) 'pendingq-*' for communication
         between the enqueuer thread and the task manager process. We instantiate queue(s) 'completedq-*' for
         communication between the task manager and dequeuer thread. We instantiate queue 'sync-to-master' for
         communication from enqueuer/dequeuer/task_manager to the synchronizer thread. We instantiate queue
-        'sync-ack' for communication from synchronizer thread to enqueuer/dequeuer/task_manager.
+        'sync-ack' for communication from synchronizer thread to enqueuer/dequeuer/task_manager. We instantiate the
+        queues 'hb-request' and 'hb-response' for the heartbeat of the task manager. All queues are declared over
+        a single connection.
 
         Details: All queues are durable: Even if the RabbitMQ server goes down, the queues are saved to disk and can
         be retrieved. This also means that after an erroneous run the queues might still have unacknowledged messages
@@ -557,7 +730,9 @@ class AppManager(object):
                 '%s-sync-to-tmgr' % self._sid,
                 '%s-sync-to-cb' % self._sid,
                 '%s-sync-to-enq' % self._sid,
-                '%s-sync-to-deq' % self._sid
+                '%s-sync-to-deq' % self._sid,
+                '%s-hb-request' % self._sid,
+                '%s-hb-response' % self._sid
             ]
 
             for i in range(1, self._num_pending_qs + 1):
@@ -577,6 +752,8 @@ class AppManager(object):
                 f.write(q + '\n')
             f.close()
 
+            mq_connection.close()
+
             self._logger.debug('All exchanges and queues are setup')
             self._prof.prof('mqs setup done', uid=self._uid)
 
@@ -602,6 +779,8 @@ class AppManager(object):
             mq_channel.queue_delete(queue='%s-sync-to-cb' % self._sid)
             mq_channel.queue_delete(queue='%s-sync-to-enq' % self._sid)
             mq_channel.queue_delete(queue='%s-sync-to-deq' % self._sid)
+            mq_channel.queue_delete(queue='%s-hb-request' % self._sid)
+            mq_channel.queue_delete(queue='%s-hb-response' % self._sid)
 
             for i in range(1, self._num_pending_qs + 1):
                 queue_name = '%s-pendingq-%s' % (self._sid, i)
@@ -634,151 +813,195 @@ class AppManager(object):
 
             self._logger.info('synchronizer thread started')
 
-            def task_update(msg, reply_to, corr_id, mq_channel):
+            metrics = get_registry()
+            sync_queues = ['tmgr-to-sync', 'cb-to-sync', 'enq-to-sync', 'deq-to-sync']
+            sampled_queues = ['%s-%s' % (self._sid, q) for q in sync_queues] + \
+                self._pending_queue + self._completed_queue
+            scheduled = dict()
 
-                completed_task = Task()
-                completed_task.from_dict(msg['object'])
-                self._logger.info('Received %s with state %s' % (completed_task.uid, completed_task.state))
+            def update_metrics(msg, queue):
+
+                metrics.counter('entk_sync_messages_total',
+                                'Number of messages received by the synchronizer',
+                                labels={'queue': queue}).inc()
+
+                # Time between the SCHEDULED and SUBMITTED syncs of a task,
+                # i.e., the time tasks wait in the pending queue and the tmgr
+                uid = msg['object']['uid']
+                if msg['type'] == 'Task':
+                    if msg['object']['state'] == states.SCHEDULED:
+                        scheduled[uid] = time.time()
+                    elif msg['object']['state'] == states.SUBMITTED and uid in scheduled:
+                        metrics.histogram('entk_task_scheduled_to_submitted_seconds',
+                                          'Time between the synchronization of the SCHEDULED and SUBMITTED states')\
+                            .observe(time.time() - scheduled.pop(uid))
+
+                    # Tasks which end before they were submitted
+                    elif msg['object']['state'] in states.FINAL:
+                        scheduled.pop(uid, None)
+
+            # The broker closes the channel of a passive declare of a missing
+            # queue, the queues are sampled on their own channel
+            sampling = {'channel': None}
+
+            def sample_queues(mq_connection):
+
+                for queue in sampled_queues:
+
+                    try:
+
+                        if not sampling['channel'] or not sampling['channel'].is_open:
+                            sampling['channel'] = mq_connection.channel()
+
+                        depth = sampling['channel'].queue_declare(queue=queue, passive=True).method.message_count
+                        metrics.gauge('entk_queue_depth',
+                                      'Number of messages in a queue',
+                                      labels={'queue': queue[len(self._sid) + 1:]}).set(depth)
 
-                found_task = False
+                    except Exception, ex:
+                        self._logger.warning('Depth of queue %s not sampled: %s' % (queue, ex))
+                        sampling['channel'] = None
 
-                # Traverse the entire workflow to find the correct task
+            # Objects of the workflow by uid. The index is rebuilt when an uid
+            # is not found, i.e., when objects were added to the workflow by
+            # other means than the messages of the synchronizer
+            index = dict()
+
+            def build_index():
+
+                index.clear()
                 for pipe in self._workflow:
+                    index[pipe.uid] = pipe
+                    for stage in pipe.stages:
+                        if stage.uid:
+                            index[stage.uid] = stage
+                        for task in stage.tasks:
+                            if task.uid:
+                                index[task.uid] = task
 
-                    if not pipe.completed:
-                        if completed_task.parent_pipeline['uid'] == pipe.uid:
+                metrics.counter('entk_sync_index_builds_total',
+                                'Number of times the synchronizer indexed the workflow').inc()
 
-                            for stage in pipe.stages:
+            def find(uid):
 
-                                if completed_task.parent_stage['uid'] == stage.uid:
+                if uid and uid not in index:
+                    build_index()
 
-                                    for task in stage.tasks:
+                return index.get(uid)
 
-                                        if (completed_task.uid == task.uid)and(completed_task.state != task.state):
+            @contextmanager
+            def pipe_lock(pipe):
 
-                                            task.state = str(completed_task.state)
-                                            self._logger.debug('Found task %s with state %s' %
-                                                               (task.uid, task.state))
+                # A collapsed WFprocessor changes the same objects in threads of
+                # this process, under the lock of their pipeline
+                if self._collapse_wfp:
+                    with pipe.lock:
+                        yield
+                else:
+                    yield
 
-                                            if completed_task.path:
-                                                task.path = str(completed_task.path)
+            def reply(uid, state, reply_to, corr_id, mq_channel):
 
-                                            mq_channel.basic_publish(exchange='',
-                                                                     routing_key=reply_to,
-                                                                     properties=pika.BasicProperties(
-                                                                         correlation_id=corr_id),
-                                                                     body='%s-ack' % task.uid)
+                mq_channel.basic_publish(exchange='',
+                                         routing_key=reply_to,
+                                         properties=pika.BasicProperties(correlation_id=corr_id),
+                                         body='%s-ack' % uid)
 
-                                            self._prof.prof('publishing sync ack for obj with state %s' %
-                                                            msg['object']['state'],
-                                                            uid=msg['object']['uid']
-                                                            )
+                self._prof.prof('publishing sync ack for obj with state %s' % state, uid=uid)
 
-                                            mq_channel.basic_ack(delivery_tag=method_frame.delivery_tag)
-                                            self._report.ok('Update: ')
-                                            self._report.info('Task %s in state %s\n' % (task.uid, task.state))
+                mq_channel.basic_ack(delivery_tag=method_frame.delivery_tag)
 
-                                            found_task = True
+            def task_update(msg, reply_to, corr_id, mq_channel):
 
-                                    if not found_task:
+                completed_task = Task()
+                completed_task.from_dict(msg['object'])
+                self._logger.info('Received %s with state %s' % (completed_task.uid, completed_task.state))
 
-                                        # If there was a Stage update, but the Stage was not found in any of the Pipelines. This
-                                        # means that this was a Stage that was added during runtime and the AppManager does not
-                                        # know about it. The current solution is going to be: add it to the workflow object in the
-                                        # AppManager via the synchronizer.
+                pipe = find(completed_task.parent_pipeline['uid'])
+                stage = find(completed_task.parent_stage['uid'])
 
-                                        self._prof.prof('Adap: adding new task')
+                if not pipe or pipe.completed or not stage:
+                    return
 
-                                        self._logger.info('Adding new task %s to parent stage: %s' % (completed_task.uid,
-                                                                                                      stage.uid))
+                with pipe_lock(pipe):
 
-                                        stage.add_tasks(completed_task)
-                                        mq_channel.basic_publish(exchange='',
-                                                                 routing_key=reply_to,
-                                                                 properties=pika.BasicProperties(
-                                                                     correlation_id=corr_id),
-                                                                 body='%s-ack' % completed_task.uid)
+                    task = find(completed_task.uid)
 
-                                        self._prof.prof('Adap: added new task')
+                    if not task:
 
-                                        self._prof.prof('publishing sync ack for obj with state %s' %
-                                                        msg['object']['state'],
-                                                        uid=msg['object']['uid']
-                                                        )
+                        # If there was a Task update, but the Task was not found in the workflow. This means that
+                        # this was a Task that was added during runtime and the AppManager does not know about it.
+                        # The current solution is going to be: add it to the workflow object in the AppManager via
+                        # the synchronizer.
 
-                                        mq_channel.basic_ack(delivery_tag=method_frame.delivery_tag)
-                                        self._report.ok('Update: ')
-                                        self._report.info('Task %s in state %s\n' %
-                                                          (completed_task.uid, completed_task.state))
+                        self._prof.prof('Adap: adding new task')
 
-            def stage_update(msg, reply_to, corr_id, mq_channel):
+                        self._logger.info('Adding new task %s to parent stage: %s' % (completed_task.uid, stage.uid))
 
-                completed_stage = Stage()
-                completed_stage.from_dict(msg['object'])
-                self._logger.info('Received %s with state %s' % (completed_stage.uid, completed_stage.state))
+                        stage.add_tasks(completed_task)
+                        index[completed_task.uid] = completed_task
+                        task = completed_task
 
-                found_stage = False
+                        self._prof.prof('Adap: added new task')
 
-                # Traverse the entire workflow to find the correct stage
-                for pipe in self._workflow:
+                    elif completed_task.state != task.state:
 
-                    if not pipe.completed:
+                        task.state = str(completed_task.state)
+                        task._attempts = completed_task.attempts
+                        self._logger.debug('Found task %s with state %s' % (task.uid, task.state))
 
-                        if completed_stage.parent_pipeline['uid'] == pipe.uid:
-                            self._logger.info('Found parent pipeline: %s' % pipe.uid)
+                        if completed_task.path:
+                            task.path = str(completed_task.path)
 
-                            for stage in pipe.stages:
+                reply(task.uid, msg['object']['state'], reply_to, corr_id, mq_channel)
 
-                                if (completed_stage.uid == stage.uid)and(completed_stage.state != stage.state):
+                self._report.ok('Update: ')
+                self._report.info('Task %s in state %s\n' % (task.uid, task.state))
 
-                                    self._logger.debug('Found stage %s' % stage.uid)
+            def stage_update(msg, reply_to, corr_id, mq_channel):
 
-                                    stage.state = str(completed_stage.state)
+                completed_stage = Stage()
+                completed_stage.from_dict(msg['object'])
+                self._logger.info('Received %s with state %s' % (completed_stage.uid, completed_stage.state))
+
+                pipe = find(completed_stage.parent_pipeline['uid'])
 
-                                    mq_channel.basic_publish(exchange='',
-                                                             routing_key=reply_to,
-                                                             properties=pika.BasicProperties(
-                                                                 correlation_id=corr_id),
-                                                             body='%s-ack' % stage.uid)
+                if not pipe or pipe.completed:
+                    return
 
-                                    self._prof.prof('publishing sync ack for obj with state %s' %
-                                                    msg['object']['state'],
-                                                    uid=msg['object']['uid']
-                                                    )
+                self._logger.info('Found parent pipeline: %s' % pipe.uid)
 
-                                    mq_channel.basic_ack(delivery_tag=method_frame.delivery_tag)
-                                    self._report.ok('Update: ')
-                                    self._report.info('Stage %s in state %s\n' % (stage.uid, stage.state))
+                with pipe_lock(pipe):
 
-                                    found_stage = True
+                    stage = find(completed_stage.uid)
 
-                            if not found_stage:
+                    if not stage:
 
-                                # If there was a Stage update, but the Stage was not found in any of the Pipelines. This
-                                # means that this was a Stage that was added during runtime and the AppManager does not
-                                # know about it. The current solution is going to be: add it to the workflow object in the
-                                # AppManager via the synchronizer.
+                        # If there was a Stage update, but the Stage was not found in any of the Pipelines. This
+                        # means that this was a Stage that was added during runtime and the AppManager does not
+                        # know about it. The current solution is going to be: add it to the workflow object in the
+                        # AppManager via the synchronizer.
 
-                                self._prof.prof('Adap: adding new stage', uid=self._uid)
+                        self._prof.prof('Adap: adding new stage', uid=self._uid)
 
-                                self._logger.info('Adding new stage %s to parent pipeline: %s' % (completed_stage.uid,
-                                                                                                  pipe.uid))
+                        self._logger.info('Adding new stage %s to parent pipeline: %s' % (completed_stage.uid,
+                                                                                          pipe.uid))
 
-                                pipe.add_stages(completed_stage)
-                                mq_channel.basic_publish(exchange='',
-                                                         routing_key=reply_to,
-                                                         properties=pika.BasicProperties(
-                                                             correlation_id=corr_id),
-                                                         body='%s-ack' % completed_stage.uid)
+                        pipe.add_stages(completed_stage)
+                        index[completed_stage.uid] = completed_stage
+                        stage = completed_stage
 
-                                self._prof.prof('Adap: adding new stage', uid=self._uid)
+                        self._prof.prof('Adap: added new stage', uid=self._uid)
 
-                                self._prof.prof('publishing sync ack for obj with state %s' %
-                                                msg['object']['state'],
-                                                uid=msg['object']['uid']
-                                                )
+                    elif completed_stage.state != stage.state:
 
-                                mq_channel.basic_ack(delivery_tag=method_frame.delivery_tag)
+                        self._logger.debug('Found stage %s' % stage.uid)
+                        stage.state = str(completed_stage.state)
+
+                reply(stage.uid, msg['object']['state'], reply_to, corr_id, mq_channel)
+
+                self._report.ok('Update: ')
+                self._report.info('Stage %s in state %s\n' % (stage.uid, stage.state))
 
             def pipeline_update(msg, reply_to, corr_id, mq_channel):
 
@@ -787,51 +1010,152 @@ class AppManager(object):
 
                 self._logger.info('Received %s with state %s' % (completed_pipeline.uid, completed_pipeline.state))
 
-                # Traverse the entire workflow to find the correct pipeline
-                for pipe in self._workflow:
+                pipe = find(completed_pipeline.uid)
+
+                if not pipe or pipe.completed:
+                    return
+
+                with pipe_lock(pipe):
+
+                    if completed_pipeline.state != pipe.state:
+
+                        pipe.state = str(completed_pipeline.state)
+
+                        self._logger.info('Found pipeline %s, state %s, completed %s' % (pipe.uid,
+                                                                                         pipe.state,
+                                                                                         pipe.completed)
+                                          )
+
+                # Reply with ack msg to the sender
+                reply(pipe.uid, msg['object']['state'], reply_to, corr_id, mq_channel)
+
+                # Keep the assignment of the completed flag after sending the acknowledgment
+                # back. Otherwise the MainThread takes lock over the pipeline because of logging
+                # and profiling
+                if completed_pipeline.completed:
+                    pipe._completed_flag.set()
+                self._report.ok('Update: ')
+                self._report.info('Pipeline %s in state %s\n' % (pipe.uid, pipe.state))
+
+            def structure_update(msg, reply_to, corr_id, mq_channel):
+
+                # Stages and tasks which were added to a pipeline at runtime,
+                # added to the workflow in one step
+                pipe = find(msg['object']['uid'])
+
+                stages = list()
+                for stage_dict in msg['object']['stages']:
+                    stage = Stage()
+                    stage.from_dict(stage_dict)
+                    stages.append(stage)
+
+                tasks = dict()
+                for task_dict in msg['object']['tasks']:
+                    task = Task()
+                    task.from_dict(task_dict)
+                    tasks.setdefault(task.parent_stage['uid'], list()).append(task)
+
+                if not pipe:
+                    self._logger.error('Received new stages and tasks of unknown pipeline %s' % msg['object']['uid'])
+
+                else:
+
+                    self._prof.prof('Adap: adding new stages and tasks', uid=self._uid)
+
+                    with pipe_lock(pipe):
+
+                        if stages:
+                            pipe.add_stages(stages)
+                            for stage in stages:
+                                index[stage.uid] = stage
+
+                        for stage_uid, stage_tasks in tasks.items():
+
+                            stage = find(stage_uid)
 
-                    if not pipe.completed:
+                            if not stage:
+                                self._logger.error('Received new tasks of unknown stage %s' % stage_uid)
+                                continue
 
-                        if (completed_pipeline.uid == pipe.uid)and(completed_pipeline.state != pipe.state):
+                            stage.add_tasks(stage_tasks)
+                            for task in stage_tasks:
+                                index[task.uid] = task
 
-                            pipe.state = str(completed_pipeline.state)
+                    self._logger.info('Added %s stages and %s tasks to pipeline %s' %
+                                      (len(stages), sum([len(t) for t in tasks.values()]), pipe.uid))
+                    self._prof.prof('Adap: added new stages and tasks', uid=self._uid)
 
-                            self._logger.info('Found pipeline %s, state %s, completed %s' % (pipe.uid,
-                                                                                             pipe.state,
-                                                                                             pipe.completed)
-                                              )
+                # The sender waits for the ack in any case
+                reply(msg['object']['uid'], msg['object']['state'], reply_to, corr_id, mq_channel)
 
-                            # Reply with ack msg to the sender
-                            mq_channel.basic_publish(exchange='',
-                                                     routing_key=reply_to,
-                                                     properties=pika.BasicProperties(
-                                                         correlation_id=corr_id),
-                                                     body='%s-ack' % pipe.uid)
+            def pilot_update(msg, reply_to, corr_id, mq_channel):
 
-                            self._prof.prof('publishing sync ack for obj with state %s' %
-                                            msg['object']['state'],
-                                            uid=msg['object']['uid']
-                                            )
+                # Pilots which the tmgr added or retired in its process are
+                # recorded here, so that the resource request terminates them
+                # and a restarted tmgr knows them
+                pilot = msg['object']
 
-                            mq_channel.basic_ack(delivery_tag=method_frame.delivery_tag)
+                if pilot['state'] == GROW:
+                    self._resource_manager._pilot_added(pilot['uid'])
 
-                            # Keep the assignment of the completed flag after sending the acknowledgment
-                            # back. Otherwise the MainThread takes lock over the pipeline because of logging
-                            # and profiling
-                            if completed_pipeline.completed:
-                                pipe._completed_flag.set()
-                            self._report.ok('Update: ')
-                            self._report.info('Pipeline %s in state %s\n' % (pipe.uid, pipe.state))
+                elif pilot['state'] == SHRINK:
+                    self._resource_manager._retire_pilot(pilot['index'])
+
+                self._logger.info('Pilot %s (%s): %s' % (pilot['index'], pilot['uid'], pilot['state']))
+
+                reply(pilot['uid'], pilot['state'], reply_to, corr_id, mq_channel)
+
+            def table_update():
+
+                # Transitions which the WFprocessor wrote to the state table
+                # instead of sending them, replayed in their order
+                changes = self._state_table.changes()
+
+                for obj, state, exit_code, attempts, stamp in changes:
+
+                    if isinstance(obj, Task):
+
+                        obj._attempts = attempts
+                        if exit_code is not None:
+                            obj.exit_code = exit_code
+
+                        if state == states.SCHEDULED:
+                            scheduled[obj.uid] = stamp
+                        elif state in states.FINAL:
+                            scheduled.pop(obj.uid, None)
+
+                    if state != obj.state:
+
+                        obj.state = state
+                        self._logger.debug('%s in state %s from state table' % (obj.uid, state))
+                        self._report.ok('Update: ')
+                        self._report.info('%s %s in state %s\n' % (type(obj).__name__, obj.uid, state))
+
+                    if isinstance(obj, Pipeline) and state in states.FINAL:
+                        obj._completed_flag.set()
+
+                if changes:
+                    metrics.counter('entk_state_table_updates_total',
+                                    'Number of transitions read from the state table').inc(len(changes))
 
             mq_connection = pika.BlockingConnection(pika.ConnectionParameters(host=self._mq_hostname, port=self._port))
             mq_channel = mq_connection.channel()
 
             last = time.time()
+            last_sample = 0
 
             while not self._terminate_sync.is_set():
 
                 #-------------------------------------------------------------------------------------------------------
-                # Messages between tmgr Main thread and synchronizer -- only Task objects
+                # State transitions of the WFprocessor in shared memory -- Task, Stage or Pipeline
+
+                if self._state_table:
+                    table_update()
+
+                #-------------------------------------------------------------------------------------------------------
+
+                #-------------------------------------------------------------------------------------------------------
+                # Messages between tmgr Main thread and synchronizer -- Task objects and pilots added or retired
 
                 method_frame, props, body = mq_channel.basic_get(queue='%s-tmgr-to-sync' % self._sid)
 
@@ -839,7 +1163,7 @@ class AppManager(object):
                 The message received is a JSON object with the following structure:
 
                 msg = {
-                        'type': 'Pipeline'/'Stage'/'Task',
+                        'type': 'Task'/'Pilot',
                         'object': json/dict
                         }
                 """
@@ -847,6 +1171,11 @@ class AppManager(object):
                 if body:
 
                     msg = json.loads(body)
+                    update_metrics(msg, 'tmgr-to-sync')
+
+                    # Any message of the tmgr serves as its heartbeat
+                    if self._task_manager:
+                        self._task_manager.record_activity()
 
                     self._prof.prof('received obj with state %s for sync' %
                                     msg['object']['state'], uid=msg['object']['uid'])
@@ -857,6 +1186,9 @@ class AppManager(object):
                     if msg['type'] == 'Task':
                         task_update(msg, '%s-sync-to-tmgr' % self._sid, props.correlation_id, mq_channel)
 
+                    elif msg['type'] == 'Pilot':
+                        pilot_update(msg, '%s-sync-to-tmgr' % self._sid, props.correlation_id, mq_channel)
+
                 #-------------------------------------------------------------------------------------------------------
 
                 #-------------------------------------------------------------------------------------------------------
@@ -876,6 +1208,11 @@ class AppManager(object):
                 if body:
 
                     msg = json.loads(body)
+                    update_metrics(msg, 'cb-to-sync')
+
+                    # Any message of the tmgr serves as its heartbeat
+                    if self._task_manager:
+                        self._task_manager.record_activity()
 
                     self._prof.prof('received obj with state %s for sync' %
                                     msg['object']['state'], uid=msg['object']['uid'])
@@ -895,6 +1232,7 @@ class AppManager(object):
                 if body:
 
                     msg = json.loads(body)
+                    update_metrics(msg, 'enq-to-sync')
 
                     self._prof.prof('received obj with state %s for sync' %
                                     msg['object']['state'], uid=msg['object']['uid'])
@@ -913,12 +1251,14 @@ class AppManager(object):
                 #-------------------------------------------------------------------------------------------------------
 
                 #-------------------------------------------------------------------------------------------------------
-                # Messages between dequeue thread and synchronizer -- Task, Stage or Pipeline
+                # Messages between dequeue thread and synchronizer -- Task, Stage, Pipeline or Structure (the stages
+                # and tasks added to a pipeline at runtime)
                 method_frame, props, body = mq_channel.basic_get(queue='%s-deq-to-sync' % self._sid)
 
                 if body:
 
                     msg = json.loads(body)
+                    update_metrics(msg, 'deq-to-sync')
 
                     self._prof.prof('received obj with state %s for sync' %
                                     msg['object']['state'], uid=msg['object']['uid'])
@@ -934,6 +1274,9 @@ class AppManager(object):
 
                     elif msg['type'] == 'Pipeline':
                         pipeline_update(msg, '%s-sync-to-deq' % self._sid, props.correlation_id, mq_channel)
+
+                    elif msg['type'] == 'Structure':
+                        structure_update(msg, '%s-sync-to-deq' % self._sid, props.correlation_id, mq_channel)
                 #-------------------------------------------------------------------------------------------------------
 
                 # Appease pika cos it thinks the connection is dead
@@ -942,6 +1285,14 @@ class AppManager(object):
                     mq_connection.process_data_events()
                     last = now
 
+                if now - last_sample >= SAMPLING_INTERVAL:
+                    sample_queues(mq_connection)
+                    last_sample = now
+
+            # Transitions written after the last iteration
+            if self._state_table:
+                table_update()
+
             self._prof.prof('terminating synchronizer', uid=self._uid)
 
         except KeyboardInterrupt:
@@ -0,0 +1,448 @@
+__copyright__ = "Copyright 2017-2018, http://radical.rutgers.edu"
+__license__ = "MIT"
+
+import time
+import heapq
+import Queue
+import threading
+from collections import deque
+from radical.entk.exceptions import *
+from radical.entk import states
+from radical.entk.execman.mock.runtime_model import RuntimeModel
+from radical.entk.utils.init_transition import transition
+from radical.entk.utils.profiler import Profiler
+from radical.entk.utils.metrics import get_registry, SIZE_BUCKETS
+from radical.entk.utils.post_exec import PostExecPool
+from wfprocessor import WFprocessor
+
+
+# Time (in seconds) after which an idle engine checks the resource allocation
+IDLE_INTERVAL = 1.0
+
+
+class _MockExecutor(object):
+
+    """
+    Executes tasks on the synthetic resource of the mock RTS: tasks complete as soon as they are submitted or, if the
+    rts_config describes a runtime model (see `RuntimeModel`), after their runtime on `rmgr.cpus` cores.
+    """
+
+    def __init__(self, rmgr, completed):
+
+        self._model = RuntimeModel(rmgr._rts_config)
+        self._capacity = rmgr.cpus or 1
+        self._free = self._capacity
+        self._completed = completed
+
+        self._waiting = deque()
+        self._running = list()      # heap of (end time, seq, cores, task)
+        self._seq = 0
+
+    @property
+    def next_event(self):
+        """
+        :getter: Time at which the next running task ends, None if no task is running
+        """
+
+        if self._running:
+            return self._running[0][0]
+
+        return None
+
+    def submit(self, tasks):
+
+        if not self._model.enabled:
+            for task in tasks:
+                self._completed.put(task)
+            return
+
+        self._waiting.extend(tasks)
+        self.poll()
+
+    def poll(self):
+        """
+        **Purpose**: Complete the tasks whose runtime passed and start waiting tasks on the free cores.
+
+        :return: number of completed tasks
+        """
+
+        now = time.time()
+        count = 0
+
+        while self._running and self._running[0][0] <= now:
+
+            _, _, cores, task = heapq.heappop(self._running)
+            self._free += cores
+            self._completed.put(task)
+            count += 1
+
+        while self._waiting and self._model.cores(self._waiting[0], self._capacity) <= self._free:
+
+            task = self._waiting.popleft()
+            cores = self._model.cores(task, self._capacity)
+            self._free -= cores
+
+            task.exit_code = 1 if self._model.fails(task) else 0
+
+            heapq.heappush(self._running, (now + self._model.runtime(task), self._seq, cores, task))
+            self._seq += 1
+
+        return count
+
+    def close(self):
+        pass
+
+
+class _RPExecutor(object):
+
+    """
+    Submits tasks as units to the pilots of the ResourceManager. Units are completed by the callback thread of RADICAL
+    Pilot, which hands a Task with the exit code and path of the unit to the engine and wakes it up.
+    """
+
+    def __init__(self, rmgr, completed, wakeup, logger, prof):
+
+        # Only imported if RP is the RTS
+        import radical.pilot as rp
+        from radical.entk.execman.rp.task_processor import create_cud_from_task, create_task_from_cu
+        from radical.entk.execman.rp.task_processor import PlaceholderIndex
+
+        self._rp = rp
+        self._create_cud_from_task = create_cud_from_task
+        self._create_task_from_cu = create_task_from_cu
+
+        self._completed = completed
+        self._wakeup = wakeup
+        self._logger = logger
+        self._prof = prof
+
+        # Paths and units of the completed tasks, indexed by name
+        self._placeholders = PlaceholderIndex()
+
+        self._umgr = rp.UnitManager(session=rmgr._session)
+        self._umgr.add_pilots(rmgr.pilots)
+        self._umgr.register_callback(self._unit_state_cb)
+
+    @property
+    def next_event(self):
+        return None
+
+    def _unit_state_cb(self, unit, state):
+
+        try:
+
+            if unit.state in self._rp.FINAL:
+
+                task = self._create_task_from_cu(unit, self._prof)
+                self._placeholders.add(task, unit.uid)
+
+                self._completed.put(task)
+                self._wakeup.set()
+
+        except Exception, ex:
+            self._logger.exception('Error in RP callback thread: %s' % ex)
+
+    def submit(self, tasks):
+
+        cuds = [self._create_cud_from_task(task, self._placeholders, self._prof) for task in tasks]
+        self._umgr.submit_units(cuds)
+
+    def poll(self):
+        return 0
+
+    def close(self):
+
+        self._umgr.close()
+
+
+class LocalEngine(WFprocessor):
+
+    """
+    The local engine executes a workflow within the process of the AppManager, without RabbitMQ and without further
+    processes. Scheduling, submission, execution and processing of completed tasks are coroutines (generators) which
+    a loop on the thread of the AppManager advances in turn, on the workflow of the AppManager itself. Nothing has to be
+    synchronized, and the engine sleeps while none of the coroutines has work and no task completes.
+
+    It is meant for workflows which are executed from a single host. Tasks are executed by the mock RTS or by the
+    pilots of the RADICAL Pilot ResourceManager; multiple pilots are filled by the scheduler of RADICAL Pilot, the
+    placement and scaling policies of the resource description are not applied.
+
+    :Arguments:
+        :sid: (str) session id to be used by the profiler and loggers
+        :workflow: (set) workflow of the AppManager
+        :rmgr: (ResourceManager) resource manager whose resource executes the tasks
+        :rts: (str) 'mock' or 'radical.pilot'
+        :resubmit_failed: (bool) True if failed tasks need to be resubmitted automatically, used for tasks without
+                          a retry policy (see Task.retry and Stage.retry)
+    """
+
+    def __init__(self, sid, workflow, rmgr, rts, resubmit_failed):
+
+        super(LocalEngine, self).__init__(sid=sid,
+                                          workflow=workflow,
+                                          pending_queue=None,
+                                          completed_queue=None,
+                                          mq_hostname=None,
+                                          port=None,
+                                          resubmit_failed=resubmit_failed)
+
+        self._rmgr = rmgr
+        self._rts = rts
+
+        # Bulks of scheduled tasks, tasks completed by the RTS, and the
+        # submitted tasks (task uid -> task)
+        self._pending = deque()
+        self._completed = Queue.Queue()
+        self._submitted = dict()
+
+        self._executor = None
+        self._wakeup = threading.Event()
+        self._terminate = threading.Event()
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Private Methods
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def _enqueue_tasks(self, local_prof):
+        """
+        **Purpose**: Coroutine which schedules the tasks that are ready for execution. Yields True if it found tasks.
+        """
+
+        while True:
+
+            workload, scheduled_stages = self._schedule_tasks(None, local_prof)
+
+            if workload:
+
+                self._pending.append(workload)
+
+                metrics = get_registry()
+                metrics.histogram('entk_enqueue_batch_size',
+                                  'Number of tasks per message to the pending queue',
+                                  buckets=SIZE_BUCKETS).observe(len(workload))
+                metrics.counter('entk_tasks_enqueued_total',
+                                'Number of tasks pushed to the pending queue').inc(len(workload))
+
+            self._mark_scheduled(workload, scheduled_stages, None, local_prof)
+
+            yield bool(workload)
+
+    def _submit_tasks(self, local_prof):
+        """
+        **Purpose**: Coroutine which submits the scheduled tasks to the RTS once the resource is active. Yields True if
+        it submitted tasks.
+        """
+
+        while True:
+
+            if not self._pending or not self._rmgr.wait_for_resource(timeout=0):
+                yield False
+                continue
+
+            bulk = self._pending.popleft()
+
+            for task in bulk:
+
+                transition(obj=task,
+                           obj_type='Task',
+                           new_state=states.SUBMITTING,
+                           channel=None,
+                           queue=None,
+                           profiler=local_prof,
+                           logger=self._logger)
+
+                self._submitted[task.uid] = task
+
+            self._executor.submit(bulk)
+
+            for task in bulk:
+
+                transition(obj=task,
+                           obj_type='Task',
+                           new_state=states.SUBMITTED,
+                           channel=None,
+                           queue=None,
+                           profiler=local_prof,
+                           logger=self._logger)
+
+            metrics = get_registry()
+            metrics.histogram('entk_tmgr_batch_size',
+                              'Number of tasks per bulk submitted to the RTS',
+                              buckets=SIZE_BUCKETS).observe(len(bulk))
+            metrics.counter('entk_tasks_submitted_total',
+                            'Number of tasks submitted to the RTS').inc(len(bulk))
+
+            yield True
+
+    def _execute_tasks(self):
+        """
+        **Purpose**: Coroutine which advances the execution of the mock RTS. Yields True if tasks completed.
+        """
+
+        while True:
+            yield self._executor.poll() > 0
+
+    def _dequeue_tasks(self, local_prof):
+        """
+        **Purpose**: Coroutine which processes the tasks completed by the RTS and the finished post-exec callbacks.
+        Yields True if tasks or callbacks completed.
+        """
+
+        while True:
+
+            count = self._process_post_exec(None, local_prof)
+
+            while True:
+
+                try:
+                    completed_task = self._completed.get_nowait()
+                except Queue.Empty:
+                    break
+
+                count += 1
+
+                # The RP callback returns a new Task object
+                task = self._submitted.pop(completed_task.uid, None)
+
+                if not task:
+                    self._logger.warning('Unknown task %s completed' % completed_task.uid)
+                    continue
+
+                if completed_task is not task:
+
+                    task.exit_code = completed_task.exit_code
+
+                    if completed_task.path:
+                        task.path = str(completed_task.path)
+
+                transition(obj=task,
+                           obj_type='Task',
+                           new_state=states.COMPLETED,
+                           channel=None,
+                           queue=None,
+                           profiler=local_prof,
+                           logger=self._logger)
+
+                metrics = get_registry()
+                metrics.counter('entk_tasks_completed_total',
+                                'Number of tasks completed by the RTS').inc()
+                metrics.counter('entk_tasks_dequeued_total',
+                                'Number of tasks pulled from the completed queue').inc()
+
+                self._process_completed(task, None, local_prof)
+
+            yield count > 0
+
+    def _idle_timeout(self):
+        """
+        **Purpose**: Time until the next task of the mock RTS ends, a post-exec callback times out or the backoff delay
+        of a failed task passes.
+        """
+
+        deadlines = [time.time() + IDLE_INTERVAL]
+
+        if self._executor.next_event is not None:
+            deadlines.append(self._executor.next_event)
+
+        if self._post_exec_pool.next_deadline is not None:
+            deadlines.append(self._post_exec_pool.next_deadline)
+
+        if self._retry_at:
+            deadlines.append(min(self._retry_at.values()))
+
+        return max(min(deadlines) - time.time(), 0)
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Public Methods
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def run(self):
+        """
+        **Purpose**: Execute the workflow. This method blocks until all pipelines completed, the resource allocation
+        ended or the engine was terminated.
+        """
+
+        local_prof = None
+
+        try:
+
+            local_prof = Profiler(name='radical.entk.%s' % self._uid + '-proc', path=self._path)
+            local_prof.prof('local engine started', uid=self._uid)
+
+            if self._rts == 'radical.pilot':
+                self._executor = _RPExecutor(self._rmgr, self._completed, self._wakeup, self._logger, local_prof)
+            else:
+                self._executor = _MockExecutor(self._rmgr, self._completed)
+
+            # Finished callbacks wake the engine up
+            self._post_exec_pool = PostExecPool(workers=self._post_exec_workers,
+                                                timeout=self._post_exec_timeout,
+                                                notify=self._wakeup.set)
+
+            coroutines = [self._enqueue_tasks(local_prof),
+                          self._submit_tasks(local_prof),
+                          self._execute_tasks(),
+                          self._dequeue_tasks(local_prof)]
+
+            self._logger.info('Local engine started')
+
+            last = 0
+
+            while not self._terminate.is_set() and self.workflow_incomplete():
+
+                busy = False
+                for coroutine in coroutines:
+                    if next(coroutine):
+                        busy = True
+
+                if busy:
+                    continue
+
+                now = time.time()
+                if now - last >= IDLE_INTERVAL:
+
+                    if self._rmgr.get_resource_allocation_state() in self._rmgr.get_completed_states():
+                        self._logger.error('Resource allocation ended before the workflow completed')
+                        break
+
+                    last = now
+
+                # Tasks completed by the RP callback wake the engine up
+                self._wakeup.clear()
+                if self._completed.empty() and not self._post_exec_pool.has_results:
+                    self._wakeup.wait(self._idle_timeout())
+
+            self._logger.info('Local engine terminated')
+            local_prof.prof('local engine terminated', uid=self._uid)
+
+        except KeyboardInterrupt:
+
+            self._logger.error('Execution interrupted by user (you probably hit Ctrl+C), ' +
+                               'trying to terminate the local engine gracefully...')
+            raise KeyboardInterrupt
+
+        except Exception, ex:
+
+            self._logger.exception('Error in local engine: %s' % ex)
+            raise
+
+        finally:
+
+            if self._executor:
+                self._executor.close()
+
+            if self._post_exec_pool:
+                self._post_exec_pool.close()
+
+            if local_prof:
+                local_prof.close()
+
+    def terminate_processor(self):
+        """
+        **Purpose**: Stop the execution of the workflow by `run()`, if it runs in another thread.
+        """
+
+        self._terminate.set()
+        self._wakeup.set()
+
+        super(LocalEngine, self).terminate_processor()
@@ -0,0 +1,168 @@
+__copyright__ = "Copyright 2017-2018, http://radical.rutgers.edu"
+__license__ = "MIT"
+
+import os
+import threading
+import radical.utils as ru
+from radical.entk.exceptions import *
+from radical.entk.utils.logger import get_logger
+
+
+class ResourcePool(object):
+
+    """
+    A resource pool holds the components of EnTK which outlive a single
+    execution of a workflow: the ResourceManager with its session and pilots,
+    the TaskManager with its UnitManager, and the RabbitMQ queues. AppManagers
+    created with the same pool share these components, as do several calls of
+    `run()` of one AppManager, so that workflows which are executed back to
+    back do not pay for the creation of the session and the pilots again.
+
+    The AppManagers of a pool use the session id of the pool. Only one of them
+    can run at a time. The shared components are terminated once, when the pool
+    is closed (`autoterminate` of the AppManagers is ignored):
+
+        pool = ResourcePool()
+
+        amgr = AppManager(pool=pool)
+        amgr.resource_desc = {...}
+        amgr.workflow = [p1]
+        amgr.run()
+
+        amgr = AppManager(pool=pool)
+        amgr.workflow = [p2]
+        amgr.run()
+
+        pool.close()
+
+    :arguments:
+        :name: session id of the pool and its AppManagers (default is randomly assigned)
+    """
+
+    # Attributes of an AppManager which hold the shared components
+    _SHARED = ['_resource_manager', '_task_manager', '_pending_queue', '_completed_queue', '_mqs_setup']
+
+    def __init__(self, name=None):
+
+        if name and not isinstance(name, str):
+            raise TypeError(expected_type=str, actual_type=type(name))
+
+        self._sid = name or ru.generate_id('re.session', ru.ID_PRIVATE)
+        self._uid = ru.generate_id('resource_pool.%(item_counter)04d', ru.ID_CUSTOM, namespace=self._sid)
+        self._path = os.getcwd() + '/' + self._sid
+        self._logger = get_logger('radical.entk.%s' % self._uid, path=self._path, targets=['2', '.'])
+
+        self._lock = threading.Lock()
+        self._shared = dict()
+        self._running = None
+        self._last = None
+        self._closed = False
+
+        self._logger.info('Created resource pool %s' % self._uid)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Getter methods
+    # ------------------------------------------------------------------------------------------------------------------
+
+    @property
+    def sid(self):
+        """
+        :getter: Return the session id shared by the AppManagers of the pool
+        """
+        return self._sid
+
+    @property
+    def resource_manager(self):
+        """
+        :getter: Return the shared ResourceManager, None if no resource was described yet
+        """
+        return self._shared.get('_resource_manager')
+
+    @property
+    def closed(self):
+        """
+        :getter: Return True if the shared components were terminated
+        """
+        return self._closed
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Private methods
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def _set_resource_manager(self, rmgr):
+
+        with self._lock:
+
+            if self._closed:
+                raise EnTKError('Resource pool %s is closed' % self._sid)
+
+            self._shared['_resource_manager'] = rmgr
+
+    def _acquire(self, amgr):
+        """
+        **Purpose**: Hand the shared components to an AppManager which starts running.
+        """
+
+        with self._lock:
+
+            if self._closed:
+                raise EnTKError('Resource pool %s is closed' % self._sid)
+
+            if self._running:
+                raise EnTKError('Resource pool %s is used by %s' % (self._sid, self._running))
+
+            self._running = amgr._uid
+
+            for attr, value in self._shared.iteritems():
+                setattr(amgr, attr, value)
+
+        self._logger.info('%s acquired the pool' % amgr._uid)
+
+    def _release(self, amgr, terminated=False):
+        """
+        **Purpose**: Take the shared components back from an AppManager which stopped running. If the AppManager
+        terminated them because of an error, the pool is closed.
+        """
+
+        with self._lock:
+
+            self._shared = dict([(attr, getattr(amgr, attr)) for attr in self._SHARED])
+            self._running = None
+            self._last = amgr
+
+            if terminated:
+                self._closed = True
+
+        self._logger.info('%s released the pool' % amgr._uid)
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Public methods
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def close(self):
+        """
+        **Purpose**: Terminate the TaskManager, the resource request and the queues shared by the AppManagers of
+        the pool. Closing a closed pool has no effect.
+        """
+
+        with self._lock:
+
+            if self._closed:
+                return
+
+            if self._running:
+                raise EnTKError('Resource pool %s is used by %s' % (self._sid, self._running))
+
+            self._closed = True
+            amgr = self._last
+
+        self._logger.info('Closing resource pool')
+
+        if amgr:
+            amgr._terminate_resources()
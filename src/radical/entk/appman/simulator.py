@@ -0,0 +1,560 @@
+__copyright__ = "Copyright 2017-2018, http://radical.rutgers.edu"
+__license__ = "MIT"
+
+import os
+import time
+import heapq
+import itertools
+from collections import defaultdict
+import radical.utils as ru
+from radical.entk.exceptions import *
+from radical.entk import states, Pipeline
+from radical.entk.execman.mock.runtime_model import RuntimeModel
+from radical.entk.utils.profiler import Profiler
+from radical.entk.utils.logger import get_logger
+from radical.entk.utils.metrics import get_registry
+
+
+POLICIES = ['fifo', 'sjf', 'ljf']
+
+# Kinds of events on the virtual clock
+_SUBMIT = 0
+_END = 1
+_DEQUEUE = 2
+
+# States of a task from its completion to its final state
+_DONE = [states.DEQUEUEING, states.DEQUEUED, states.DONE]
+_FAILED = [states.DEQUEUEING, states.DEQUEUED, states.FAILED]
+_RESUBMIT = [states.DEQUEUEING, states.DEQUEUED, states.FAILED, states.INITIAL]
+
+
+class Simulator(object):
+
+    """
+    A Simulator executes a workflow against a virtual clock instead of a
+    runtime system. It takes the same Pipeline, Stage and Task objects, a
+    resource description and a runtime model (see `RuntimeModel`) and moves
+    the workflow through the same state transitions as the AppManager, the
+    WFprocessor and the TaskManager would, including the post-exec of stages.
+    There is no broker and no process or thread is spawned, so the makespan
+    and the utilization of large workflows can be estimated in seconds.
+
+    The transitions are recorded as 'advance' events of the wfprocessor and
+    task_manager profiles in the session directory, with the virtual time as
+    timestamp, if profiling is enabled (`RADICAL_ENTK_PROFILE`). Post-exec
+    functions can read the virtual time via `Simulator.now`.
+
+    :arguments:
+        :resource_desc: dictionary with the description of the resource, only
+                        'cpus' (number of cores, default 1) and 'walltime'
+                        (in minutes, optional) are used
+        :rts_config: model of the execution of the tasks, as accepted by
+                     `RuntimeModel`
+        :policy: order in which submitted tasks are started on the resource:
+                 'fifo' (submission order), 'sjf' (shortest runtime first) or
+                 'ljf' (longest runtime first)
+        :backfill: start tasks which fit on the free cores even if the next
+                   task according to the policy does not (True/False)
+        :overheads: latencies (in seconds) of EnTK, {'submission': time from
+                    the scheduling of a bulk of tasks to its submission,
+                    'completion': time from the completion of a task to its
+                    dequeuing}
+        :resubmit_failed: resubmit failed tasks (True/False)
+        :name: name of the session (default is randomly assigned)
+    """
+
+    def __init__(self,
+                 resource_desc=None,
+                 rts_config=None,
+                 policy='fifo',
+                 backfill=False,
+                 overheads=None,
+                 resubmit_failed=False,
+                 name=None):
+
+        resource_desc = resource_desc or dict()
+
+        if not isinstance(resource_desc, dict):
+            raise TypeError(expected_type=dict, actual_type=type(resource_desc))
+
+        if policy not in POLICIES:
+            raise ValueError(obj='simulator',
+                             attribute='policy',
+                             expected_value=POLICIES,
+                             actual_value=policy)
+
+        self._cpus = resource_desc.get('cpus', 1)
+        if not isinstance(self._cpus, int) or self._cpus < 1:
+            raise ValueError(obj='simulator',
+                             attribute='cpus',
+                             expected_value='positive integer',
+                             actual_value=self._cpus)
+
+        self._until = None
+        if resource_desc.get('walltime'):
+            self._until = resource_desc['walltime'] * 60.0
+
+        self._model = RuntimeModel(rts_config)
+        self._policy = policy
+        self._backfill = backfill
+        self._resubmit_failed = resubmit_failed
+
+        overheads = overheads or dict()
+        self._submission = float(overheads.get('submission', 0))
+        self._completion = float(overheads.get('completion', 0))
+
+        if name:
+            self._sid = name
+        else:
+            self._sid = ru.generate_id('re.session', ru.ID_PRIVATE)
+
+        self._uid = ru.generate_id('simulator.%(item_counter)04d', ru.ID_CUSTOM, namespace=self._sid)
+        self._path = os.getcwd() + '/' + self._sid
+
+        self._logger = get_logger('radical.entk.%s' % self._uid, path=self._path, targets=['2', '.'])
+
+        self._workflow = None
+        self._now = 0.0
+
+        self._logger.info('Created simulator object: %s' % self._uid)
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Getter functions
+    # ------------------------------------------------------------------------------------------------------------------
+
+    @property
+    def sid(self):
+        """
+        :getter: Returns the session id of the simulation
+        """
+        return self._sid
+
+    @property
+    def workflow(self):
+        """
+        :getter: Returns the workflow assigned to the simulator
+        :setter: Assign the workflow, a list or set of Pipelines
+        """
+        return self._workflow
+
+    @property
+    def now(self):
+        """
+        :getter: Returns the current virtual time (in seconds since the start
+                 of the simulation)
+        """
+        return self._now
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Setter functions
+    # ------------------------------------------------------------------------------------------------------------------
+
+    @workflow.setter
+    def workflow(self, workflow):
+
+        for p in workflow:
+            if not isinstance(p, Pipeline):
+                raise TypeError(expected_type=['Pipeline', 'set of Pipelines'], actual_type=type(p))
+
+            p._validate()
+
+        self._workflow = workflow
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Private methods
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def _assign_uids(self, pipe):
+        """
+        **Purpose**: Assign uids to a pipeline and the stages and tasks which do
+        not have one. Uids have the same format as the ones assigned by
+        `radical.utils`, but are generated locally, which is much cheaper for
+        large workflows.
+        """
+
+        if not pipe.uid:
+            pipe._uid = 'pipeline.%04d' % next(self._counters['pipeline'])
+
+        for stage in pipe.stages:
+            self._assign_stage_uids(pipe, stage)
+
+    def _assign_stage_uids(self, pipe, stage):
+
+        if stage.uid:
+            return
+
+        stage._uid = 'stage.%04d' % next(self._counters['stage'])
+        stage.parent_pipeline['uid'] = pipe.uid
+        stage.parent_pipeline['name'] = pipe.name
+
+        counter = self._counters['task']
+        for task in stage.tasks:
+            if not task.uid:
+                task._uid = 'task.%04d' % next(counter)
+
+        stage._pass_uid()
+
+    def _advance(self, obj, state, prof, tid, msg=None):
+        """
+        **Purpose**: Move an object to a new state and record the transition at
+        the current virtual time. The setters are bypassed, the states are
+        known to be valid.
+        """
+
+        obj._state = state
+        obj._state_history.append(state)
+
+        self._transitions[state] += 1
+
+        if prof:
+            prof.prof('advance', uid=obj._uid, state=state, msg=msg,
+                      timestamp=self._epoch + self._now, tid=tid)
+
+    def _advance_tasks(self, tasks, new_states, prof, tid):
+        """
+        **Purpose**: Move a list of tasks through one or more states at the
+        current virtual time.
+        """
+
+        for state in new_states:
+            self._transitions[state] += len(tasks)
+
+        state = new_states[-1]
+
+        for task in tasks:
+            task._state = state
+            task._state_history.extend(new_states)
+
+        if prof:
+            timestamp = self._epoch + self._now
+            for task in tasks:
+                for state in new_states:
+                    prof.prof('advance', uid=task._uid, state=state, msg=task._p_stage['uid'],
+                              timestamp=timestamp, tid=tid)
+
+    def _enqueue(self):
+        """
+        **Purpose**: Schedule the tasks of the current stage of all pipelines
+        which changed since the last call, as done by the enqueue thread of the
+        WFprocessor.
+        """
+
+        prof = self._wfp_prof
+        workload = list()
+        scheduled_stages = list()
+
+        for pipe in self._workflow:
+
+            if id(pipe) not in self._dirty:
+                continue
+
+            if pipe.completed or pipe.state == states.SUSPENDED or pipe.state in states.FINAL:
+                continue
+
+            if pipe.state == states.INITIAL:
+                self._advance(pipe, states.SCHEDULING, prof, 'enqueue-thread')
+
+            stage = pipe.stages[pipe.current_stage - 1]
+            self._assign_stage_uids(pipe, stage)
+
+            if stage.state not in [states.INITIAL, states.SCHEDULED]:
+                continue
+
+            # Only the tasks which were resubmitted have to be considered
+            # once the stage is scheduled
+            if stage.state == states.INITIAL:
+                self._advance(stage, states.SCHEDULING, prof, 'enqueue-thread', pipe.uid)
+                self._remaining[id(stage)] = len(stage.tasks)
+                candidates = stage.tasks
+            else:
+                candidates = self._resubmitted.pop(id(stage), [])
+
+            scheduled = False
+
+            for task in candidates:
+
+                if task._state == states.INITIAL or \
+                        (task._state == states.FAILED and self._resubmit_failed):
+
+                    self._parents[id(task)] = (pipe, stage)
+                    workload.append(task)
+                    scheduled = True
+
+            if scheduled:
+                scheduled_stages.append(stage)
+
+        self._dirty.clear()
+
+        self._advance_tasks(workload, [states.SCHEDULING, states.SCHEDULED], prof, 'enqueue-thread')
+
+        for stage in scheduled_stages:
+            self._advance(stage, states.SCHEDULED, prof, 'enqueue-thread', stage._p_pipeline['uid'])
+
+        if workload:
+
+            if self._submission:
+                self._push(self._now + self._submission, _SUBMIT, workload)
+            else:
+                self._submit(workload)
+
+    def _submit(self, workload):
+        """
+        **Purpose**: Submit a bulk of tasks to the resource, as done by the
+        TaskManager.
+        """
+
+        self._advance_tasks(workload, [states.SUBMITTING, states.SUBMITTED], self._tmgr_prof, 'rts-runner')
+
+        model = self._model
+        policy = self._policy
+        waiting = self._waiting
+        seq = self._seq
+        heappush = heapq.heappush
+
+        for task in workload:
+
+            cores = model.cores(task, self._cpus)
+            runtime = model.runtime(task)
+
+            if policy == 'sjf':
+                key = (runtime, next(seq))
+            elif policy == 'ljf':
+                key = (-runtime, next(seq))
+            else:
+                key = next(seq)
+
+            if cores not in waiting:
+                waiting[cores] = list()
+
+            heappush(waiting[cores], (key, runtime, task))
+
+        self._submitted += len(workload)
+
+    def _start(self):
+        """
+        **Purpose**: Start waiting tasks on the free cores according to the
+        policy. Waiting tasks are grouped by the number of cores they need, so
+        that only the head of each group has to be considered.
+        """
+
+        while self._free:
+
+            best = None
+            for cores, waiting in self._waiting.iteritems():
+
+                if not waiting:
+                    continue
+
+                if self._backfill and cores > self._free:
+                    continue
+
+                if best is None or waiting[0][0] < self._waiting[best][0][0]:
+                    best = cores
+
+            if best is None or best > self._free:
+                return
+
+            _, runtime, task = heapq.heappop(self._waiting[best])
+
+            self._free -= best
+
+            self._push(self._now + runtime, _END, (task, best, self._model.fails(task), self._now))
+
+    def _end(self, task, cores, failed, started):
+        """
+        **Purpose**: Complete a task on the resource, as done by the callback of
+        the TaskManager.
+        """
+
+        self._free += cores
+        self._busy += cores * (self._now - started)
+
+        task._exit_code = 1 if failed else 0
+        self._advance(task, states.COMPLETED, self._tmgr_prof, 'rts-executor', task._p_stage['uid'])
+
+        if self._completion:
+            self._push(self._now + self._completion, _DEQUEUE, task)
+        else:
+            self._dequeue(task)
+
+    def _dequeue(self, task):
+        """
+        **Purpose**: Update the workflow with a completed task, as done by the
+        dequeue thread of the WFprocessor, and execute the post-exec of the
+        stage if the stage is done.
+        """
+
+        prof = self._wfp_prof
+        pipe, stage = self._parents.pop(id(task))
+
+        if not task._exit_code:
+            self._done += 1
+            self._advance_tasks([task], _DONE, prof, 'dequeue-thread')
+
+        else:
+            self._failed += 1
+
+            if not self._resubmit_failed:
+                self._advance_tasks([task], _FAILED, prof, 'dequeue-thread')
+
+            else:
+                self._advance_tasks([task], _RESUBMIT, prof, 'dequeue-thread')
+                self._resubmitted.setdefault(id(stage), list()).append(task)
+                self._dirty.add(id(pipe))
+                return
+
+        self._remaining[id(stage)] -= 1
+        if self._remaining[id(stage)]:
+            return
+
+        del self._remaining[id(stage)]
+        self._advance(stage, states.DONE, prof, 'dequeue-thread', pipe.uid)
+
+        if stage.post_exec['condition']:
+
+            self._logger.info('Executing post-exec for stage %s' % stage.uid)
+
+            try:
+                if stage.post_exec['condition']():
+                    stage.post_exec['on_true']()
+                else:
+                    stage.post_exec['on_false']()
+
+            except Exception, ex:
+                self._logger.exception('Execution failed in post_exec of stage %s' % stage.uid)
+                raise
+
+            # The post-exec might have added stages, suspended or resumed any
+            # pipeline
+            self._dirty.update([id(p) for p in self._workflow])
+
+        pipe._increment_stage()
+
+        if pipe.completed:
+            self._advance(pipe, states.DONE, prof, 'dequeue-thread')
+        else:
+            self._dirty.add(id(pipe))
+
+    def _push(self, when, kind, payload):
+
+        heapq.heappush(self._events, (when, next(self._seq), kind, payload))
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Public methods
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def run(self):
+        """
+        **Purpose**: Simulate the execution of the workflow.
+
+        :return: dictionary with the results of the simulation:
+                 'makespan' (virtual time in seconds until the last task was
+                 dequeued), 'utilization' (fraction of the core time of the
+                 resource used by tasks), 'submitted', 'done' and 'failed'
+                 (number of task executions), 'incomplete' (True if the
+                 walltime was reached before the workflow completed) and
+                 'duration' (time in seconds the simulation took)
+        """
+
+        if not self._workflow:
+            raise MissingError(obj=self._uid, missing_attribute='workflow')
+
+        start = time.time()
+
+        self._logger.info('Starting simulation of workflow on %d cores' % self._cpus)
+
+        self._wfp_prof = Profiler(name='radical.entk.wfprocessor.0000-proc', path=self._path)
+        self._tmgr_prof = Profiler(name='radical.entk.task_manager.0000-proc', path=self._path)
+
+        if not self._wfp_prof.enabled:
+            self._wfp_prof = self._tmgr_prof = None
+
+        self._counters = dict([(kind, itertools.count()) for kind in ['pipeline', 'stage', 'task']])
+        self._seq = itertools.count()
+        self._events = list()
+        self._waiting = dict()
+        self._dirty = set()
+        self._remaining = dict()
+        self._resubmitted = dict()
+        self._parents = dict()
+        self._transitions = defaultdict(int)
+
+        self._epoch = start
+        self._now = 0.0
+        self._free = self._cpus
+        self._busy = 0.0
+        self._submitted = 0
+        self._done = 0
+        self._failed = 0
+
+        for pipe in self._workflow:
+            self._assign_uids(pipe)
+            self._dirty.add(id(pipe))
+
+        incomplete = False
+        events = self._events
+
+        try:
+
+            while True:
+
+                if self._dirty:
+                    self._enqueue()
+
+                self._start()
+
+                if not events:
+                    break
+
+                when, _, kind, payload = heapq.heappop(events)
+
+                if self._until is not None and when > self._until:
+
+                    self._now = self._until
+                    incomplete = True
+
+                    # Account for the tasks still running at the end of the
+                    # walltime
+                    for _, _, kind, payload in [(when, _, kind, payload)] + events:
+                        if kind == _END:
+                            self._busy += payload[1] * (self._now - payload[3])
+
+                    break
+
+                self._now = when
+
+                if kind == _END:
+                    self._end(*payload)
+                elif kind == _DEQUEUE:
+                    self._dequeue(payload)
+                else:
+                    self._submit(payload)
+
+        finally:
+
+            if self._wfp_prof:
+                self._wfp_prof.close()
+                self._tmgr_prof.close()
+
+        if not incomplete:
+            incomplete = not all([pipe.completed for pipe in self._workflow])
+
+        metrics = get_registry()
+        for state, count in self._transitions.iteritems():
+            metrics.counter('entk_simulated_transitions_total',
+                            'Number of state transitions in simulations',
+                            labels={'state': state}).inc(count)
+
+        makespan = self._now
+
+        results = {'makespan': makespan,
+                   'utilization': self._busy / (self._cpus * makespan) if makespan else 0.0,
+                   'submitted': self._submitted,
+                   'done': self._done,
+                   'failed': self._failed,
+                   'incomplete': incomplete,
+                   'duration': time.time() - start}
+
+        self._logger.info('Simulation done: %s' % results)
+
+        return results
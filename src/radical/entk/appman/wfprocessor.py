@@ -7,6 +7,12 @@ from radical.entk.exceptions import *
 from multiprocessing import Process, Event
 from radical.entk import states, Pipeline, Task
 from radical.entk.utils.init_transition import transition
+from radical.entk.utils.sync_initiator import sync_stages_with_master
+from radical.entk.utils.profiler import Profiler
+from radical.entk.utils.logger import get_logger
+from radical.entk.utils.metrics import get_registry, SIZE_BUCKETS
+from radical.entk.utils.retry import LEGACY_POLICY, can_retry, retry_delay
+from radical.entk.utils.post_exec import PostExecPool
 import time
 from time import sleep
 import json
@@ -32,7 +38,13 @@ class WFprocessor(object):
         :completed_queue: (list) queues to hold completed tasks
         :mq_hostname: (str) hostname where the RabbitMQ is alive
         :port: (int) port at which RabbitMQ can be accessed
-        :resubmit_failed: (bool) True if failed tasks need to be resubmitted automatically
+        :resubmit_failed: (bool) True if failed tasks need to be resubmitted automatically, used for tasks without
+                          a retry policy (see Task.retry and Stage.retry)
+        :state_table: (StateTable) shared memory table to which the states of the objects it knows are written
+                      instead of being sent to the AppManager, None to send all states
+        :collapsed: (bool) run the enqueue and dequeue threads in the process of the AppManager instead of a separate
+                    process. They work on the workflow of the AppManager, under the lock of each pipeline, and their
+                    transitions are not synchronized.
     """
 
     def __init__(self,
@@ -42,7 +54,9 @@ class WFprocessor(object):
                  completed_queue,
                  mq_hostname,
                  port,
-                 resubmit_failed):
+                 resubmit_failed,
+                 state_table=None,
+                 collapsed=False):
 
         # Mandatory arguments
         self._sid = sid
@@ -51,6 +65,8 @@ class WFprocessor(object):
         self._mq_hostname = mq_hostname
         self._port = port
         self._resubmit_failed = resubmit_failed
+        self._state_table = state_table
+        self._collapsed = collapsed
 
         # Assign validated workflow
         self._workflow = workflow
@@ -59,7 +75,7 @@ class WFprocessor(object):
         self._uid = ru.generate_id(
             'wfprocessor.%(item_counter)04d', ru.ID_CUSTOM, namespace=self._sid)
         self._path = os.getcwd() + '/' + self._sid
-        self._logger = ru.Logger('radical.entk.%s' %
+        self._logger = get_logger('radical.entk.%s' %
                                  self._uid, path=self._path, targets=['2', '.'])
         self._prof = ru.Profiler(name='radical.entk.%s' %
                                  self._uid + '-obj', path=self._path)
@@ -70,6 +86,17 @@ class WFprocessor(object):
         self._wfp_process = None
         self._rmq_ping_interval = os.getenv('RMQ_PING_INTERVAL', 10)
 
+        # Threads which execute the post-exec callbacks of the stages, created
+        # by the thread which processes the completed tasks. Callbacks may
+        # change globals and other pipelines, so by default they do not run
+        # concurrently
+        self._post_exec_workers = int(os.getenv('ENTK_POST_EXEC_WORKERS', 1))
+        self._post_exec_timeout = float(os.getenv('ENTK_POST_EXEC_TIMEOUT', 0))
+        self._post_exec_pool = None
+
+        # Earliest time at which failed tasks can be resubmitted (task uid -> time)
+        self._retry_at = dict()
+
         self._logger.info('Created WFProcessor object: %s' % self._uid)
         self._prof.prof('wfp obj created', uid=self._uid)
 
@@ -103,101 +130,434 @@ class WFprocessor(object):
                 'Fatal error while initializing workflow: %s' % ex)
             raise
 
-    def _enqueue(self, local_prof):
+    def _retry_policy(self, task, stage):
+        """
+        **Purpose**: Retry policy which applies to a failed task: its own policy, the policy of its stage or, if the
+        AppManager was created with resubmit_failed=True, unlimited resubmissions. None if the task is not resubmitted.
         """
-        **Purpose**: This is the function that is run in the enqueue thread. This function extracts Tasks from the
-        copy of workflow that exists in the WFprocessor object and pushes them to the queues in the pending_q list.
-        Since this thread works on the copy of the workflow, every state update to the Task, Stage and Pipeline is
-        communicated back to the AppManager (master process) via the 'sync_with_master' function that has dedicated
-        queues to communicate with the master.
 
-        Details: Termination condition of this thread is set by the wfp process.
+        if task.retry:
+            return task.retry
+
+        if stage.retry:
+            return stage.retry
+
+        if self._resubmit_failed:
+            return LEGACY_POLICY
+
+        return None
+
+    def _schedule_tasks(self, mq_channel, local_prof):
         """
+        **Purpose**: Iterate through all pipelines to collect the tasks of the stages that are pending scheduling and
+        move them to SCHEDULING. The tasks are communicated to the tmgr in bulk by the caller.
 
-        try:
+        :return: tuple of the list of tasks and the list of their stages
+        """
 
-            local_prof.prof('enqueue-thread started', uid=self._uid)
-            self._logger.info('enqueue-thread started')
+        workload = []
+        scheduled_stages = []
 
-            # Acquire a connection+channel to the rmq server
-            mq_connection = pika.BlockingConnection(
-                pika.ConnectionParameters(host=self._mq_hostname, port=self._port))
-            mq_channel = mq_connection.channel()
+        for pipe in self._workflow:
 
-            last = time.time()
-            while not self._enqueue_thread_terminate.is_set():
+            with pipe.lock:
 
-                '''
-                We iterate through all pipelines to collect tasks from
-                stages that are pending scheduling. Once collected, these tasks
-                will be communicated to the tmgr in bulk.
-                '''
+                if ((not pipe.completed) and (not pipe.state == states.SUSPENDED)):
 
-                workload = []
-                scheduled_stages = []
+                    # Test if the pipeline is already in the final state
+                    if pipe.state in states.FINAL:
+                        continue
 
-                for pipe in self._workflow:
+                    elif pipe.state == states.INITIAL:
 
-                    with pipe.lock:
+                        # Set state of pipeline to SCHEDULING if it is in INITIAL
+                        transition(obj=pipe,
+                                   obj_type='Pipeline',
+                                   new_state=states.SCHEDULING,
+                                   channel=mq_channel,
+                                   queue='%s-enq-to-sync' % self._sid,
+                                   profiler=local_prof,
+                                   logger=self._logger,
+                                   state_table=self._state_table)
+
+                    executable_stage = pipe.stages[pipe.current_stage - 1]
+
+                    if not executable_stage.uid:
+                        executable_stage.parent_pipeline['uid'] = pipe.uid
+                        executable_stage.parent_pipeline['name'] = pipe.name
+                        executable_stage._assign_uid(self._sid)
+
+                    if executable_stage.state in [states.INITIAL, states.SCHEDULED]:
+
+                        if executable_stage.state == states.INITIAL:
+
+                            transition(obj=executable_stage,
+                                       obj_type='Stage',
+                                       new_state=states.SCHEDULING,
+                                       channel=mq_channel,
+                                       queue='%s-enq-to-sync' % self._sid,
+                                       profiler=local_prof,
+                                       logger=self._logger,
+                                       state_table=self._state_table)
+
+                        executable_tasks = executable_stage.tasks
+                        now = time.time()
+
+                        for executable_task in executable_tasks:
+
+                            if executable_task.state == states.INITIAL:
 
-                        if ((not pipe.completed) and (not pipe.state == states.SUSPENDED)):
+                                # Failed tasks wait for the backoff delay of their retry policy
+                                if executable_task.uid in self._retry_at:
 
-                            # Test if the pipeline is already in the final state
-                            if pipe.state in states.FINAL:
-                                continue
+                                    if self._retry_at[executable_task.uid] > now:
+                                        continue
 
-                            elif pipe.state == states.INITIAL:
+                                    del self._retry_at[executable_task.uid]
 
-                                # Set state of pipeline to SCHEDULING if it is in INITIAL
-                                transition(obj=pipe,
-                                           obj_type='Pipeline',
+                                executable_task._attempts += 1
+
+                                # Set state of Tasks in current Stage to SCHEDULING
+                                transition(obj=executable_task,
+                                           obj_type='Task',
                                            new_state=states.SCHEDULING,
                                            channel=mq_channel,
                                            queue='%s-enq-to-sync' % self._sid,
                                            profiler=local_prof,
-                                           logger=self._logger)
+                                           logger=self._logger,
+                                           state_table=self._state_table)
+
+                                # task_as_dict = json.dumps(executable_task.to_dict())
+                                workload.append(executable_task)
+
+                                if executable_stage not in scheduled_stages:
+                                    scheduled_stages.append(
+                                        executable_stage)
+
+        return workload, scheduled_stages
+
+    def _mark_scheduled(self, workload, scheduled_stages, mq_channel, local_prof):
+        """
+        **Purpose**: Move the tasks which were handed to the tmgr and their stages to SCHEDULED.
+        """
+
+        for task in workload:
+
+            # Set state of Tasks in current Stage to SCHEDULED
+            transition(obj=task,
+                       obj_type='Task',
+                       new_state=states.SCHEDULED,
+                       channel=mq_channel,
+                       queue='%s-enq-to-sync' % self._sid,
+                       profiler=local_prof,
+                       logger=self._logger,
+                       state_table=self._state_table)
+
+            self._logger.debug(
+                'Task %s published to pending queue' % task.uid)
+
+        for executable_stage in scheduled_stages:
+
+            transition(obj=executable_stage,
+                       obj_type='Stage',
+                       new_state=states.SCHEDULED,
+                       channel=mq_channel,
+                       queue='%s-enq-to-sync' % self._sid,
+                       profiler=local_prof,
+                       logger=self._logger,
+                       state_table=self._state_table)
+
+    def _process_completed(self, completed_task, mq_channel, local_prof):
+        """
+        **Purpose**: Update the workflow with a task which completed execution: move the task to its final state or
+        resubmit it according to its retry policy, and move its stage and pipeline forward once they completed.
+        """
+
+        transition(obj=completed_task,
+                   obj_type='Task',
+                   new_state=states.DEQUEUEING,
+                   channel=mq_channel,
+                   queue='%s-deq-to-sync' % self._sid,
+                   profiler=local_prof,
+                   logger=self._logger,
+                   state_table=self._state_table)
+
+        # Traverse the entire workflow to find out the correct Task
+        for pipe in self._workflow:
+
+            with pipe.lock:
+
+                if ((not pipe.completed) and (not pipe.state == states.SUSPENDED)):
+
+                    if completed_task.parent_pipeline['uid'] == pipe.uid:
+
+                        self._logger.debug(
+                            'Found parent pipeline: %s' % pipe.uid)
+
+                        for stage in pipe.stages:
+
+                            if completed_task.parent_stage['uid'] == stage.uid:
+                                self._logger.debug(
+                                    'Found parent stage: %s' % (stage.uid))
+
+                                transition(obj=completed_task,
+                                           obj_type='Task',
+                                           new_state=states.DEQUEUED,
+                                           channel=mq_channel,
+                                           queue='%s-deq-to-sync' % self._sid,
+                                           profiler=local_prof,
+                                           logger=self._logger,
+                                           state_table=self._state_table)
+
+                                if not completed_task.exit_code:
+                                    completed_task.state = states.DONE
+                                else:
+                                    completed_task.state = states.FAILED
 
-                            executable_stage = pipe.stages[pipe.current_stage - 1]
+                                for task in stage.tasks:
 
-                            if not executable_stage.uid:
-                                executable_stage.parent_pipeline['uid'] = pipe.uid
-                                executable_stage.parent_pipeline['name'] = pipe.name
-                                executable_stage._assign_uid(self._sid)
+                                    if task.uid == completed_task.uid:
+                                        task.state = str(
+                                            completed_task.state)
 
-                            if executable_stage.state in [states.INITIAL, states.SCHEDULED]:
+                                        policy = None
+                                        if task.state == states.FAILED:
+                                            policy = self._retry_policy(task, stage)
 
-                                if executable_stage.state == states.INITIAL:
+                                        if policy and can_retry(policy, task.attempts):
 
-                                    transition(obj=executable_stage,
-                                               obj_type='Stage',
-                                               new_state=states.SCHEDULING,
-                                               channel=mq_channel,
-                                               queue='%s-enq-to-sync' % self._sid,
-                                               profiler=local_prof,
-                                               logger=self._logger)
+                                            delay = retry_delay(policy, task.attempts)
+                                            if delay:
+                                                self._retry_at[task.uid] = time.time() + delay
 
-                                executable_tasks = executable_stage.tasks
+                                            self._logger.info('Task %s failed in attempt %s, ' % (
+                                                task.uid, task.attempts) +
+                                                'resubmitting in %.1fs' % delay)
 
-                                for executable_task in executable_tasks:
+                                            get_registry().counter(
+                                                'entk_tasks_retried_total',
+                                                'Number of failed tasks resubmitted').inc()
 
-                                    if (executable_task.state == states.INITIAL)or \
-                                            ((executable_task.state == states.FAILED)and(self._resubmit_failed)):
+                                            task.state = states.INITIAL
 
-                                        # Set state of Tasks in current Stage to SCHEDULING
-                                        transition(obj=executable_task,
+                                        transition(obj=task,
                                                    obj_type='Task',
-                                                   new_state=states.SCHEDULING,
+                                                   new_state=task.state,
                                                    channel=mq_channel,
-                                                   queue='%s-enq-to-sync' % self._sid,
+                                                   queue='%s-deq-to-sync' % self._sid,
                                                    profiler=local_prof,
-                                                   logger=self._logger)
+                                                   logger=self._logger,
+                                                   state_table=self._state_table)
+
+                                        max_failures = None
+                                        if stage.retry:
+                                            max_failures = stage.retry['max_failures']
+
+                                        if task.state == states.FAILED and max_failures and \
+                                                len([t for t in stage.tasks
+                                                     if t.state == states.FAILED]) >= max_failures:
+
+                                            self._logger.error('Stage %s failed, ' % stage.uid +
+                                                               '%s tasks failed permanently' %
+                                                               max_failures)
+
+                                            transition(obj=stage,
+                                                       obj_type='Stage',
+                                                       new_state=states.FAILED,
+                                                       channel=mq_channel,
+                                                       queue='%s-deq-to-sync' % self._sid,
+                                                       profiler=local_prof,
+                                                       logger=self._logger,
+                                                       state_table=self._state_table)
+
+                                            # The remaining stages of the pipeline are not executed
+                                            pipe._completed_flag.set()
+
+                                            transition(obj=pipe,
+                                                       obj_type='Pipeline',
+                                                       new_state=states.FAILED,
+                                                       channel=mq_channel,
+                                                       queue='%s-deq-to-sync' % self._sid,
+                                                       profiler=local_prof,
+                                                       logger=self._logger,
+                                                       state_table=self._state_table)
+
+                                        elif stage._check_stage_complete():
+
+                                            transition(obj=stage,
+                                                       obj_type='Stage',
+                                                       new_state=states.DONE,
+                                                       channel=mq_channel,
+                                                       queue='%s-deq-to-sync' % self._sid,
+                                                       profiler=local_prof,
+                                                       logger=self._logger,
+                                                       state_table=self._state_table)
+
+                                            # Check if Stage has a post-exec that needs to be
+                                            # executed. The pipeline advances once it finished,
+                                            # see _process_post_exec
+
+                                            if stage.post_exec['condition']:
+
+                                                self._logger.info(
+                                                    'Executing post-exec for stage %s' % stage.uid)
+                                                self._prof.prof('Adap: executing post-exec',
+                                                                uid=self._uid)
+
+                                                self._post_exec_pool.submit(pipe, stage)
+
+                                            else:
+                                                self._advance_pipeline(pipe, mq_channel, local_prof)
+
+                                        # Found the task and processed it -- no more iterations needed
+
+                                        break
+
+                                # Found the stage and processed it -- no more iterations neeeded
+                                break
+
+                        # Found the pipeline and processed it -- no more iterations neeeded
+                        break
+
+    def _advance_pipeline(self, pipe, mq_channel, local_prof):
+        """
+        **Purpose**: Move the pipeline to its next stage once its current stage is done, or to DONE if it has none.
+        """
+
+        pipe._increment_stage()
+
+        if pipe.completed:
+
+            transition(obj=pipe,
+                       obj_type='Pipeline',
+                       new_state=states.DONE,
+                       channel=mq_channel,
+                       queue='%s-deq-to-sync' % self._sid,
+                       profiler=local_prof,
+                       logger=self._logger,
+                       state_table=self._state_table)
+
+    def _assign_new_uids(self, pipe):
+        """
+        **Purpose**: Assign uids to the stages which were added to a pipeline at runtime, and to the tasks which were
+        added to its remaining stages. Objects added to other pipelines get their uids when they are scheduled.
+
+        :return: tuple of the list of new stages and the list of new tasks of the other stages
+        """
+
+        new_stages = list()
+        new_tasks = list()
+
+        for stage in pipe.stages[pipe.current_stage:]:
+
+            if not stage.uid:
+
+                stage.parent_pipeline['uid'] = pipe.uid
+                stage.parent_pipeline['name'] = pipe.name
+                stage._assign_uid(self._sid)
+                new_stages.append(stage)
+
+                continue
+
+            for task in stage.tasks:
+
+                if not task.uid:
+
+                    task.parent_stage['uid'] = stage.uid
+                    task.parent_stage['name'] = stage.name
+                    task.parent_pipeline['uid'] = pipe.uid
+                    task.parent_pipeline['name'] = pipe.name
+                    task._assign_uid(self._sid)
+                    new_tasks.append(task)
+
+        return new_stages, new_tasks
+
+    def _process_post_exec(self, mq_channel, local_prof):
+        """
+        **Purpose**: Advance the pipelines whose post-exec callbacks finished. Pipelines whose callbacks raised an
+        exception or timed out are failed, the other pipelines are not affected.
+
+        :return: number of finished callbacks
+        """
+
+        results = self._post_exec_pool.results()
+
+        for pipe, stage, error in results:
+
+            with pipe.lock:
+
+                if error:
+
+                    self._logger.error('Execution failed in post_exec of stage %s: %s' % (stage.uid, error))
+
+                    pipe._completed_flag.set()
 
-                                        # task_as_dict = json.dumps(executable_task.to_dict())
-                                        workload.append(executable_task)
+                    transition(obj=pipe,
+                               obj_type='Pipeline',
+                               new_state=states.FAILED,
+                               channel=mq_channel,
+                               queue='%s-deq-to-sync' % self._sid,
+                               profiler=local_prof,
+                               logger=self._logger,
+                               state_table=self._state_table)
 
-                                        if executable_stage not in scheduled_stages:
-                                            scheduled_stages.append(
-                                                executable_stage)
+                    continue
+
+                self._logger.info('Post-exec executed for stage %s' % stage.uid)
+                self._prof.prof('Adap: post-exec executed', uid=self._uid)
+
+                # Stages and tasks added by the callback are communicated in
+                # one message instead of one message per object
+                new_stages, new_tasks = self._assign_new_uids(pipe)
+
+                if (new_stages or new_tasks) and mq_channel is not None:
+
+                    sync_stages_with_master(pipe=pipe,
+                                            stages=new_stages,
+                                            tasks=new_tasks,
+                                            channel=mq_channel,
+                                            queue='%s-deq-to-sync' % self._sid,
+                                            logger=self._logger,
+                                            local_prof=local_prof)
+
+                self._advance_pipeline(pipe, mq_channel, local_prof)
+
+        return len(results)
+
+    def _enqueue(self, local_prof):
+        """
+        **Purpose**: This is the function that is run in the enqueue thread. This function extracts Tasks from the
+        copy of workflow that exists in the WFprocessor object and pushes them to the queues in the pending_q list.
+        Since this thread works on the copy of the workflow, every state update to the Task, Stage and Pipeline is
+        communicated back to the AppManager (master process) via the 'sync_with_master' function that has dedicated
+        queues to communicate with the master, or via the state table if the AppManager shares one.
+
+        Details: Termination condition of this thread is set by the wfp process.
+        """
+
+        try:
+
+            local_prof.prof('enqueue-thread started', uid=self._uid)
+            self._logger.info('enqueue-thread started')
+
+            # Acquire a connection+channel to the rmq server
+            mq_connection = pika.BlockingConnection(
+                pika.ConnectionParameters(host=self._mq_hostname, port=self._port))
+            mq_channel = mq_connection.channel()
+
+            # The transitions of a collapsed WFprocessor change the workflow
+            # of the AppManager, there is nothing to synchronize
+            sync_channel = None if self._collapsed else mq_channel
+
+            last = time.time()
+            while not self._enqueue_thread_terminate.is_set():
+
+                workload, scheduled_stages = self._schedule_tasks(sync_channel, local_prof)
+
+                # The tmgr syncs the next state of the tasks as soon as they are
+                # published, which must not be overwritten in the shared workflow
+                if self._collapsed:
+                    self._mark_scheduled(workload, scheduled_stages, sync_channel, local_prof)
 
                 if workload:
 
@@ -215,30 +575,15 @@ class WFprocessor(object):
                                              # delivery_mode = 2)
                                              )
 
-                    for task in workload:
-
-                        # Set state of Tasks in current Stage to SCHEDULED
-                        transition(obj=task,
-                                   obj_type='Task',
-                                   new_state=states.SCHEDULED,
-                                   channel=mq_channel,
-                                   queue='%s-enq-to-sync' % self._sid,
-                                   profiler=local_prof,
-                                   logger=self._logger)
+                    metrics = get_registry()
+                    metrics.histogram('entk_enqueue_batch_size',
+                                      'Number of tasks per message to the pending queue',
+                                      buckets=SIZE_BUCKETS).observe(len(workload))
+                    metrics.counter('entk_tasks_enqueued_total',
+                                    'Number of tasks pushed to the pending queue').inc(len(workload))
 
-                        self._logger.debug(
-                            'Task %s published to pending queue' % task.uid)
-
-                if scheduled_stages:
-                    for executable_stage in scheduled_stages:
-
-                        transition(obj=executable_stage,
-                                   obj_type='Stage',
-                                   new_state=states.SCHEDULED,
-                                   channel=mq_channel,
-                                   queue='%s-enq-to-sync' % self._sid,
-                                   profiler=local_prof,
-                                   logger=self._logger)
+                if not self._collapsed:
+                    self._mark_scheduled(workload, scheduled_stages, sync_channel, local_prof)
 
                 # Appease pika cos it thinks the connection is dead
                 now = time.time()
@@ -276,7 +621,7 @@ class WFprocessor(object):
         completed queus and updates the copy of workflow that exists in the WFprocessor object.
         Since this thread works on the copy of the workflow, every state update to the Task, Stage and Pipeline is
         communicated back to the AppManager (master process) via the 'sync_with_master' function that has dedicated
-        queues to communicate with the master.
+        queues to communicate with the master, or via the state table if the AppManager shares one.
 
         Details: Termination condition of this thread is set by the wfp process.
         """
@@ -290,12 +635,19 @@ class WFprocessor(object):
                 pika.ConnectionParameters(host=self._mq_hostname, port=self._port))
             mq_channel = mq_connection.channel()
 
+            sync_channel = None if self._collapsed else mq_channel
+
+            self._post_exec_pool = PostExecPool(workers=self._post_exec_workers,
+                                                timeout=self._post_exec_timeout)
+
             last = time.time()
 
             while not self._dequeue_thread_terminate.is_set():
 
                 try:
 
+                    self._process_post_exec(sync_channel, local_prof)
+
                     method_frame, header_frame, body = mq_channel.basic_get(
                         queue=self._completed_queue[0])
 
@@ -307,124 +659,10 @@ class WFprocessor(object):
                         self._logger.info(
                             'Got finished task %s from queue' % (completed_task.uid))
 
-                        transition(obj=completed_task,
-                                   obj_type='Task',
-                                   new_state=states.DEQUEUEING,
-                                   channel=mq_channel,
-                                   queue='%s-deq-to-sync' % self._sid,
-                                   profiler=local_prof,
-                                   logger=self._logger)
-
-                        # Traverse the entire workflow to find out the correct Task
-                        for pipe in self._workflow:
-
-                            with pipe.lock:
-
-                                if ((not pipe.completed) and (not pipe.state == states.SUSPENDED)):
-
-                                    if completed_task.parent_pipeline['uid'] == pipe.uid:
-
-                                        self._logger.debug(
-                                            'Found parent pipeline: %s' % pipe.uid)
-
-                                        for stage in pipe.stages:
-
-                                            if completed_task.parent_stage['uid'] == stage.uid:
-                                                self._logger.debug(
-                                                    'Found parent stage: %s' % (stage.uid))
-
-                                                transition(obj=completed_task,
-                                                           obj_type='Task',
-                                                           new_state=states.DEQUEUED,
-                                                           channel=mq_channel,
-                                                           queue='%s-deq-to-sync' % self._sid,
-                                                           profiler=local_prof,
-                                                           logger=self._logger)
-
-                                                if not completed_task.exit_code:
-                                                    completed_task.state = states.DONE
-                                                else:
-                                                    completed_task.state = states.FAILED
-
-                                                for task in stage.tasks:
-
-                                                    if task.uid == completed_task.uid:
-                                                        task.state = str(
-                                                            completed_task.state)
-
-                                                        if (task.state == states.FAILED) and (self._resubmit_failed):
-                                                            task.state = states.INITIAL
-
-                                                        transition(obj=task,
-                                                                   obj_type='Task',
-                                                                   new_state=task.state,
-                                                                   channel=mq_channel,
-                                                                   queue='%s-deq-to-sync' % self._sid,
-                                                                   profiler=local_prof,
-                                                                   logger=self._logger)
-
-                                                        if stage._check_stage_complete():
-
-                                                            transition(obj=stage,
-                                                                       obj_type='Stage',
-                                                                       new_state=states.DONE,
-                                                                       channel=mq_channel,
-                                                                       queue='%s-deq-to-sync' % self._sid,
-                                                                       profiler=local_prof,
-                                                                       logger=self._logger)
-
-                                                            # Check if Stage has a post-exec that needs to be
-                                                            # executed
-
-                                                            if stage.post_exec['condition']:
-
-                                                                try:
-
-                                                                    self._logger.info(
-                                                                        'Executing post-exec for stage %s' % stage.uid)
-                                                                    self._prof.prof('Adap: executing post-exec',
-                                                                                    uid=self._uid)
+                        get_registry().counter('entk_tasks_dequeued_total',
+                                               'Number of tasks pulled from the completed queue').inc()
 
-                                                                    func_condition = stage.post_exec['condition']
-                                                                    func_on_true = stage.post_exec['on_true']
-                                                                    func_on_false = stage.post_exec['on_false']
-
-                                                                    if func_condition():
-                                                                        func_on_true()
-                                                                    else:
-                                                                        func_on_false()
-
-                                                                    self._logger.info(
-                                                                        'Post-exec executed for stage %s' % stage.uid)
-                                                                    self._prof.prof(
-                                                                        'Adap: post-exec executed', uid=self._uid)
-
-                                                                except Exception, ex:
-                                                                    self._logger.exception(
-                                                                        'Execution failed in post_exec of stage %s' % stage.uid)
-                                                                    raise
-
-                                                            pipe._increment_stage()
-
-                                                            if pipe.completed:
-
-                                                                transition(obj=pipe,
-                                                                           obj_type='Pipeline',
-                                                                           new_state=states.DONE,
-                                                                           channel=mq_channel,
-                                                                           queue='%s-deq-to-sync' % self._sid,
-                                                                           profiler=local_prof,
-                                                                           logger=self._logger)
-
-                                                        # Found the task and processed it -- no more iterations needed
-
-                                                        break
-
-                                                # Found the stage and processed it -- no more iterations neeeded
-                                                break
-
-                                        # Found the pipeline and processed it -- no more iterations neeeded
-                                        break
+                        self._process_completed(completed_task, sync_channel, local_prof)
 
                         mq_channel.basic_ack(
                             delivery_tag=method_frame.delivery_tag)
@@ -441,6 +679,7 @@ class WFprocessor(object):
                     raise
 
             self._logger.info('Terminated dequeue thread')
+            self._post_exec_pool.close()
             mq_connection.close()
 
             local_prof.prof('terminating dequeue-thread', uid=self._uid)
@@ -457,6 +696,9 @@ class WFprocessor(object):
         except Exception, ex:
             self._logger.exception('Error in dequeue-thread: %s' % ex)
 
+            if self._post_exec_pool:
+                self._post_exec_pool.close()
+
             try:
                 mq_connection.close()
             except:
@@ -472,11 +714,19 @@ class WFprocessor(object):
         responsible for the termination of these threads and hence blocking.
         """
 
+        local_prof = None
+        metrics = None
+
         try:
 
-            local_prof = ru.Profiler(
+            local_prof = Profiler(
                 name='radical.entk.%s' % self._uid + '-proc', path=self._path)
 
+            # A collapsed WFprocessor shares the registry and exporter of the AppManager
+            if not self._collapsed:
+                metrics = get_registry()
+                metrics.start_exporter(path='%s/radical.entk.%s.prom' % (self._path, self._uid), name=self._uid)
+
             local_prof.prof('wfp process started', uid=self._uid)
 
             self._logger.info('WFprocessor started')
@@ -512,6 +762,10 @@ class WFprocessor(object):
                             'starting enqueue-thread', uid=self._uid)
                         self._enqueue_thread.start()
 
+                    # The liveness of the threads is checked once per second, a collapsed WFprocessor shares the
+                    # process (and the GIL) with the AppManager
+                    self._wfp_terminate.wait(1)
+
                 except Exception, ex:
                     self._logger.error('WFProcessor interrupted')
                     raise
@@ -531,6 +785,9 @@ class WFprocessor(object):
 
             local_prof.close()
 
+            if metrics:
+                metrics.stop_exporter()
+
         except KeyboardInterrupt:
 
             self._logger.error('Execution interrupted by user (you probably hit Ctrl+C), ' +
@@ -552,6 +809,12 @@ class WFprocessor(object):
 
             self._logger.info('WFprocessor process terminated')
 
+            if local_prof:
+                local_prof.close()
+
+            if metrics:
+                metrics.stop_exporter()
+
             raise KeyboardInterrupt
 
         except Exception, ex:
@@ -574,6 +837,12 @@ class WFprocessor(object):
 
             self._logger.info('WFprocessor process terminated')
 
+            if local_prof:
+                local_prof.close()
+
+            if metrics:
+                metrics.stop_exporter()
+
             print traceback.format_exc()
             raise EnTKError(ex)
 
@@ -585,7 +854,7 @@ class WFprocessor(object):
         """
         **Purpose**: Method to start the wfp process. The wfp function
         is not to be accessed directly. The function is started in a separate
-        process using this method.
+        process (or, if collapsed, thread) using this method.
         """
 
         if not self._wfp_process:
@@ -593,15 +862,25 @@ class WFprocessor(object):
             try:
 
                 self._prof.prof('creating wfp process', uid=self._uid)
-                self._wfp_process = Process(
-                    target=self._wfp, name='wfprocessor')
+
+                if self._collapsed:
+                    self._wfp_process = threading.Thread(
+                        target=self._wfp, name='wfprocessor')
+                    self._wfp_process.daemon = True
+                else:
+                    self._wfp_process = Process(
+                        target=self._wfp, name='wfprocessor')
 
                 self._enqueue_thread = None
                 self._dequeue_thread = None
                 self._enqueue_thread_terminate = threading.Event()
                 self._dequeue_thread_terminate = threading.Event()
 
-                self._wfp_terminate = Event()
+                if self._collapsed:
+                    self._wfp_terminate = threading.Event()
+                else:
+                    self._wfp_terminate = Event()
+
                 self._logger.info('Starting WFprocessor process')
                 self._prof.prof('starting wfp process', uid=self._uid)
                 self._wfp_process.start()
@@ -4,7 +4,10 @@ __license__ = "MIT"
 
 import radical.utils as ru
 from radical.entk.exceptions import *
-import radical.pilot as rp
+from radical.entk.utils.logger import get_logger
+from radical.entk.utils.placement import PLACEMENT_POLICIES
+from radical.entk.utils.scaling import validate_scaling
+import multiprocessing as mp
 import os
 
 
@@ -24,6 +27,35 @@ class Base_ResourceManager(object):
                                     |  'queue'         : 'abc',    # optional
                                     |  'access_schema' : 'ssh'  # optional
                                 }
+
+    Several pilots, on the same or on different resources, are described by
+    the optional key 'pilots': a list of dictionaries with the keys above.
+    Keys which are not given for a pilot are taken from the top level of the
+    description. The optional key 'placement' selects how tasks are placed on
+    the pilots, see `radical.entk.utils.placement.PLACEMENT_POLICIES`.
+
+        :example: resource_desc = {
+                                    |  'project'   : 'TG-abcxyz',
+                                    |  'walltime'  : 60,
+                                    |  'placement' : 'least_loaded',
+                                    |  'pilots'    : [{'resource': 'xsede.stampede', 'cpus': 64},
+                                    |                 {'resource': 'xsede.comet',    'cpus': 32}]
+                                }
+
+    The optional key 'scaling' lets the TaskManager add pilots while too many
+    tasks wait for cores and retire idle pilots once the backlog drained, see
+    `radical.entk.utils.scaling.SCALING_POLICY`. The TaskManager reports every
+    added and retired pilot to the AppManager, whose ResourceManager terminates
+    them with the resource request.
+
+        :example: resource_desc = {
+                                    |  'resource' : 'xsede.stampede',
+                                    |  'walltime' : 60,
+                                    |  'cpus'     : 64,
+                                    |  'scaling'  : {'max_pilots': 4,
+                                    |                'backlog': 128,
+                                    |                'pilot': {'cpus': 32}}
+                                }
     """
 
     def __init__(self, resource_desc, sid, rts, rts_config):
@@ -44,6 +76,10 @@ class Base_ResourceManager(object):
         self._project = None
         self._access_schema = None
         self._queue = None
+        self._pilot_descs = list()
+        self._placement = 'round_robin'
+        self._scaling = None
+        self._retired_pilots = set()
         self._validated = False
 
         # Utility parameters
@@ -51,13 +87,18 @@ class Base_ResourceManager(object):
                                    ru.ID_CUSTOM,
                                    namespace=self._sid)
         self._path = os.getcwd() + '/' + self._sid
-        self._logger = ru.Logger('radical.entk.%s' %
+        self._logger = get_logger('radical.entk.%s' %
                                  self._uid, path=self._path, targets=['2', '.'])
         self._prof = ru.Profiler(name='radical.entk.%s' % self._uid, path=self._path)
 
         # Shared data list
         self._shared_data = list()
 
+        # Set once the resource can execute tasks. Submitting the resource
+        # request does not wait for it, the event is inherited by the
+        # TaskManager process which waits for it before submitting tasks.
+        self._resource_active = mp.Event()
+
     @property
     def resource(self):
         """
@@ -108,6 +149,36 @@ class Base_ResourceManager(object):
         """
         return self._queue
 
+    @property
+    def pilot_descs(self):
+        """
+        :getter: Return the descriptions of the pilots to be submitted, one
+                 dictionary per pilot with the keys of the resource description
+        """
+        return self._pilot_descs
+
+    @property
+    def placement(self):
+        """
+        :getter: Return the policy used to place tasks on the pilots
+        """
+        return self._placement
+
+    @property
+    def scaling(self):
+        """
+        :getter: Return the validated scaling policy, None if the pilots are not scaled. The description of the
+                 added pilots is completed with the keys of the resource description.
+        """
+        return self._scaling
+
+    @property
+    def retired_pilots(self):
+        """
+        :getter: Return the indices (in pilot_descs) of the pilots which were retired
+        """
+        return self._retired_pilots
+
     @property
     def shared_data(self):
         """
@@ -132,6 +203,17 @@ class Base_ResourceManager(object):
         raise NotImplementedError('get_resource_allocation_state() method ' +
                                   'not implemented in ResourceManager for %s' % self._rts)
 
+    def wait_for_resource(self, timeout=None):
+        """
+        **Purpose**: Wait until the submitted resource request can execute tasks
+
+        :arguments:
+            :timeout: time (in seconds) to wait for, None to wait without limit
+        :return: True if the resource is active, False if the timeout expired
+        """
+
+        return self._resource_active.wait(timeout)
+
     def get_completed_states(self):
         """
         **Purpose**: Test if a resource allocation was submitted
@@ -152,38 +234,29 @@ class Base_ResourceManager(object):
         self._prof.prof('validating rdesc', uid=self._uid)
         self._logger.debug('Validating resource description')
 
-        expected_keys = ['resource',
-                         'walltime',
-                         'cpus']
-
-        for key in expected_keys:
-            if key not in self._resource_desc:
-                raise MissingError(obj='resource description', missing_attribute=key)
-
-        if not isinstance(self._resource_desc['resource'], str):
-            raise TypeError(expected_type=str, actual_type=type(self._resource_desc['resource']))
+        if 'pilots' in self._resource_desc:
 
-        if not isinstance(self._resource_desc['walltime'], int):
-            raise TypeError(expected_type=int, actual_type=type(self._resource_desc['walltime']))
+            if not isinstance(self._resource_desc['pilots'], list):
+                raise TypeError(expected_type=list, actual_type=type(self._resource_desc['pilots']))
 
-        if not isinstance(self._resource_desc['cpus'], int):
-            raise TypeError(expected_type=int, actual_type=type(self._resource_desc['cpus']))
+            if not self._resource_desc['pilots']:
+                raise MissingError(obj='resource description', missing_attribute='pilots')
 
-        if 'gpus' in self._resource_desc:
-            if (not isinstance(self._resource_desc['gpus'], int)):
-                raise TypeError(expected_type=int, actual_type=type(self._resource_desc['project']))
+            for pilot in self._resource_desc['pilots']:
+                if not isinstance(pilot, dict):
+                    raise TypeError(expected_type=dict, actual_type=type(pilot))
 
-        if 'project' in self._resource_desc:
-            if (not isinstance(self._resource_desc['project'], str)) and (not self._resource_desc['project']):
-                raise TypeError(expected_type=str, actual_type=type(self._resource_desc['project']))
+        if self._resource_desc.get('placement', 'round_robin') not in PLACEMENT_POLICIES:
+            raise ValueError(obj='resource description',
+                             attribute='placement',
+                             expected_value=PLACEMENT_POLICIES,
+                             actual_value=self._resource_desc['placement'])
 
-        if 'access_schema' in self._resource_desc:
-            if not isinstance(self._resource_desc['access_schema'], str):
-                raise TypeError(expected_type=str, actual_type=type(self._resource_desc['access_schema']))
+        for desc in self._merge_pilot_descs():
+            self._validate_pilot_desc(desc)
 
-        if 'queue' in self._resource_desc:
-            if not isinstance(self._resource_desc['queue'], str):
-                raise TypeError(expected_type=str, actual_type=type(self._resource_desc['queue']))
+        if 'scaling' in self._resource_desc:
+            self._validate_pilot_desc(self._scaling_pilot_desc(validate_scaling(self._resource_desc['scaling'])))
 
         if not isinstance(self._rts_config, dict):
             raise TypeError(expected_type=dict, actual_type=type(self._rts_config))
@@ -206,13 +279,7 @@ class Base_ResourceManager(object):
             self._prof.prof('populating rmgr', uid=self._uid)
             self._logger.debug('Populating resource manager object')
 
-            self._resource = self._resource_desc['resource']
-            self._walltime = self._resource_desc['walltime']
-            self._cpus = self._resource_desc['cpus']
-            self._gpus = self._resource_desc.get('gpus', 0)
-            self._project = self._resource_desc.get('project', None)
-            self._access_schema = self._resource_desc.get('access_schema', None)
-            self._queue = self._resource_desc.get('queue', None)
+            self._populate_pilots()
 
             self._logger.debug('Resource manager population successful')
             self._prof.prof('rmgr populated', uid=self._uid)
@@ -220,6 +287,110 @@ class Base_ResourceManager(object):
         else:
             raise EnTKError('Resource description not validated')
 
+    def _merge_pilot_descs(self):
+        """
+        **Purpose**:    Descriptions of the pilots, the top level of the resource description completed by the
+                        entries of 'pilots' if there are any
+        """
+
+        common = dict([(k, v) for k, v in self._resource_desc.iteritems()
+                       if k not in ['pilots', 'placement', 'scaling']])
+
+        if not self._resource_desc.get('pilots'):
+            return [common]
+
+        descs = list()
+        for pilot in self._resource_desc['pilots']:
+            desc = dict(common)
+            desc.update(pilot)
+            descs.append(desc)
+
+        return descs
+
+    def _scaling_pilot_desc(self, scaling):
+        """
+        **Purpose**:    Description of the pilots added by scaling, the first pilot completed by the 'pilot' entry
+                        of the scaling policy
+        """
+
+        desc = dict(self._merge_pilot_descs()[0])
+        desc.update(scaling['pilot'] or dict())
+
+        return desc
+
+    def _validate_pilot_desc(self, desc):
+        """
+        **Purpose**:    Validate the description of a single pilot
+        """
+
+        expected_keys = ['resource',
+                         'walltime',
+                         'cpus']
+
+        for key in expected_keys:
+            if key not in desc:
+                raise MissingError(obj='resource description', missing_attribute=key)
+
+        if not isinstance(desc['resource'], str):
+            raise TypeError(expected_type=str, actual_type=type(desc['resource']))
+
+        if not isinstance(desc['walltime'], int):
+            raise TypeError(expected_type=int, actual_type=type(desc['walltime']))
+
+        if not isinstance(desc['cpus'], int):
+            raise TypeError(expected_type=int, actual_type=type(desc['cpus']))
+
+        if 'gpus' in desc:
+            if (not isinstance(desc['gpus'], int)):
+                raise TypeError(expected_type=int, actual_type=type(desc['project']))
+
+        if 'project' in desc:
+            if (not isinstance(desc['project'], str)) and (not desc['project']):
+                raise TypeError(expected_type=str, actual_type=type(desc['project']))
+
+        if 'access_schema' in desc:
+            if not isinstance(desc['access_schema'], str):
+                raise TypeError(expected_type=str, actual_type=type(desc['access_schema']))
+
+        if 'queue' in desc:
+            if not isinstance(desc['queue'], str):
+                raise TypeError(expected_type=str, actual_type=type(desc['queue']))
+
+    def _populate_pilots(self):
+        """
+        **Purpose**:    Populate the pilot descriptions and the attributes of the ResourceManager. With several
+                        pilots, the attributes describe the whole request: cpus and gpus are the totals of all
+                        pilots, walltime is the longest walltime and the other attributes are those of the first pilot.
+        """
+
+        def normalize(desc):
+
+            return {'resource': desc.get('resource', None),
+                    'walltime': desc.get('walltime', None),
+                    'cpus': desc.get('cpus', 1),
+                    'gpus': desc.get('gpus', 0),
+                    'project': desc.get('project', None),
+                    'access_schema': desc.get('access_schema', None),
+                    'queue': desc.get('queue', None)}
+
+        self._pilot_descs = [normalize(desc) for desc in self._merge_pilot_descs()]
+
+        if self._resource_desc.get('scaling') is not None:
+            self._scaling = validate_scaling(self._resource_desc['scaling'])
+            self._scaling['pilot'] = normalize(self._scaling_pilot_desc(self._scaling))
+
+        first = self._pilot_descs[0]
+        walltimes = [desc['walltime'] for desc in self._pilot_descs if desc['walltime'] is not None]
+
+        self._resource = first['resource']
+        self._walltime = max(walltimes) if walltimes else None
+        self._cpus = sum([desc['cpus'] for desc in self._pilot_descs])
+        self._gpus = sum([desc['gpus'] for desc in self._pilot_descs])
+        self._project = first['project']
+        self._access_schema = first['access_schema']
+        self._queue = first['queue']
+        self._placement = self._resource_desc.get('placement', 'round_robin')
+
     def _submit_resource_request(self):
         """
         **Purpose**:    Submit resource request as per the description provided by the user
@@ -228,6 +399,59 @@ class Base_ResourceManager(object):
         raise NotImplementedError('_submit_resource_request() method ' +
                                   'not implemented in ResourceManager for %s' % self._rts)
 
+    def _add_pilot(self, staging=None):
+        """
+        **Purpose**:    Add a pilot as described by the scaling policy to the resource request
+
+        :arguments:
+            :staging:   list of additional staging directives for the sandbox of the pilot
+        :return:        index of the pilot in pilot_descs
+        """
+
+        raise NotImplementedError('_add_pilot() method ' +
+                                  'not implemented in ResourceManager for %s' % self._rts)
+
+    def _retire_pilot(self, index):
+        """
+        **Purpose**:    Release the resources of a pilot which has no tasks to execute
+
+        :arguments:
+            :index:     index of the pilot in pilot_descs
+        """
+
+        raise NotImplementedError('_retire_pilot() method ' +
+                                  'not implemented in ResourceManager for %s' % self._rts)
+
+    def _pilot_added(self, uid=None):
+        """
+        **Purpose**:    Record a pilot which was added as described by the scaling policy, by this ResourceManager or
+                        by the TaskManager in its own process
+
+        :arguments:
+            :uid:       uid of the pilot in the RTS
+        :return:        index of the pilot in pilot_descs
+        """
+
+        self._pilot_descs.append(dict(self._scaling['pilot']))
+        self._cpus += self._scaling['pilot']['cpus']
+        self._gpus += self._scaling['pilot']['gpus']
+
+        return len(self._pilot_descs) - 1
+
+    def _pilot_retired(self, index):
+        """
+        **Purpose**:    Record a pilot which was retired
+
+        :arguments:
+            :index:     index of the pilot in pilot_descs
+        """
+
+        if index not in self._retired_pilots:
+
+            self._retired_pilots.add(index)
+            self._cpus -= self._pilot_descs[index]['cpus']
+            self._gpus -= self._pilot_descs[index]['gpus']
+
     def _terminate_resource_request(self):
         """
         **Purpose**:    Cancel resource request by terminating any reservation on any acquired
@@ -4,6 +4,8 @@ __license__ = "MIT"
 
 import radical.utils as ru
 from radical.entk.exceptions import *
+from radical.entk.utils.logger import get_logger
+from radical.entk.utils.metrics import get_registry
 import threading
 from multiprocessing import Process, Event
 import Queue
@@ -77,31 +79,26 @@ class Base_TaskManager(object):
         # Utility parameters
         self._uid = ru.generate_id('task_manager.%(item_counter)04d', ru.ID_CUSTOM, namespace=self._sid)
         self._path = os.getcwd() + '/' + self._sid
-        self._logger = ru.Logger('radical.entk.%s' %
+        self._logger = get_logger('radical.entk.%s' %
                                  self._uid, path=self._path, targets=['2', '.'])
         self._prof = ru.Profiler(name='radical.entk.%s' % self._uid + '-obj', path=self._path)
 
-        # Thread should run till terminate condtion is encountered
-        mq_connection = pika.BlockingConnection(pika.ConnectionParameters(host=mq_hostname, port=port))
-
+        # The heartbeat queues are declared by the AppManager together with all
+        # other queues of the session, and by the heartbeat thread, so that
+        # creating a TaskManager does not need a connection of its own
         self._hb_request_q = '%s-hb-request' % self._sid
         self._hb_response_q = '%s-hb-response' % self._sid
 
-        mq_channel = mq_connection.channel()
-
-        # To respond to heartbeat - get request from rpc_queue
-        mq_channel.queue_delete(queue=self._hb_response_q)
-        mq_channel.queue_declare(queue=self._hb_response_q)
-
-        # To respond to heartbeat - get request from rpc_queue
-        mq_channel.queue_delete(queue=self._hb_request_q)
-        mq_channel.queue_declare(queue=self._hb_request_q)
-
         self._tmgr_process = None
         self._hb_thread = None
-        self._hb_interval = int(os.getenv('ENTK_HB_INTERVAL', 30))
 
-        mq_connection.close()
+        # Time (in seconds) the tmgr may be idle before a heartbeat request is
+        # sent, time to wait for the response and interval between two checks
+        # of the tmgr process
+        self._hb_interval = float(os.getenv('ENTK_HB_INTERVAL', 30))
+        self._hb_timeout = float(os.getenv('ENTK_HB_TIMEOUT', 10))
+        self._hb_tick = float(os.getenv('ENTK_HB_TICK', 0.1))
+        self._last_activity = time.time()
 
     # ------------------------------------------------------------------------------------------------------------------
     # Private Methods
@@ -109,15 +106,19 @@ class Base_TaskManager(object):
 
     def _heartbeat(self):
         """
-        **Purpose**: Method to be executed in the heartbeat thread. This method sends a 'request' to the
-        heartbeat-req queue. It expects a 'response' message from the 'heartbeart-res' queue within 10 seconds. This
-        message should contain the same correlation id. If no message if received in 10 seconds, the tmgr is assumed
-        dead. The end_manager() is called to cleanly terminate tmgr process and the heartbeat thread is also 
-        terminated.
+        **Purpose**: Method to be executed in the heartbeat thread. The liveness of the tmgr is derived from its
+        regular traffic: the synchronizer of the AppManager calls `record_activity()` for every message it receives
+        from the tmgr process. Only if the tmgr has been idle for `ENTK_HB_INTERVAL` seconds, a 'request' is sent to
+        the heartbeat-req queue and a 'response' with the same correlation id is expected on the heartbeat-res queue
+        within `ENTK_HB_TIMEOUT` seconds. Independently, the tmgr process is checked every `ENTK_HB_TICK` seconds, so
+        that a tmgr process which died is detected within a fraction of a second. If the tmgr is found dead or does not
+        respond, the heartbeat thread terminates.
 
         **Details**: The AppManager can re-invoke both if the execution is still not complete.
         """
 
+        mq_connection = None
+
         try:
 
             self._prof.prof('heartbeat thread started', uid=self._uid)
@@ -125,10 +126,41 @@ class Base_TaskManager(object):
             mq_connection = pika.BlockingConnection(pika.ConnectionParameters(host=self._mq_hostname, port=self._port))
             mq_channel = mq_connection.channel()
 
-            response = True
-            while (response and (not self._hb_terminate.is_set())):
-                response = False
+            # The queues are deleted when the heartbeat is terminated, declare
+            # them (again) for a restarted tmgr. Requests of a previous
+            # heartbeat thread are dropped.
+            mq_channel.queue_declare(queue=self._hb_request_q)
+            mq_channel.queue_declare(queue=self._hb_response_q)
+            mq_channel.queue_purge(queue=self._hb_request_q)
+
+            responses = list()
+
+            def on_response(channel, method_frame, props, body):
+                responses.append(props.correlation_id)
+
+            # The arguments of basic_consume were renamed in pika 1.0
+            if int(pika.__version__.split('.')[0]) < 1:
+                mq_channel.basic_consume(on_response, queue=self._hb_response_q, no_ack=True)
+            else:
+                mq_channel.basic_consume(queue=self._hb_response_q, on_message_callback=on_response, auto_ack=True)
+
+            self._last_activity = time.time()
+
+            while not self._hb_terminate.is_set():
+
+                if self.check_manager() is False:
+                    self._logger.error('Task manager process died')
+                    break
+
+                # Regular traffic of the tmgr suffices as heartbeat
+                if time.time() - self._last_activity < self._hb_interval:
+
+                    # Keep the connection alive while waiting
+                    mq_connection.process_data_events(time_limit=self._hb_tick)
+                    continue
+
                 corr_id = str(uuid.uuid4())
+                del responses[:]
 
                 # Heartbeat request signal sent to task manager via rpc-queue
                 mq_channel.basic_publish(exchange='',
@@ -139,26 +171,26 @@ class Base_TaskManager(object):
                                          body='request')
                 self._logger.info('Sent heartbeat request')
 
-                # mq_connection.close()
-
-                # Sleep for hb_interval and then check if tmgr responded
-                mq_connection.sleep(self._hb_interval)
+                get_registry().counter('entk_heartbeat_requests_total',
+                                       'Number of heartbeat requests sent to the idle tmgr').inc()
 
-                # mq_connection = pika.BlockingConnection(
-                #     pika.ConnectionParameters(host=self._mq_hostname, port=self._port))
-                # mq_channel = mq_connection.channel()
+                # Wait for the response, but stop waiting as soon as it arrives
+                # or the tmgr process dies
+                deadline = time.time() + self._hb_timeout
+                while corr_id not in responses and time.time() < deadline:
 
-                method_frame, props, body = mq_channel.basic_get(queue=self._hb_response_q)
+                    if self._hb_terminate.is_set() or self.check_manager() is False:
+                        break
 
-                if body:
-                    if corr_id == props.correlation_id:
-                        self._logger.info('Received heartbeat response')
-                        response = True
+                    mq_connection.process_data_events(time_limit=self._hb_tick)
 
-                        mq_channel.basic_ack(delivery_tag=method_frame.delivery_tag)
+                if corr_id not in responses:
+                    if not self._hb_terminate.is_set():
+                        self._logger.error('No heartbeat response from task manager')
+                    break
 
-                # Appease pika cos it thinks the connection is dead
-                # mq_connection.close()
+                self._logger.info('Received heartbeat response')
+                self.record_activity()
 
         except KeyboardInterrupt:
             self._logger.error('Execution interrupted by user (you probably hit Ctrl+C), ' +
@@ -310,6 +342,14 @@ class Base_TaskManager(object):
 
 
 
+    def record_activity(self):
+        """
+        **Purpose**: Record that the tmgr is alive, e.g. because a message from the tmgr process was received. Heartbeat
+        requests are only sent if no activity was recorded for `ENTK_HB_INTERVAL` seconds.
+        """
+
+        self._last_activity = time.time()
+
     def check_heartbeat(self):
         """
         **Purpose**: Check if the heartbeat thread is alive and running
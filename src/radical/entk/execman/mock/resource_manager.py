@@ -4,7 +4,6 @@ __license__ = "MIT"
 
 import radical.utils as ru
 from radical.entk.exceptions import *
-import radical.pilot as rp
 import os
 from ..base.resource_manager import Base_ResourceManager
 
@@ -13,8 +12,9 @@ class ResourceManager(Base_ResourceManager):
 
     """
     A resource manager takes the responsibility of placing resource requests on
-    different, possibly multiple, DCIs. This ResourceManager uses the RADICAL
-    Pilot as the underlying runtime system.
+    different, possibly multiple, DCIs. This ResourceManager does not acquire any
+    resources: it describes the synthetic resource on which the mock TaskManager
+    executes tasks. The number of cores of that resource is given by 'cpus'.
 
     :arguments:
         :resource_desc: dictionary with details of the resource request + access credentials of the user
@@ -26,14 +26,16 @@ class ResourceManager(Base_ResourceManager):
                                     |  'queue'         : 'abc',    # optional
                                     |  'access_schema' : 'ssh'  # optional
                                 }
+        :rts_config: model of the execution of the tasks, see
+                     `radical.entk.execman.mock.runtime_model.RuntimeModel`
     """
 
-    def __init__(self, resource_desc, sid):
+    def __init__(self, resource_desc, sid, rts_config=None):
 
         super(ResourceManager, self).__init__(resource_desc=resource_desc,
                                               sid=sid,
                                               rts='mock',
-                                              rts_config={})
+                                              rts_config=rts_config or {})
 
     # ------------------------------------------------------------------------------------------------------------------
     # Public methods
@@ -66,19 +68,39 @@ class ResourceManager(Base_ResourceManager):
 
     def _populate(self):
         """
-        **Purpose**: Populate the RP_ResourceManager attributes with values provided in the resource description
+        **Purpose**: Populate the ResourceManager attributes with values provided in the resource description.
+                     The description is not validated for the mock RTS, so all attributes are optional. With
+                     several pilots, the synthetic resource has the cores of all pilots.
         """
 
+        self._populate_pilots()
+
         return None
 
     def _submit_resource_request(self):
         """
         **Purpose**: Create and submits a RADICAL Pilot Job as per the user
-                     provided resource description
+                     provided resource description. The synthetic resource is active immediately.
         """
 
+        self._resource_active.set()
+
         return None
 
+    def _add_pilot(self, staging=None):
+        """
+        **Purpose**: Add the cores of a pilot, as described by the scaling policy, to the synthetic resource
+        """
+
+        return self._pilot_added()
+
+    def _retire_pilot(self, index):
+        """
+        **Purpose**: Remove the cores of a pilot from the synthetic resource
+        """
+
+        self._pilot_retired(index)
+
     def _terminate_resource_request(self):
         """
         **Purpose**: Cancel the RADICAL Pilot Job
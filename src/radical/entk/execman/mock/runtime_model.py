@@ -0,0 +1,145 @@
+__copyright__ = "Copyright 2017-2018, http://radical.rutgers.edu"
+__license__ = "MIT"
+
+import random
+from radical.entk.exceptions import *
+
+
+DISTRIBUTIONS = ['fixed', 'uniform', 'lognormal', 'attribute']
+
+
+class RuntimeModel(object):
+
+    """
+    Model of the execution of tasks on a synthetic resource, used by the mock
+    RTS. It draws the runtime of each task from a distribution, decides whether
+    the task fails and computes the number of cores the task occupies.
+
+    :arguments:
+        :config: dictionary with the model, usually the `rts_config` of the
+                 mock ResourceManager. All keys are optional.
+        :example: config = {
+                            |  'runtime': {'distribution': 'lognormal',
+                            |              'mu': 2.0,
+                            |              'sigma': 0.5},
+                            |  'failure_probability': 0.01,
+                            |  'seed': 42
+                        }
+
+    The runtime distributions and their parameters are:
+
+        * fixed     : 'value' seconds (default 0)
+        * uniform   : between 'min' and 'max' seconds
+        * lognormal : lognormal with parameters 'mu' and 'sigma'
+        * attribute : value of the task attribute 'attribute' (e.g. 'arguments'
+                      of `/bin/sleep` tasks), 'value' if it is not a number.
+                      For lists, the first element is used.
+    """
+
+    def __init__(self, config=None):
+
+        if config is None:
+            config = dict()
+
+        if not isinstance(config, dict):
+            raise TypeError(expected_type=dict, actual_type=type(config))
+
+        self._runtime = config.get('runtime') or {'distribution': 'fixed', 'value': 0}
+        self._failure_probability = float(config.get('failure_probability', 0))
+        self._enabled = bool(config.get('runtime')) or self._failure_probability > 0
+
+        if not isinstance(self._runtime, dict):
+            raise TypeError(expected_type=dict, actual_type=type(self._runtime))
+
+        self._distribution = self._runtime.get('distribution', 'fixed')
+
+        if self._distribution not in DISTRIBUTIONS:
+            raise ValueError(obj='runtime model',
+                             attribute='distribution',
+                             expected_value=DISTRIBUTIONS,
+                             actual_value=self._distribution)
+
+        if self._distribution == 'attribute' and not self._runtime.get('attribute'):
+            raise MissingError(obj='runtime model', missing_attribute='attribute')
+
+        if not 0 <= self._failure_probability <= 1:
+            raise ValueError(obj='runtime model',
+                             attribute='failure_probability',
+                             expected_value='value between 0 and 1',
+                             actual_value=self._failure_probability)
+
+        self._random = random.Random(config.get('seed'))
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Getter methods
+    # ------------------------------------------------------------------------------------------------------------------
+
+    @property
+    def enabled(self):
+        """
+        :getter: True if a runtime or a failure probability was configured.
+                 Without a model, the mock RTS completes tasks immediately.
+        """
+        return self._enabled
+
+    @property
+    def failure_probability(self):
+        return self._failure_probability
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Public methods
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def runtime(self, task):
+        """
+        **Purpose**: Draw the runtime (in seconds) of a task.
+        """
+
+        dist = self._distribution
+        params = self._runtime
+
+        if dist == 'fixed':
+            value = params.get('value', 0)
+
+        elif dist == 'uniform':
+            value = self._random.uniform(params.get('min', 0), params.get('max', 0))
+
+        elif dist == 'lognormal':
+            value = self._random.lognormvariate(params.get('mu', 0), params.get('sigma', 1))
+
+        else:
+            value = getattr(task, params['attribute'], None)
+
+            if isinstance(value, (list, tuple)):
+                value = value[0] if value else None
+
+            try:
+                value = float(value)
+            except Exception:
+                value = params.get('value', 0)
+
+        return max(float(value), 0.0)
+
+    def fails(self, task):
+        """
+        **Purpose**: Decide whether the execution of a task fails.
+        """
+
+        if not self._failure_probability:
+            return False
+
+        return self._random.random() < self._failure_probability
+
+    def cores(self, task, capacity=None):
+        """
+        **Purpose**: Number of cores occupied by a task, capped at the capacity
+        of the resource so that large tasks can still run.
+        """
+
+        reqs = task.cpu_reqs
+        cores = max((reqs.get('processes') or 1) * (reqs.get('threads_per_process') or 1), 1)
+
+        if capacity:
+            cores = min(cores, capacity)
+
+        return cores
@@ -13,8 +13,16 @@ import pika
 import traceback
 import os
 import uuid
+import heapq
+from collections import deque
 from ..base.task_manager import Base_TaskManager
+from .runtime_model import RuntimeModel
 from radical.entk.utils.init_transition import transition
+from radical.entk.utils.sync_initiator import sync_pilot_with_master
+from radical.entk.utils.profiler import Profiler
+from radical.entk.utils.metrics import get_registry, SIZE_BUCKETS
+from radical.entk.utils.journal import Journal
+from radical.entk.utils.scaling import Scaler, GROW, SHRINK
 import Queue
 
 
@@ -34,6 +42,12 @@ class TaskManager(Base_TaskManager):
 
     Currently, EnTK is configured to work with one pending queue and one completed queue. In the future, the number of
     queues can be varied for different throughput requirements at the cost of additional Memory and CPU consumption.
+
+    By default, tasks are completed as soon as they are submitted. If the rts_config of the ResourceManager describes a
+    runtime model (see `RuntimeModel`), tasks are executed on a synthetic resource with `rmgr.cpus` cores instead: each
+    task occupies its cores for a runtime drawn from the model, fails with the given probability and is completed
+    asynchronously by a separate thread, like the RP callback does. With a scaling policy in the resource description,
+    the cores of pilots are added to the synthetic resource while tasks wait for cores, and removed once it is idle.
     """
 
     def __init__(self, sid, pending_queue, completed_queue,
@@ -48,6 +62,8 @@ class TaskManager(Base_TaskManager):
                                           rts='mock')
 
         self._rmq_ping_interval = os.getenv('RMQ_PING_INTERVAL', 10)
+        self._rts_runner = None
+        self._rts_executor = None
 
         self._logger.info('Created task manager object: %s' % self._uid)
         self._prof.prof('tmgr obj created', uid=self._uid)
@@ -70,8 +86,17 @@ class TaskManager(Base_TaskManager):
         **Details**: The AppManager can re-invoke the tmgr process with this function if the execution of the workflow is
         still incomplete. There is also population of a dictionary, placeholder_dict, which stores the path of each of
         the tasks on the remote machine.
+
+        The tasks held by the process are recorded in a journal in the session directory. A re-invoked tmgr submits
+        the tasks of the previous process which did not complete again, the mock RTS has no units to reconcile with.
         """
 
+        # Bound before the setup, which can fail at any step
+        local_prof = None
+        metrics = None
+        mq_connection = None
+        journal = None
+
         try:
 
             def heartbeat_response(mq_channel):
@@ -101,10 +126,14 @@ class TaskManager(Base_TaskManager):
                         'Failed to respond to heartbeat request, error: %s' % ex)
                     raise
 
-            local_prof = ru.Profiler(
+            local_prof = Profiler(
                 name='radical.entk.%s' % self._uid + '-proc', path=self._path)
 
             local_prof.prof('tmgr process started', uid=self._uid)
+
+            metrics = get_registry()
+            metrics.start_exporter(path='%s/radical.entk.%s.prom' % (self._path, self._uid), name=self._uid)
+
             logger.info('Task Manager process started')
 
             # Thread should run till terminate condtion is encountered
@@ -115,6 +144,40 @@ class TaskManager(Base_TaskManager):
             # Queue for communication between threads of this process
             task_queue = Queue.Queue()
 
+            # Tasks held by a previous tmgr process of this TaskManager
+            journal = Journal('%s/radical.entk.%s.journal' % (self._path, uid))
+            unsubmitted, in_flight = journal.recover()
+
+            recovered = unsubmitted + [entry['task'] for entry in in_flight.itervalues()]
+            if recovered:
+
+                logger.info('Recovered %s tasks from %s' % (len(recovered), journal.path))
+                local_prof.prof('tmgr tasks recovered', uid=uid, msg='%s' % len(recovered))
+                task_queue.put(recovered)
+
+            # Queue of submitted tasks, executed by a third thread if the
+            # execution of the tasks is modelled
+            exec_queue = None
+
+            model = RuntimeModel(rmgr._rts_config)
+            if model.enabled:
+
+                logger.info('Executing tasks on %s synthetic cores' % rmgr.cpus)
+
+                exec_queue = Queue.Queue()
+                self._rts_executor = threading.Thread(target=self._execute_tasks,
+                                                      name='rts-executor',
+                                                      args=(exec_queue,
+                                                            model,
+                                                            rmgr,
+                                                            logger,
+                                                            mq_hostname,
+                                                            port,
+                                                            local_prof,
+                                                            self._sid,
+                                                            journal))
+                self._rts_executor.start()
+
             # Start second thread to receive tasks and push to RTS
             self._rts_runner = threading.Thread(target=self._process_tasks,
                                                 args=(task_queue,
@@ -123,7 +186,9 @@ class TaskManager(Base_TaskManager):
                                                       mq_hostname,
                                                       port,
                                                       local_prof,
-                                                      self._sid))
+                                                      self._sid,
+                                                      journal,
+                                                      exec_queue))
             self._rts_runner.start()
 
             local_prof.prof('tmgr infrastructure setup done', uid=uid)
@@ -138,13 +203,25 @@ class TaskManager(Base_TaskManager):
 
                     if body:
 
-                        body = json.loads(body)
-                        task_queue.put(body)
+                        # Record the tasks before the message is acknowledged,
+                        # tasks which are already in flight are dropped
+                        body = journal.consumed(json.loads(body))
+
+                        if body:
+                            task_queue.put(body)
+
+                        metrics.gauge('entk_tmgr_pending_bulks',
+                                      'Number of bulks of tasks waiting to be submitted').set(task_queue.qsize())
 
                         mq_channel.basic_ack(
                             delivery_tag=method_frame.delivery_tag)
 
-                    heartbeat_response(mq_channel)
+                    # Heartbeat requests are only sent while the tmgr is idle,
+                    # they do not have to be polled in every iteration
+                    now = time.time()
+                    if now - last >= self._hb_tick:
+                        heartbeat_response(mq_channel)
+                        last = now
 
                 except Exception, ex:
                     logger.exception('Error in task execution: %s' % ex)
@@ -162,15 +239,28 @@ class TaskManager(Base_TaskManager):
 
         finally:
 
-            local_prof.prof('terminating tmgr process', uid=uid)
+            if local_prof:
+                local_prof.prof('terminating tmgr process', uid=uid)
 
             if self._rts_runner:
                 self._rts_runner.join()
 
-            mq_connection.close()
-            local_prof.close()
+            if self._rts_executor:
+                self._rts_executor.join()
+
+            if journal:
+                journal.close()
+
+            if mq_connection:
+                mq_connection.close()
+
+            if local_prof:
+                local_prof.close()
+
+            if metrics:
+                metrics.stop_exporter()
 
-    def _process_tasks(self, task_queue, rmgr, logger, mq_hostname, port, local_prof, sid):
+    def _process_tasks(self, task_queue, rmgr, logger, mq_hostname, port, local_prof, sid, journal, exec_queue=None):
 
         def load_placeholder(task):
 
@@ -209,6 +299,11 @@ class TaskManager(Base_TaskManager):
 
                     task_queue.task_done()
 
+                    metrics = get_registry()
+                    metrics.histogram('entk_tmgr_batch_size',
+                                      'Number of tasks per bulk submitted to the RTS',
+                                      buckets=SIZE_BUCKETS).observe(len(body))
+
                     bulk_tasks = list()
                     bulk_cuds = list()
 
@@ -237,6 +332,16 @@ class TaskManager(Base_TaskManager):
                         self._logger.info(
                             'Task %s submitted to RTS' % (task.uid))
 
+                    metrics.counter('entk_tasks_submitted_total',
+                                    'Number of tasks submitted to the RTS').inc(len(bulk_tasks))
+
+                    journal.submitted(dict([(task.uid, task.uid) for task in bulk_tasks]))
+
+                    if exec_queue is not None:
+                        for task in bulk_tasks:
+                            exec_queue.put(task)
+                        continue
+
                     for task in bulk_tasks:
 
                         transition(obj=task,
@@ -247,6 +352,9 @@ class TaskManager(Base_TaskManager):
                                    profiler=local_prof,
                                    logger=logger)
 
+                        metrics.counter('entk_tasks_completed_total',
+                                        'Number of tasks completed by the RTS').inc()
+
                         task_as_dict = json.dumps(task.to_dict())
 
                         mq_channel.basic_publish(exchange='',
@@ -263,6 +371,8 @@ class TaskManager(Base_TaskManager):
                             task.state,
                             sid))
 
+                    journal.completed([task.uid for task in bulk_tasks])
+
         except KeyboardInterrupt as ex:
             logger.error('Execution interrupted by user (you probably hit Ctrl+C), ' +
                          'trying to cancel task processor gracefully...')
@@ -270,9 +380,136 @@ class TaskManager(Base_TaskManager):
         except Exception as ex:
             print traceback.format_exc()
             raise EnTKError(ex)
-        # ------------------------------------------------------------------------------------------------------------------
-        # Public Methods
-        # ------------------------------------------------------------------------------------------------------------------
+
+    def _execute_tasks(self, exec_queue, model, rmgr, logger, mq_hostname, port, local_prof, sid, journal):
+        '''
+        **Purpose**: Execute the submitted tasks on a synthetic resource with `rmgr.cpus` cores. Tasks are started in
+        the order of their submission as soon as enough cores are free and are completed after the runtime given by the
+        model. Completed tasks are synced with the AppManager via the callback queue and pushed to the completed queue,
+        as done by the callback of the RP TaskManager.
+        '''
+
+        capacity = rmgr.cpus or 1
+        free = capacity
+
+        scaler = None
+        if rmgr.scaling:
+            scaler = Scaler(rmgr.scaling)
+
+        waiting = deque()
+        running = list()    # heap of (end time, seq, cores, task)
+        seq = 0
+
+        mq_connection = pika.BlockingConnection(
+            pika.ConnectionParameters(host=mq_hostname, port=port))
+        mq_channel = mq_connection.channel()
+
+        metrics = get_registry()
+
+        try:
+
+            while not self._tmgr_terminate.is_set():
+
+                # Wait for new tasks until the next running task ends
+                timeout = 1
+                if running:
+                    timeout = min(max(running[0][0] - time.time(), 0), timeout)
+
+                try:
+                    waiting.append(exec_queue.get(block=True, timeout=timeout))
+                    while True:
+                        waiting.append(exec_queue.get_nowait())
+                except Queue.Empty:
+                    pass
+
+                now = time.time()
+
+                while running and running[0][0] <= now:
+
+                    _, _, cores, task = heapq.heappop(running)
+                    free += cores
+
+                    transition(obj=task,
+                               obj_type='Task',
+                               new_state=states.COMPLETED,
+                               channel=mq_channel,
+                               queue='%s-cb-to-sync' % sid,
+                               profiler=local_prof,
+                               logger=logger)
+
+                    metrics.counter('entk_tasks_completed_total',
+                                    'Number of tasks completed by the RTS').inc()
+
+                    mq_channel.basic_publish(exchange='',
+                                             routing_key='%s-completedq-1' % sid,
+                                             body=json.dumps(task.to_dict()))
+
+                    logger.info('Pushed task %s with state %s to completed queue %s-completedq-1' % (
+                        task.uid,
+                        task.state,
+                        sid))
+
+                    journal.completed([task.uid])
+
+                while waiting and model.cores(waiting[0], capacity) <= free:
+
+                    task = waiting.popleft()
+                    cores = model.cores(task, capacity)
+                    free -= cores
+
+                    task.exit_code = 1 if model.fails(task) else 0
+
+                    heapq.heappush(running, (now + model.runtime(task), seq, cores, task))
+                    seq += 1
+
+                    local_prof.prof('task started', uid=task.uid)
+
+                if scaler:
+
+                    # The pilot added last is retired first, once its cores
+                    # are free
+                    active = [i for i in range(len(rmgr.pilot_descs)) if i not in rmgr.retired_pilots]
+                    last = rmgr.pilot_descs[active[-1]]['cpus']
+
+                    decision = scaler.decide(backlog=len(waiting),
+                                             pilots=len(active),
+                                             idle=1 if free >= last else 0)
+
+                    # The AppManager records the pilots, a restarted tmgr
+                    # starts with their cores
+                    if decision == GROW:
+                        index = rmgr._add_pilot()
+                        sync_pilot_with_master(GROW, index, None, mq_channel, '%s-tmgr-to-sync' % sid,
+                                               logger, local_prof)
+                        capacity += rmgr.pilot_descs[index]['cpus']
+                        free += rmgr.pilot_descs[index]['cpus']
+                        logger.info('Backlog of %s tasks, added %s cores' % (len(waiting),
+                                                                             rmgr.pilot_descs[index]['cpus']))
+
+                    elif decision == SHRINK:
+                        sync_pilot_with_master(SHRINK, active[-1], None, mq_channel, '%s-tmgr-to-sync' % sid,
+                                               logger, local_prof)
+                        rmgr._retire_pilot(active[-1])
+                        capacity -= last
+                        free -= last
+                        logger.info('No backlog, retired %s cores' % last)
+
+                metrics.gauge('entk_mock_cores_busy', 'Number of busy cores of the mock resource').set(capacity - free)
+
+        except KeyboardInterrupt:
+            logger.error('Execution interrupted by user (you probably hit Ctrl+C), ' +
+                         'trying to cancel task executor gracefully...')
+
+        except Exception as ex:
+            logger.exception('Error in task executor: %s' % ex)
+            raise EnTKError(ex)
+
+        finally:
+            mq_connection.close()
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Public Methods
+    # ------------------------------------------------------------------------------------------------------------------
 
     def start_manager(self):
         """
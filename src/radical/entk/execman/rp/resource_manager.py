@@ -4,6 +4,8 @@ __license__ = "MIT"
 
 from radical.entk.exceptions import *
 import radical.pilot as rp
+import threading
+import time
 import os
 from ..base.resource_manager import Base_ResourceManager
 
@@ -25,6 +27,13 @@ class ResourceManager(Base_ResourceManager):
                                     |  'queue'         : 'abc',    # optional
                                     |  'access_schema' : 'ssh'  # optional
                                 }
+
+    One pilot is submitted per entry of the optional key 'pilots' of the
+    resource description (see `Base_ResourceManager`).
+
+    Pilots added by scaling are submitted by the TaskManager, whose
+    UnitManager needs their handles. The ResourceManager of the AppManager only
+    knows their uids, it cancels them through the database of the session.
     """
 
     def __init__(self, resource_desc, sid, rts_config):
@@ -38,6 +47,9 @@ class ResourceManager(Base_ResourceManager):
         self._session = None
         self._pmgr = None
         self._pilot = None
+        self._pilots = list()
+        self._pilot_uids = list()
+        self._activation_thread = None
         self._download_rp_profile = False
 
         self._mlab_url = os.environ.get('RADICAL_PILOT_DBURL', None)
@@ -73,9 +85,23 @@ class ResourceManager(Base_ResourceManager):
     @property
     def pilot(self):
         """
-        :getter: Return reference to the submitted Pilot
+        :getter: Return reference to the submitted Pilot, the first one if several pilots were submitted
         """
         return self._pilot
+
+    @property
+    def pilots(self):
+        """
+        :getter: Return references to the Pilots submitted by this process, in the order of their submission
+        """
+        return self._pilots
+
+    @property
+    def pilot_uids(self):
+        """
+        :getter: Return the uids of all submitted Pilots, in the order of the pilot descriptions
+        """
+        return self._pilot_uids
     # ------------------------------------------------------------------------------------------------------------------
     # Public methods
     # ------------------------------------------------------------------------------------------------------------------
@@ -86,11 +112,21 @@ class ResourceManager(Base_ResourceManager):
 
         """
 
-        if self._pilot:
-            return self._pilot.state
-        else:
+        if not self._pilots:
             return None
 
+        # The allocation is usable as long as one of its pilots is
+        pilot_states = [pilot.state for pilot in self._pilots]
+
+        if rp.PMGR_ACTIVE in pilot_states:
+            return rp.PMGR_ACTIVE
+
+        for state in pilot_states:
+            if state not in self.get_completed_states():
+                return state
+
+        return pilot_states[0]
+
     def get_completed_states(self):
         """
         **Purpose**: Test if a resource allocation was submitted
@@ -103,15 +139,85 @@ class ResourceManager(Base_ResourceManager):
     # Private methods
     # ------------------------------------------------------------------------------------------------------------------
 
+    def _create_pilot_description(self, desc):
+        """
+        **Purpose**: Create the RADICAL Pilot description of a pilot from its validated description
+        """
+
+        pd_init = {
+            'resource': desc['resource'],
+            'runtime': desc['walltime'],
+            'cores': desc['cpus'],
+            'project': desc['project'],
+        }
+
+        if desc['gpus']:
+            pd_init['gpus'] = desc['gpus']
+
+        if desc['access_schema']:
+            pd_init['access_schema'] = desc['access_schema']
+
+        if desc['queue']:
+            pd_init['queue'] = desc['queue']
+
+        if self._rts_config.get('sandbox_cleanup', None):
+            pd_init['cleanup'] = True
+
+        # Create Compute Pilot with validated resource description
+        return rp.ComputePilotDescription(pd_init)
+
+    def _shared_staging_directives(self):
+
+        shared_staging_directives = list()
+        for data in self._shared_data:
+            temp = {
+                'source': data,
+                'target': 'pilot:///' + os.path.basename(data)
+            }
+            shared_staging_directives.append(temp)
+
+        return shared_staging_directives
+
+    def _wait_for_activation(self):
+        """
+        **Purpose**: Wait for a pilot to go active and set the resource_active event. Tasks placed on the other
+                     pilots wait in the UnitManager until their pilot is active.
+        """
+
+        try:
+
+            while True:
+
+                state = self.get_resource_allocation_state()
+
+                if state == rp.PMGR_ACTIVE:
+
+                    self._prof.prof('resource active', uid=self._uid)
+                    self._logger.info('Pilot is now active')
+                    self._resource_active.set()
+                    break
+
+                if state in self.get_completed_states():
+
+                    self._logger.error('Resource request ended in state %s before a pilot was active' % state)
+                    break
+
+                time.sleep(1)
+
+        except Exception, ex:
+            self._logger.exception('Failed to wait for the resource request, error: %s' % ex)
+
     def _submit_resource_request(self):
         """
         **Purpose**: Create and submits a RADICAL Pilot Job as per the user
-                     provided resource description
+                     provided resource description. The method returns once the pilots are submitted, a thread
+                     waits for them to go active (see wait_for_resource()).
         """
 
         try:
 
             self._prof.prof('creating rreq', uid=self._uid)
+            self._resource_active.clear()
 
             def _pilot_state_cb(pilot, state):
                 self._logger.info('Pilot %s state: %s' % (pilot.uid, state))
@@ -126,53 +232,27 @@ class ResourceManager(Base_ResourceManager):
             self._pmgr = rp.PilotManager(session=self._session)
             self._pmgr.register_callback(_pilot_state_cb)
 
-            pd_init = {
-                'resource': self._resource,
-                'runtime': self._walltime,
-                'cores': self._cpus,
-                'project': self._project,
-            }
-
-            if self._gpus:
-                pd_init['gpus'] = self._gpus
-
-            if self._access_schema:
-                pd_init['access_schema'] = self._access_schema
-
-            if self._queue:
-                pd_init['queue'] = self._queue
-
-            if self._rts_config.get('sandbox_cleanup', None):
-                pd_init['cleanup'] = True
-
-            # Create Compute Pilot with validated resource description
-            pdesc = rp.ComputePilotDescription(pd_init)
+            pdescs = [self._create_pilot_description(desc) for desc in self._pilot_descs]
 
             self._prof.prof('rreq created', uid=self._uid)
 
-            # Launch the pilot
-            self._pilot = self._pmgr.submit_pilots(pdesc)
-
-            self._prof.prof('rreq submitted', uid=self._uid)
+            # Launch the pilots
+            self._pilots = self._pmgr.submit_pilots(pdescs)
+            self._pilot = self._pilots[0]
+            self._pilot_uids = [pilot.uid for pilot in self._pilots]
 
-            shared_staging_directives = list()
-            for data in self._shared_data:
-                temp = {
-                    'source': data,
-                    'target': 'pilot:///' + os.path.basename(data)
-                }
-                shared_staging_directives.append(temp)
+            self._prof.prof('rreq submitted', uid=self._uid, msg=len(self._pilots))
 
-            self._pilot.stage_in(shared_staging_directives)
+            for pilot in self._pilots:
+                pilot.stage_in(self._shared_staging_directives())
 
             self._prof.prof('shared data staging initiated', uid=self._uid)
             self._logger.info('Resource request submission successful.. waiting for pilot to go Active')
 
-            # Wait for pilot to go active
-            self._pilot.wait([rp.PMGR_ACTIVE, rp.FAILED])
-
-            self._prof.prof('resource active', uid=self._uid)
-            self._logger.info('Pilot is now active')
+            self._activation_thread = threading.Thread(target=self._wait_for_activation,
+                                                       name='activation-thread')
+            self._activation_thread.daemon = True
+            self._activation_thread.start()
 
         except KeyboardInterrupt:
 
@@ -187,6 +267,96 @@ class ResourceManager(Base_ResourceManager):
             self._logger.error('Resource request submission failed')
             raise
 
+    def _cancel_pilots_by_uid(self, uids):
+        """
+        **Purpose**: Cancel pilots which were submitted by another process. The PilotManager only cancels the pilots
+                     it submitted itself, the command is sent to the pilots through the database of the session
+                     instead, as done by the pilot launcher of RADICAL Pilot.
+        """
+
+        self._session._dbs.pilot_command('cancel_pilot', [], uids)
+
+    def _get_unit_docs(self, uids):
+        """
+        **Purpose**: Read the documents of units which were submitted by the UnitManager of another process, e.g. of
+                     a tmgr process which died, from the database of the session. The units only report their states
+                     to the UnitManager which submitted them.
+
+        :arguments:
+            :uids: list of unit uids
+        :return: dictionary of unit uid -> unit document, units which are not in the database are missing
+        """
+
+        docs = dict()
+        cursor = self._session.get_db()[self._session.uid].find({'type': 'unit', 'uid': {'$in': list(uids)}},
+                                                                 {'uid': 1, 'name': 1, 'state': 1, 'states': 1,
+                                                                  'target_state': 1, 'unit_sandbox': 1})
+
+        for doc in cursor:
+
+            # The states are pushed by several components, a final state is
+            # not necessarily the last one
+            states = doc.get('states') or [doc.get('state')]
+            for state in [rp.DONE, rp.FAILED, rp.CANCELED]:
+                if state in states:
+                    doc['state'] = state
+                    break
+
+            docs[doc['uid']] = doc
+
+        return docs
+
+    def _add_pilot(self, staging=None):
+        """
+        **Purpose**: Submit a pilot as described by the scaling policy and stage the shared data into it. The pilot
+                     is not waited for, units placed on it wait in the UnitManager until it is active.
+
+        :arguments:
+            :staging: list of additional staging directives, e.g. the inputs shared by the tasks
+        """
+
+        pilot = self._pmgr.submit_pilots(self._create_pilot_description(self._scaling['pilot']))
+        pilot.stage_in(self._shared_staging_directives() + list(staging or list()))
+
+        self._pilots.append(pilot)
+        index = self._pilot_added(pilot.uid)
+
+        self._prof.prof('pilot added', uid=self._uid, msg=pilot.uid)
+        self._logger.info('Added pilot %s, %s pilots in total' % (pilot.uid, len(self._pilot_descs)))
+
+        return index
+
+    def _pilot_added(self, uid=None):
+
+        self._pilot_uids.append(uid)
+
+        return super(ResourceManager, self)._pilot_added(uid)
+
+    def _retire_pilot(self, index):
+        """
+        **Purpose**: Cancel a pilot which has no units to execute
+        """
+
+        if index in self._retired_pilots:
+            return
+
+        uid = self._pilot_uids[index]
+        pilots = dict([(pilot.uid, pilot) for pilot in self._pilots])
+
+        # Cancelling a pilot through the PilotManager waits until it is
+        # cancelled, the caller (the synchronizer of the AppManager) does not
+        if uid in pilots:
+            thread = threading.Thread(target=pilots[uid].cancel, name='cancel-%s' % uid)
+            thread.daemon = True
+            thread.start()
+        else:
+            self._cancel_pilots_by_uid([uid])
+
+        self._pilot_retired(index)
+
+        self._prof.prof('pilot retired', uid=self._uid, msg=uid)
+        self._logger.info('Retired pilot %s' % uid)
+
     def _terminate_resource_request(self):
         """
         **Purpose**: Cancel the RADICAL Pilot Job
@@ -194,10 +364,22 @@ class ResourceManager(Base_ResourceManager):
 
         try:
 
-            if self._pilot:
+            if self._pilots:
 
                 self._prof.prof('canceling resource allocation', uid=self._uid)
-                self._pilot.cancel()
+
+                # Pilots added by the TaskManager are not known to the PilotManager
+                own = [pilot.uid for pilot in self._pilots]
+                active = [uid for index, uid in enumerate(self._pilot_uids) if index not in self._retired_pilots]
+                submitted = [uid for uid in active if uid in own]
+                added = [uid for uid in active if uid not in own]
+
+                if submitted:
+                    self._pmgr.cancel_pilots(submitted)
+
+                if added:
+                    self._cancel_pilots_by_uid(added)
+
                 download_rp_profile = os.environ.get('RADICAL_PILOT_PROFILE', False)
                 self._session.close(cleanup=self._rts_config.get('db_cleanup', False),
                                     download=download_rp_profile)
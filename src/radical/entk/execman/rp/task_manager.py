@@ -6,17 +6,26 @@ import radical.utils as ru
 from radical.entk.exceptions import *
 import threading
 from multiprocessing import Process, Event
+from multiprocessing.pool import ThreadPool
 from radical.entk import states, Task
 from radical.entk.utils.init_transition import transition
+from radical.entk.utils.sync_initiator import sync_pilot_with_master
+from radical.entk.utils.profiler import Profiler
+from radical.entk.utils.metrics import get_registry, SIZE_BUCKETS
+from radical.entk.utils.journal import Journal
+from radical.entk.utils.placement import Placement
+from radical.entk.utils.scaling import Scaler, GROW, SHRINK
 import time
 import json
 import pika
 import os
 import radical.pilot as rp
-from task_processor import create_cud_from_task, create_task_from_cu
+from task_processor import create_cud_from_task, create_task_from_cu, create_task_from_unit_doc, resume_units, \
+    PlaceholderIndex, SharedInputs
 from ..base.task_manager import Base_TaskManager
 import Queue
 import traceback
+from collections import OrderedDict
 
 
 class TaskManager(Base_TaskManager):
@@ -52,6 +61,19 @@ class TaskManager(Base_TaskManager):
         self._umgr = None
         self._rts_runner = None
         self._rmq_ping_interval = os.getenv('RMQ_PING_INTERVAL', 10)
+
+        # CUDs of a bulk of tasks are built by a pool of threads in chunks,
+        # every chunk is submitted as soon as it is built
+        self._cud_workers = int(os.getenv('ENTK_CUD_WORKERS', 4))
+        self._cud_chunk_size = int(os.getenv('ENTK_CUD_CHUNK_SIZE', 1024))
+
+        # Files uploaded by more tasks than this are staged once into the
+        # pilot sandbox and linked by the tasks, 0 disables the sharing
+        self._shared_input_threshold = int(os.getenv('ENTK_SHARED_INPUT_THRESHOLD', 16))
+
+        # Seconds between the polls of the states of the units which a
+        # previous tmgr process submitted
+        self._orphan_poll_interval = float(os.getenv('ENTK_ORPHAN_POLL_INTERVAL', 10))
         self._logger.info('Created task manager object: %s' % self._uid)
         self._prof.prof('tmgr obj created', uid=self._uid)
 
@@ -80,8 +102,18 @@ class TaskManager(Base_TaskManager):
         **Details**: The AppManager can re-invoke the tmgr process with this function if the execution of the workflow is
         still incomplete. There is also population of a dictionary, placeholder_dict, which stores the path of each of
         the tasks on the remote machine.
+
+        The tasks held by the process are recorded in a journal in the session directory. A re-invoked tmgr recovers
+        the tasks of the previous process from it: tasks which were not submitted are submitted again, the units which
+        the previous process submitted are watched through the database of the session (see `resume_units()`).
         """
 
+        # Bound before the setup, which can fail at any step
+        local_prof = None
+        metrics = None
+        mq_connection = None
+        journal = None
+
         try:
 
             def heartbeat_response(mq_channel):
@@ -111,9 +143,13 @@ class TaskManager(Base_TaskManager):
                         'Failed to respond to heartbeat request, error: %s' % ex)
                     raise
 
-            local_prof = ru.Profiler(
+            local_prof = Profiler(
                 name='radical.entk.%s' % self._uid + '-proc', path=self._path)
             local_prof.prof('tmgr process started', uid=self._uid)
+
+            metrics = get_registry()
+            metrics.start_exporter(path='%s/radical.entk.%s.prom' % (self._path, self._uid), name=self._uid)
+
             logger.info('Task Manager process started')
 
             # Acquire a connection+channel to the rmq server
@@ -128,6 +164,21 @@ class TaskManager(Base_TaskManager):
             # Queue for communication between threads of this process
             task_queue = Queue.Queue()
 
+            # Tasks held by a previous tmgr process of this TaskManager
+            journal = Journal('%s/radical.entk.%s.journal' % (self._path, uid))
+            unsubmitted, in_flight = journal.recover()
+
+            if unsubmitted or in_flight:
+
+                logger.info('Recovered %s unsubmitted and %s submitted tasks from %s' % (len(unsubmitted),
+                                                                                       len(in_flight),
+                                                                                       journal.path))
+                local_prof.prof('tmgr tasks recovered', uid=uid,
+                                msg='%s/%s' % (len(unsubmitted), len(in_flight)))
+
+            if unsubmitted:
+                task_queue.put(unsubmitted)
+
             # Start second thread to receive tasks and push to RTS
             self._rts_runner = threading.Thread(target=self._process_tasks,
                                                 args=(task_queue,
@@ -136,7 +187,9 @@ class TaskManager(Base_TaskManager):
                                                       mq_hostname,
                                                       port,
                                                       local_prof,
-                                                      self._sid))
+                                                      self._sid,
+                                                      journal,
+                                                      in_flight))
             self._rts_runner.start()
 
             local_prof.prof('tmgr infrastructure setup done', uid=uid)
@@ -152,13 +205,25 @@ class TaskManager(Base_TaskManager):
 
                     if body:
 
-                        body = json.loads(body)
-                        task_queue.put(body)
+                        # Record the tasks before the message is acknowledged,
+                        # tasks which are already in flight are dropped
+                        body = journal.consumed(json.loads(body))
+
+                        if body:
+                            task_queue.put(body)
+
+                        metrics.gauge('entk_tmgr_pending_bulks',
+                                      'Number of bulks of tasks waiting to be submitted').set(task_queue.qsize())
 
                         mq_channel.basic_ack(
                             delivery_tag=method_frame.delivery_tag)
 
-                    heartbeat_response(mq_channel)
+                    # Heartbeat requests are only sent while the tmgr is idle,
+                    # they do not have to be polled in every iteration
+                    now = time.time()
+                    if now - last >= self._hb_tick:
+                        heartbeat_response(mq_channel)
+                        last = now
 
                 except Exception, ex:
                     logger.exception('Error in task execution: %s' % ex)
@@ -176,38 +241,106 @@ class TaskManager(Base_TaskManager):
 
         finally:
 
-            local_prof.prof('terminating tmgr process', uid=uid)
+            if local_prof:
+                local_prof.prof('terminating tmgr process', uid=uid)
 
             if self._rts_runner:
                 self._rts_runner.join()
 
-            mq_connection.close()
-            local_prof.close()
+            if journal:
+                journal.close()
+
+            if mq_connection:
+                mq_connection.close()
+
+            if local_prof:
+                local_prof.close()
+
+            if metrics:
+                metrics.stop_exporter()
 
-    def _process_tasks(self, task_queue, rmgr, logger, mq_hostname, port, local_prof, sid):
+    def _process_tasks(self, task_queue, rmgr, logger, mq_hostname, port, local_prof, sid, journal, in_flight=None):
 
 
         '''
         **Purpose**: The new thread that gets spawned by the main tmgr process invokes this function. This
         function receives tasks from 'task_queue' and submits them to the RADICAL Pilot RTS.
+
+        **Details**: 'in_flight' are the tasks which a previous tmgr process submitted as units but which did not
+        complete (see Journal.recover()). The states of their units are polled from the database of the session every
+        'ENTK_ORPHAN_POLL_INTERVAL' seconds: tasks whose units finished are completed, tasks whose units are missing or
+        failed are resubmitted, live units are polled until they finish.
+
+        The CUDs of a bulk of tasks are built by a pool of threads, in chunks of 'ENTK_CUD_CHUNK_SIZE' tasks. Each
+        chunk is transitioned and submitted by this thread as soon as it is built, while the pool builds the next
+        chunks, so that the first units reach the pilot before the whole bulk was converted.
+
+        If the ResourceManager submitted several pilots, every unit is bound to one of them according to the placement
+        policy of the resource description (see `radical.entk.utils.placement`).
+
+        The resource request is submitted without waiting for the pilots. Tasks are converted while the pilots wait
+        in the batch queue, only their submission waits for a pilot to be active.
+
+        If the resource description has a scaling policy, pilots are added while too many tasks wait and idle pilots
+        are retired once the backlog drained (see `radical.entk.utils.scaling`). The backlog are the tasks received
+        from the WFprocessor which were not submitted yet plus the units in flight beyond the cores of the pilots.
+        Pilots are submitted by this thread, which needs their handles for the UnitManager, and are reported to the
+        AppManager. Retired pilots are cancelled by the AppManager, as are the pilots which a previous tmgr process
+        added: their handles died with it.
         '''
 
-        placeholder_dict = dict()
+        # Paths and units of the completed tasks, indexed by name
+        placeholder_dict = PlaceholderIndex()
 
-        def load_placeholder(task, rts_uid):
+        # Uploaded files which are shared by the tasks
+        shared_inputs = SharedInputs(self._shared_input_threshold)
 
-            parent_pipeline = str(task.parent_pipeline['name'])
-            parent_stage = str(task.parent_stage['name'])
+        # Units are bound to pilots only if there is more than one or if pilots
+        # are added at runtime, task uid -> index of the pilot for the tasks in
+        # flight
+        placement = None
+        placed = dict()
 
-            if parent_pipeline not in placeholder_dict:
-                placeholder_dict[parent_pipeline] = dict()
+        scaler = None
+        if rmgr.scaling:
+            scaler = Scaler(rmgr.scaling)
 
-            if parent_stage not in placeholder_dict[parent_pipeline]:
-                placeholder_dict[parent_pipeline][parent_stage] = dict()
+        if len(rmgr.pilots) > 1 or scaler:
+            placement = Placement(rmgr.placement, rmgr.pilot_descs)
 
-            if None not in [parent_pipeline, parent_stage, task.name]:
-                placeholder_dict[parent_pipeline][parent_stage][str(task.name)] = {'path': str(task.path),
-                                                                                   'rts_uid': rts_uid}
+        def push_completed(task, unit_uid, mq_channel):
+
+            transition(obj=task,
+                       obj_type='Task',
+                       new_state=states.COMPLETED,
+                       channel=mq_channel,
+                       queue='%s-cb-to-sync' % sid,
+                       profiler=local_prof,
+                       logger=logger)
+
+            placeholder_dict.add(task, unit_uid)
+
+            if placement:
+                placement.release(placed.pop(task.uid, None))
+
+            get_registry().counter('entk_tasks_completed_total',
+                                   'Number of tasks completed by the RTS').inc()
+
+            task_as_dict = json.dumps(task.to_dict())
+
+            mq_channel.basic_publish(exchange='',
+                                     routing_key='%s-completedq-1' % sid,
+                                     body=task_as_dict
+                                     # properties=pika.BasicProperties(
+                                     # make message persistent
+                                     #    delivery_mode = 2,
+                                     # )
+                                     )
+
+            logger.info('Pushed task %s with state %s to completed queue %s-completedq-1' % (task.uid, task.state,
+                                                                                             sid))
+
+            journal.completed([task.uid])
 
         def unit_state_cb(unit, state):
 
@@ -225,29 +358,7 @@ class TaskManager(Base_TaskManager):
                     task = None
                     task = create_task_from_cu(unit, local_prof)
 
-                    transition(obj=task,
-                               obj_type='Task',
-                               new_state=states.COMPLETED,
-                               channel=mq_channel,
-                               queue='%s-cb-to-sync' % sid,
-                               profiler=local_prof,
-                               logger=logger)
-
-                    load_placeholder(task, unit.uid)
-
-                    task_as_dict = json.dumps(task.to_dict())
-
-                    mq_channel.basic_publish(exchange='',
-                                             routing_key='%s-completedq-1' % sid,
-                                             body=task_as_dict
-                                             # properties=pika.BasicProperties(
-                                             # make message persistent
-                                             #    delivery_mode = 2,
-                                             # )
-                                             )
-
-                    logger.info('Pushed task %s with state %s to completed queue %s-completedq-1' % (task.uid, task.state,
-                                                                                                     sid))
+                    push_completed(task, unit.uid, mq_channel)
 
                     mq_connection.close()
 
@@ -260,18 +371,146 @@ class TaskManager(Base_TaskManager):
             except Exception, ex:
                 logger.exception('Error in RP callback thread: %s' % ex)
 
+        def build_cuds(chunk):
+
+            bulk_tasks = list()
+            bulk_cuds = list()
+
+            for task in chunk:
+                t = Task()
+                t.from_dict(task)
+                bulk_tasks.append(t)
+                bulk_cuds.append(create_cud_from_task(
+                    t, placeholder_dict, local_prof, shared_inputs.staged))
+
+            return bulk_tasks, bulk_cuds
+
+        def poll_orphans():
+
+            # Units only report to the UnitManager which submitted them, which
+            # died with the previous tmgr process: their states are read from
+            # the database of the session until they finished
+            try:
+                docs = rmgr._get_unit_docs([entry['unit'] for entry in orphans.itervalues()])
+
+            except Exception, ex:
+                logger.warning('States of the units of the previous tmgr not read: %s' % ex)
+                return
+
+            completed, resubmit, live = resume_units(orphans, docs)
+
+            for doc in completed:
+                push_completed(create_task_from_unit_doc(doc, local_prof), doc['uid'], mq_channel)
+
+            if resubmit:
+                logger.info('Resubmitting %s tasks of the previous tmgr' % len(resubmit))
+                task_queue.put(resubmit)
+
+            orphans.clear()
+            orphans.update(live)
+
+            if not orphans:
+                logger.info('All units of the previous tmgr finished')
+
+        def retire(index):
+
+            # The pilot is cancelled by the AppManager
+            sync_pilot_with_master(SHRINK, index, rmgr.pilot_uids[index], mq_channel, '%s-tmgr-to-sync' % sid,
+                                   logger, local_prof)
+            rmgr._pilot_retired(index)
+
+            for pilot in list(pilots):
+                if pilot.uid == rmgr.pilot_uids[index]:
+                    pilots.remove(pilot)
+
+        def scale():
+
+            with task_queue.mutex:
+                unsubmitted = sum([len(bulk) for bulk in task_queue.queue])
+
+            # Cores of pilots which are still queued count as available, so
+            # that no further pilot is added while one is waiting to start
+            backlog = unsubmitted + max(sum(placement.load) - rmgr.cpus, 0)
+            idle = placement.idle()
+
+            decision = scaler.decide(backlog=backlog,
+                                     pilots=len(rmgr.pilot_descs) - len(rmgr.retired_pilots),
+                                     idle=len(idle))
+
+            if decision == GROW:
+
+                # New pilots also get the inputs which the tasks link
+                logger.info('Backlog of %s tasks, adding a pilot' % backlog)
+                index = rmgr._add_pilot(staging=[{'source': source, 'target': target}
+                                                 for source, target in shared_inputs.staged.iteritems()])
+                sync_pilot_with_master(GROW, index, rmgr.pilot_uids[index], mq_channel, '%s-tmgr-to-sync' % sid,
+                                       logger, local_prof)
+                placement.add(rmgr.pilot_descs[index])
+                pilots.append(rmgr.pilots[-1])
+                umgr.add_pilots(rmgr.pilots[-1])
+
+            elif decision == SHRINK:
+
+                # Pilots added last are retired first
+                index = idle[-1]
+                logger.info('No backlog, retiring pilot %s' % rmgr.pilot_uids[index])
+                placement.retire(index)
+                umgr.remove_pilots(rmgr.pilot_uids[index])
+                retire(index)
+
+            if decision:
+                get_registry().gauge('entk_pilots',
+                                     'Number of pilots which are not retired').set(len(rmgr.pilot_descs) -
+                                                                                   len(rmgr.retired_pilots))
+
+        # Pilots of which this process has a handle and which are not retired
+        pilots = [pilot for pilot in rmgr.pilots
+                  if rmgr.pilot_uids.index(pilot.uid) not in rmgr.retired_pilots]
+
         umgr = rp.UnitManager(session=rmgr._session)
-        umgr.add_pilots(rmgr.pilot)
+        if pilots:
+            umgr.add_pilots(pilots)
         umgr.register_callback(unit_state_cb)
 
         mq_connection = pika.BlockingConnection(
             pika.ConnectionParameters(host=mq_hostname, port=port))
         mq_channel = mq_connection.channel()
 
+        pool = ThreadPool(self._cud_workers)
+        chunk_size = max(self._cud_chunk_size, 1)
+
         try:
 
+            # Pilots which were retired or added by a previous tmgr process
+            # are not placed on
+            if placement:
+
+                handles = [pilot.uid for pilot in pilots]
+
+                for index, uid in enumerate(rmgr.pilot_uids):
+
+                    if index in rmgr.retired_pilots:
+                        placement.retire(index)
+
+                    elif uid not in handles:
+                        logger.info('Retiring pilot %s of the previous tmgr' % uid)
+                        placement.retire(index)
+                        retire(index)
+
+            # Units of the previous tmgr process which did not finish, task uid
+            # -> entry of the journal
+            orphans = OrderedDict(in_flight or dict())
+            last_poll = None
+
             while not self._tmgr_terminate.is_set():
 
+                if orphans and (last_poll is None or time.time() - last_poll >= self._orphan_poll_interval):
+                    poll_orphans()
+                    last_poll = time.time()
+
+                if scaler:
+                    scale()
+
                 body = None
 
                 try:
@@ -284,35 +523,78 @@ class TaskManager(Base_TaskManager):
 
                     task_queue.task_done()
 
-                    bulk_tasks = list()
-                    bulk_cuds = list()
+                    metrics = get_registry()
+                    metrics.histogram('entk_tmgr_batch_size',
+                                      'Number of tasks per bulk submitted to the RTS',
+                                      buckets=SIZE_BUCKETS).observe(len(body))
+
+                    shared = shared_inputs.update(body)
+
+                    if shared:
+
+                        try:
+                            local_prof.prof('shared input staging start', uid=self._uid, msg=len(shared))
+                            for pilot in pilots:
+                                pilot.stage_in(shared)
+                            shared_inputs.commit(shared)
+                            local_prof.prof('shared input staging stop', uid=self._uid, msg=len(shared))
+
+                            logger.info('Staged %s inputs of many tasks into the pilot sandbox' % len(shared))
+
+                        except Exception, ex:
+                            logger.warning('Staging of shared inputs failed, tasks upload them: %s' % ex)
+
+                    chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)]
 
-                    for task in body:
-                        t = Task()
-                        t.from_dict(task)
-                        bulk_tasks.append(t)
-                        bulk_cuds.append(create_cud_from_task(
-                            t, placeholder_dict, local_prof))
+                    # Chunks are returned in order, as soon as they are built
+                    for bulk_tasks, bulk_cuds in pool.imap(build_cuds, chunks):
 
-                        transition(obj=t,
-                                   obj_type='Task',
-                                   new_state=states.SUBMITTING,
-                                   channel=mq_channel,
-                                   queue='%s-tmgr-to-sync' % sid,
-                                   profiler=local_prof,
-                                   logger=logger)
+                        # The pool keeps building chunks while the pilot is
+                        # not active yet
+                        if not rmgr.wait_for_resource(timeout=0):
 
-                    umgr.submit_units(bulk_cuds)
+                            local_prof.prof('waiting for resource', uid=self._uid)
+                            while not rmgr.wait_for_resource(timeout=1):
+                                if self._tmgr_terminate.is_set():
+                                    return
+                            local_prof.prof('resource available', uid=self._uid)
 
-                    for task in bulk_tasks:
+                        for task in bulk_tasks:
 
-                        transition(obj=task,
-                                   obj_type='Task',
-                                   new_state=states.SUBMITTED,
-                                   channel=mq_channel,
-                                   queue='%s-tmgr-to-sync' % sid,
-                                   profiler=local_prof,
-                                   logger=logger)
+                            transition(obj=task,
+                                       obj_type='Task',
+                                       new_state=states.SUBMITTING,
+                                       channel=mq_channel,
+                                       queue='%s-tmgr-to-sync' % sid,
+                                       profiler=local_prof,
+                                       logger=logger)
+
+                        if placement:
+
+                            for task, cud in zip(bulk_tasks, bulk_cuds):
+                                index = placement.place(task)
+                                placed[task.uid] = index
+                                cud.pilot = rmgr.pilot_uids[index]
+
+                            metrics.gauge('entk_tmgr_pilot_load',
+                                          'Number of tasks in flight on the busiest pilot').set(max(placement.load))
+
+                        units = umgr.submit_units(bulk_cuds)
+
+                        journal.submitted(dict([(task.uid, unit.uid) for task, unit in zip(bulk_tasks, units)]))
+
+                        metrics.counter('entk_tasks_submitted_total',
+                                        'Number of tasks submitted to the RTS').inc(len(bulk_cuds))
+
+                        for task in bulk_tasks:
+
+                            transition(obj=task,
+                                       obj_type='Task',
+                                       new_state=states.SUBMITTED,
+                                       channel=mq_channel,
+                                       queue='%s-tmgr-to-sync' % sid,
+                                       profiler=local_prof,
+                                       logger=logger)
 
         except KeyboardInterrupt as ex:
             logger.error('Execution interrupted by user (you probably hit Ctrl+C), ' +
@@ -322,6 +604,10 @@ class TaskManager(Base_TaskManager):
             print traceback.format_exc()
             raise EnTKError(ex)
 
+        finally:
+            pool.terminate()
+            pool.join()
+
     # ------------------------------------------------------------------------------------------------------------------
     # Public Methods
     # ------------------------------------------------------------------------------------------------------------------
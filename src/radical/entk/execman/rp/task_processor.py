@@ -2,9 +2,183 @@ import radical.pilot as rp
 from radical.entk import Task
 import radical.utils as ru
 from radical.entk.exceptions import *
+from radical.entk.utils.logger import get_logger
+import hashlib
 import os
 
-logger = ru.Logger('radical.entk.task_processor')
+logger = get_logger('radical.entk.task_processor')
+
+
+# Parsed task placeholders: '$Pipeline_(pipeline_name)_Stage_(stage_name)_Task_(task_name)' -> names. The same
+# placeholders are referenced by many tasks, the cache is reset when it grows beyond the limit.
+_parsed_placeholders = dict()
+_MAX_PARSED_PLACEHOLDERS = 100000
+
+
+class PlaceholderIndex(dict):
+
+    """
+    Index of the tasks that completed execution, used to resolve the placeholders and tags of tasks submitted later.
+    It is a dictionary with the structure expected by the functions of this module:
+
+        {pipeline_name: {stage_name: {task_name: {'path': ..., 'rts_uid': ...}}}}
+
+    In addition, the tasks are indexed by name so that tags are resolved without a scan of all tasks. Tasks have to be
+    added with 'add()' to be found by their tags.
+    """
+
+    def __init__(self, *args, **kwargs):
+
+        super(PlaceholderIndex, self).__init__(*args, **kwargs)
+
+        # task name -> {pipeline name: rts_uid}
+        self._tags = dict()
+
+        for pipeline_name, stages in self.iteritems():
+            for tasks in stages.itervalues():
+                for task_name, entry in tasks.iteritems():
+                    self._tags.setdefault(task_name, dict())[pipeline_name] = entry['rts_uid']
+
+    def add(self, task, rts_uid):
+        """
+        **Purpose**: Add a task which completed execution on the RTS.
+
+        :arguments:
+            :task: EnTK Task object, with path and parent pipeline and stage
+            :rts_uid: uid of the unit that executed the task
+        """
+
+        pipeline_name = str(task.parent_pipeline['name'])
+        stage_name = str(task.parent_stage['name'])
+
+        if task.name is None:
+            return
+
+        task_name = str(task.name)
+
+        self.setdefault(pipeline_name, dict()).setdefault(stage_name, dict())[task_name] = {'path': str(task.path),
+                                                                                            'rts_uid': rts_uid}
+        self._tags.setdefault(task_name, dict())[pipeline_name] = rts_uid
+
+    def find_tag(self, tag, parent_pipeline_name):
+        """
+        **Purpose**: rts_uid of the task with the name 'tag', preferably of the parent pipeline. None if no such task
+        completed.
+        """
+
+        pipelines = self._tags.get(tag)
+
+        if not pipelines:
+            return None
+
+        if parent_pipeline_name in pipelines:
+            return pipelines[parent_pipeline_name]
+
+        return next(pipelines.itervalues())
+
+
+class SharedInputs(object):
+
+    """
+    Inputs uploaded by many tasks. Once more than 'threshold' tasks referenced the same file in their
+    upload_input_data, the file is staged once into the pilot sandbox and the upload directives of all later tasks
+    are replaced by links to the staged file.
+
+    :arguments:
+        :threshold: number of references after which a file is shared, 0 disables sharing
+    """
+
+    def __init__(self, threshold):
+
+        self._threshold = threshold
+
+        # source -> number of references, for files which are not shared yet
+        self._counts = dict()
+
+        # source -> location in the pilot sandbox
+        self._staged = dict()
+
+    @property
+    def staged(self):
+        """
+        :getter: dictionary of source -> location in the pilot sandbox of the files which are shared
+        """
+        return self._staged
+
+    def update(self, tasks):
+        """
+        **Purpose**: Count the references of the tasks to uploaded files.
+
+        :arguments:
+            :tasks: list of task dictionaries
+        :return: list of pilot staging directives of the files which have to be shared from now on
+        """
+
+        if not self._threshold:
+            return list()
+
+        directives = list()
+
+        for task in tasks:
+
+            for entry in task.get('upload_input_data') or list():
+
+                # Files of other tasks are not shared
+                if '$' in entry:
+                    continue
+
+                source = entry.split('>')[0].strip()
+
+                if source in self._staged:
+                    continue
+
+                count = self._counts.get(source, 0) + 1
+                self._counts[source] = count
+
+                if count == self._threshold + 1:
+
+                    # Files with the same name in different directories must not collide
+                    digest = hashlib.md5(source.encode('utf-8')).hexdigest()[:12]
+                    directives.append({'source': source,
+                                       'target': 'pilot:///%s.%s' % (digest, os.path.basename(source))})
+
+        return directives
+
+    def commit(self, directives):
+        """
+        **Purpose**: Mark files as shared once they were staged into the pilot sandbox.
+        """
+
+        for directive in directives:
+            self._staged[directive['source']] = directive['target']
+            self._counts.pop(directive['source'], None)
+
+
+def _parse_placeholder(placeholder):
+    """
+    **Purpose**: Split a task placeholder into the names of its pipeline, stage and task.
+
+    :return: tuple of names, None if the placeholder does not have the expected format
+    """
+
+    names = _parsed_placeholders.get(placeholder)
+
+    if names:
+        return names
+
+    broken_placeholder = placeholder.split('_')
+
+    if not len(broken_placeholder) == 6:
+        return None
+
+    names = (broken_placeholder[1], broken_placeholder[3], broken_placeholder[5])
+
+    if len(_parsed_placeholders) >= _MAX_PARSED_PLACEHOLDERS:
+        _parsed_placeholders.clear()
+
+    _parsed_placeholders[placeholder] = names
+
+    return names
 
 
 def resolve_placeholders(path, placeholder_dict):
@@ -29,13 +203,15 @@ def resolve_placeholders(path, placeholder_dict):
             return path
 
         # Extract placeholder from path
-        if len(path.split('>')) == 1:
+        parts = path.split('>')
+
+        if len(parts) == 1:
             placeholder = path.split('/')[0]
         else:
-            if path.split('>')[0].strip().startswith('$'):
-                placeholder = path.split('>')[0].strip().split('/')[0]
+            if parts[0].strip().startswith('$'):
+                placeholder = parts[0].strip().split('/')[0]
             else:
-                placeholder = path.split('>')[1].strip().split('/')[0]
+                placeholder = parts[1].strip().split('/')[0]
 
         # SHARED
         if placeholder == "$SHARED":
@@ -44,34 +220,34 @@ def resolve_placeholders(path, placeholder_dict):
         # Expected placeholder format:
         # $Pipeline_{pipeline.uid}_Stage_{stage.uid}_Task_{task.uid}
 
-        broken_placeholder = placeholder.split('/')[0].split('_')
+        names = _parse_placeholder(placeholder)
 
-        if not len(broken_placeholder) == 6:
+        if not names:
             raise ValueError(
                 obj='placeholder',
                 attribute='task',
                 expected_value='$Pipeline_(pipeline_name)_Stage_(stage_name)_Task_(task_name) or $SHARED',
-                actual_value=broken_placeholder)
+                actual_value=placeholder.split('_'))
 
-        pipeline_name = broken_placeholder[1]
-        stage_name = broken_placeholder[3]
-        task_name = broken_placeholder[5]
+        pipeline_name, stage_name, task_name = names
         resolved_placeholder = None
 
-        if pipeline_name in placeholder_dict.keys():
-            if stage_name in placeholder_dict[pipeline_name].keys():
-                if task_name in placeholder_dict[pipeline_name][stage_name].keys():
-                    resolved_placeholder = path.replace(placeholder, placeholder_dict[
-                                                        pipeline_name][stage_name][task_name]['path'])
-                else:
-                    logger.warning('%s not assigned to any task in Stage %s Pipeline %s' %
-                                   (task_name, stage_name, pipeline_name))
-            else:
-                logger.warning('%s not assigned to any Stage in Pipeline %s' % (
-                    stage_name, pipeline_name))
-        else:
+        stages = placeholder_dict.get(pipeline_name)
+
+        if stages is None:
             logger.warning('%s not assigned to any Pipeline' % (pipeline_name))
 
+        elif stage_name not in stages:
+            logger.warning('%s not assigned to any Stage in Pipeline %s' % (
+                stage_name, pipeline_name))
+
+        elif task_name not in stages[stage_name]:
+            logger.warning('%s not assigned to any task in Stage %s Pipeline %s' %
+                           (task_name, stage_name, pipeline_name))
+
+        else:
+            resolved_placeholder = path.replace(placeholder, stages[stage_name][task_name]['path'])
+
         if not resolved_placeholder:
             logger.warning('No placeholder could be found for task name %s \
                         stage name %s and pipeline name %s. Please be sure to \
@@ -81,7 +257,7 @@ def resolve_placeholders(path, placeholder_dict):
                 obj='placeholder',
                 attribute='task',
                 expected_value='$Pipeline_(pipeline_name)_Stage_(stage_name)_Task_(task_name) or $SHARED',
-                actual_value=broken_placeholder)
+                actual_value=placeholder.split('_'))
 
         return resolved_placeholder
 
@@ -109,18 +285,17 @@ def resolve_arguments(args, placeholder_dict):
                 entry = entry.replace(placeholder, '$RP_PILOT_STAGING')
 
             elif placeholder.startswith('$Pipeline'):
-                broken_placeholder = placeholder.split('_')
 
-                if not len(broken_placeholder) == 6:
+                names = _parse_placeholder(placeholder)
+
+                if not names:
                     raise ValueError(
                         obj='placeholder',
                         attribute='length',
                         expected_value='$Pipeline_{pipeline.uid}_Stage_{stage.uid}_Task_{task.uid} or $SHARED',
-                        actual_value=broken_placeholder)
+                        actual_value=placeholder.split('_'))
 
-                pipeline_name = broken_placeholder[1]
-                stage_name = broken_placeholder[3]
-                task_name = broken_placeholder[5]
+                pipeline_name, stage_name, task_name = names
 
                 try:
                     entry = entry.replace(
@@ -137,6 +312,15 @@ def resolve_arguments(args, placeholder_dict):
 
 def resolve_tags(tag, parent_pipeline_name, placeholder_dict):
 
+    if isinstance(placeholder_dict, PlaceholderIndex):
+
+        rts_uid = placeholder_dict.find_tag(tag, parent_pipeline_name)
+
+        if rts_uid:
+            return rts_uid
+
+        raise EnTKError(msg="Tag %s cannot be used as no previous task with that name is found" % tag)
+
     # Check self pipeline first
     for stage_name in placeholder_dict[parent_pipeline_name].keys():
         for task_name in placeholder_dict[parent_pipeline_name][stage_name].keys():
@@ -154,111 +338,77 @@ def resolve_tags(tag, parent_pipeline_name, placeholder_dict):
 
 
 
-def get_input_list_from_task(task, placeholder_dict):
+def _get_staging_list(task, attributes, placeholder_dict, shared_inputs=None):
     """
-    Purpose: Parse a Task object to extract the files to be staged as the output.
-
-    Details: The extracted data is then converted into the appropriate RP directive depending on whether the data
-    is to be copied/downloaded.
-
-    :arguments:
-        :task: EnTK Task object
-        :placeholder_dict: dictionary holding the values for placeholders
-
-    :return: list of RP directives for the files that need to be staged out
+    Purpose: Convert the staging directives of the given staging attributes of a Task into RP directives. Only
+    directives with placeholders need work, all others were parsed when they were assigned to the Task. Uploads of
+    files in 'shared_inputs' (source -> location in the pilot sandbox) are replaced by links.
     """
 
-    try:
-
-        if not isinstance(task, Task):
-            raise TypeError(expected_type=Task, actual_type=type(task))
-
-        input_data = []
+    # Transfers (upload/download) are the default action of RP
+    actions = {'copy': rp.COPY, 'link': rp.LINK, 'move': rp.MOVE}
 
-        if task.link_input_data:
+    staging = list()
 
-            for path in task.link_input_data:
+    for attribute in attributes:
 
-                path = resolve_placeholders(path, placeholder_dict)
+        for directive in task.staging_directives(attribute):
 
-                if len(path.split('>')) > 1:
+            source = directive.source
+            target = directive.target
 
-                    temp = {
-                        'source': path.split('>')[0].strip(),
-                        'target': path.split('>')[1].strip(),
-                        'action': rp.LINK
-                    }
-                else:
-                    temp = {
-                        'source': path.split('>')[0].strip(),
-                        'target': os.path.basename(path.split('>')[0].strip()),
-                        'action': rp.LINK
-                    }
-                input_data.append(temp)
+            if directive.has_placeholder:
 
-        if task.upload_input_data:
+                if '$' in source:
+                    source = resolve_placeholders(source, placeholder_dict)
 
-            for path in task.upload_input_data:
+                if target is None:
+                    target = os.path.basename(source)
 
-                path = resolve_placeholders(path, placeholder_dict)
+                elif '$' in target:
+                    target = resolve_placeholders(target, placeholder_dict)
 
-                if len(path.split('>')) > 1:
+            temp = {
+                'source': source,
+                'target': target
+            }
 
-                    temp = {
-                        'source': path.split('>')[0].strip(),
-                        'target': path.split('>')[1].strip()
-                    }
-                else:
-                    temp = {
-                        'source': path.split('>')[0].strip(),
-                        'target': os.path.basename(path.split('>')[0].strip())
-                    }
-                input_data.append(temp)
+            if directive.action in actions:
+                temp['action'] = actions[directive.action]
 
-        if task.copy_input_data:
+            elif shared_inputs and source in shared_inputs:
+                temp['source'] = shared_inputs[source]
+                temp['action'] = rp.LINK
 
-            for path in task.copy_input_data:
+            staging.append(temp)
 
-                path = resolve_placeholders(path, placeholder_dict)
+    return staging
 
-                if len(path.split('>')) > 1:
 
-                    temp = {
-                        'source': path.split('>')[0].strip(),
-                        'target': path.split('>')[1].strip(),
-                        'action': rp.COPY
-                    }
-                else:
-                    temp = {
-                        'source': path.split('>')[0].strip(),
-                        'target': os.path.basename(path.split('>')[0].strip()),
-                        'action': rp.COPY
-                    }
-                input_data.append(temp)
-
-        if task.move_input_data:
+def get_input_list_from_task(task, placeholder_dict, shared_inputs=None):
+    """
+    Purpose: Parse a Task object to extract the files to be staged as the output.
 
-            for path in task.move_input_data:
+    Details: The extracted data is then converted into the appropriate RP directive depending on whether the data
+    is to be copied/downloaded.
 
-                path = resolve_placeholders(path, placeholder_dict)
+    :arguments:
+        :task: EnTK Task object
+        :placeholder_dict: dictionary holding the values for placeholders
+        :shared_inputs: dictionary of uploaded files which were staged into the pilot sandbox (see SharedInputs)
 
-                if len(path.split('>')) > 1:
+    :return: list of RP directives for the files that need to be staged out
+    """
 
-                    temp = {
-                        'source': path.split('>')[0].strip(),
-                        'target': path.split('>')[1].strip(),
-                        'action': rp.MOVE
-                    }
-                else:
-                    temp = {
-                        'source': path.split('>')[0].strip(),
-                        'target': os.path.basename(path.split('>')[0].strip()),
-                        'action': rp.MOVE
-                    }
+    try:
 
-                input_data.append(temp)
+        if not isinstance(task, Task):
+            raise TypeError(expected_type=Task, actual_type=type(task))
 
-        return input_data
+        return _get_staging_list(task, ['link_input_data',
+                                        'upload_input_data',
+                                        'copy_input_data',
+                                        'move_input_data'], placeholder_dict, shared_inputs)
 
     except Exception, ex:
 
@@ -287,72 +437,9 @@ def get_output_list_from_task(task, placeholder_dict):
         if not isinstance(task, Task):
             raise TypeError(expected_type=Task, actual_type=type(task))
 
-        output_data = []
-
-        if task.copy_output_data:
-
-            for path in task.copy_output_data:
-
-                path = resolve_placeholders(path, placeholder_dict)
-
-                if len(path.split('>')) > 1:
-
-                    temp = {
-                        'source': path.split('>')[0].strip(),
-                        'target': path.split('>')[1].strip(),
-                        'action': rp.COPY
-                    }
-                else:
-                    temp = {
-                        'source': path.split('>')[0].strip(),
-                        'target': os.path.basename(path.split('>')[0].strip()),
-                        'action': rp.COPY
-                    }
-                output_data.append(temp)
-
-        if task.download_output_data:
-
-            for path in task.download_output_data:
-
-                path = resolve_placeholders(path, placeholder_dict)
-
-                if len(path.split('>')) > 1:
-
-                    temp = {
-                        'source': path.split('>')[0].strip(),
-                        'target': path.split('>')[1].strip()
-                    }
-                else:
-                    temp = {
-                        'source': path.split('>')[0].strip(),
-                        'target': os.path.basename(path.split('>')[0].strip())
-                    }
-                output_data.append(temp)
-
-        if task.move_output_data:
-
-            for path in task.move_output_data:
-
-                path = resolve_placeholders(path, placeholder_dict)
-
-                if len(path.split('>')) > 1:
-
-                    temp = {
-                        'source': path.split('>')[0].strip(),
-                        'target': path.split('>')[1].strip(),
-                        'action': rp.MOVE
-                    }
-                else:
-                    temp = {
-                        'source': path.split('>')[0].strip(),
-                        'target': os.path.basename(path.split('>')[0].strip()),
-                        'action': rp.MOVE
-                    }
-
-                output_data.append(temp)
-
-
-        return output_data
+        return _get_staging_list(task, ['copy_output_data',
+                                        'download_output_data',
+                                        'move_output_data'], placeholder_dict)
 
     except Exception, ex:
         logger.error(
@@ -360,13 +447,14 @@ def get_output_list_from_task(task, placeholder_dict):
         raise
 
 
-def create_cud_from_task(task, placeholder_dict, prof=None):
+def create_cud_from_task(task, placeholder_dict, prof=None, shared_inputs=None):
     """
     Purpose: Create a Compute Unit description based on the defined Task.
 
     :arguments:
         :task: EnTK Task object
         :placeholder_dict: dictionary holding the values for placeholders
+        :shared_inputs: dictionary of uploaded files which were staged into the pilot sandbox (see SharedInputs)
 
     :return: ComputeUnitDescription
     """
@@ -408,7 +496,7 @@ def create_cud_from_task(task, placeholder_dict, prof=None):
         if task.stderr:
             cud.stderr = task.stderr
 
-        cud.input_staging = get_input_list_from_task(task, placeholder_dict)
+        cud.input_staging = get_input_list_from_task(task, placeholder_dict, shared_inputs)
         cud.output_staging = get_output_list_from_task(task, placeholder_dict)
 
         if prof:
@@ -423,6 +511,35 @@ def create_cud_from_task(task, placeholder_dict, prof=None):
         raise
 
 
+def _create_task(name, rts_uid, state, sandbox, prof=None):
+
+    uid = name.split(',')[0].strip()
+
+    if prof:
+        prof.prof('task from cu - create', uid=uid)
+
+    task = Task()
+    task.uid = uid
+    task.name = name.split(',')[1].strip()
+    task.parent_stage['uid'] = name.split(',')[2].strip()
+    task.parent_stage['name'] = name.split(',')[3].strip()
+    task.parent_pipeline['uid'] = name.split(',')[4].strip()
+    task.parent_pipeline['name'] = name.split(',')[5].strip()
+    task.rts_uid = rts_uid
+
+    if state == rp.DONE:
+        task.exit_code = 0
+    else:
+        task.exit_code = 1
+
+    task.path = ru.Url(sandbox).path
+
+    if prof:
+        prof.prof('task from cu - done', uid=uid)
+
+    return task
+
+
 def create_task_from_cu(cu, prof=None):
     """
     Purpose: Create a Task based on the Compute Unit.
@@ -443,28 +560,7 @@ def create_task_from_cu(cu, prof=None):
 
         logger.debug('Create Task from CU %s' % cu.name)
 
-        if prof:
-            prof.prof('task from cu - create',
-                      uid=cu.name.split(',')[0].strip())
-
-        task = Task()
-        task.uid = cu.name.split(',')[0].strip()
-        task.name = cu.name.split(',')[1].strip()
-        task.parent_stage['uid'] = cu.name.split(',')[2].strip()
-        task.parent_stage['name'] = cu.name.split(',')[3].strip()
-        task.parent_pipeline['uid'] = cu.name.split(',')[4].strip()
-        task.parent_pipeline['name'] = cu.name.split(',')[5].strip()
-        task.rts_uid = cu.uid
-
-        if cu.state == rp.DONE:
-            task.exit_code = 0
-        else:
-            task.exit_code = 1
-
-        task.path = ru.Url(cu.sandbox).path
-
-        if prof:
-            prof.prof('task from cu - done', uid=cu.name.split(',')[0].strip())
+        task = _create_task(cu.name, cu.uid, cu.state, cu.sandbox, prof)
 
         logger.debug('Task %s created from CU %s' % (task.uid, cu.name))
 
@@ -473,3 +569,80 @@ def create_task_from_cu(cu, prof=None):
     except Exception, ex:
         logger.error('Task creation from CU failed, error: %s' % ex)
         raise
+
+
+def create_task_from_unit_doc(doc, prof=None):
+    """
+    Purpose: Create a Task based on the database document of a Compute Unit, for units of which no handle exists
+    in this process (see resume_units()).
+
+    :arguments:
+        :doc: unit document with at least the keys 'uid', 'name', 'state' and 'unit_sandbox'
+
+    :return: Task
+    """
+
+    try:
+
+        logger.debug('Create Task from unit document %s' % doc['name'])
+
+        task = _create_task(doc['name'], doc['uid'], doc['state'], doc['unit_sandbox'], prof)
+
+        logger.debug('Task %s created from unit document %s' % (task.uid, doc['name']))
+
+        return task
+
+    except Exception, ex:
+        logger.error('Task creation from unit document failed, error: %s' % ex)
+        raise
+
+
+def resume_units(in_flight, docs):
+    """
+    Purpose: Decide how the tasks whose units were submitted by a previous tmgr process continue, given the
+    documents of these units in the database of the session. The units only report to the UnitManager which
+    submitted them, their states are read from the database instead.
+
+    Details: Tasks whose units reached a final state are completed. Units which are missing or FAILED are resubmitted,
+    as are units which the previous UnitManager did not pass to the agent yet: they were not executed and would never
+    be. A unit which the agent executed waits for the UnitManager to stage its outputs; if its task downloads outputs,
+    they are lost with the previous UnitManager and the task is resubmitted, otherwise the task is completed with the
+    state the agent reported. All other units are live and have to be polled until they finish.
+
+    :arguments:
+        :in_flight: dictionary of task uid -> {'task': task dictionary, 'unit': unit uid} (see Journal.recover())
+        :docs: dictionary of unit uid -> unit document with the keys 'uid', 'name', 'state', 'unit_sandbox' and,
+               once the agent executed the unit, 'target_state'
+
+    :return: tuple of (list of unit documents whose 'state' is final, for the tasks to complete, list of task
+             dictionaries to resubmit, dictionary of task uid -> entry of in_flight for the units which are live)
+    """
+
+    completed = list()
+    resubmit = list()
+    live = dict()
+
+    unpassed = [rp.NEW, rp.UMGR_SCHEDULING_PENDING, rp.UMGR_SCHEDULING,
+                rp.UMGR_STAGING_INPUT_PENDING, rp.UMGR_STAGING_INPUT]
+    executed = [rp.UMGR_STAGING_OUTPUT_PENDING, rp.UMGR_STAGING_OUTPUT]
+
+    for uid, entry in in_flight.iteritems():
+
+        doc = docs.get(entry['unit'])
+        state = doc['state'] if doc else None
+
+        if state in executed and not entry['task'].get('download_output_data'):
+            doc = dict(doc)
+            doc['state'] = doc.get('target_state') or rp.FAILED
+            state = doc['state']
+
+        if state is None or state == rp.FAILED or state in unpassed or state in executed:
+            resubmit.append(entry['task'])
+
+        elif state in rp.FINAL:
+            completed.append(doc)
+
+        else:
+            live[uid] = entry
+
+    return completed, resubmit, live
@@ -2,6 +2,7 @@ import radical.utils as ru
 from radical.entk.exceptions import *
 from radical.entk.task.task import Task
 from radical.entk import states
+from radical.entk.utils.retry import validate_policy, STAGE_POLICY
 from collections import Iterable
 
 
@@ -33,6 +34,9 @@ class Stage(object):
                            'on_true': None,
                            'on_false': None}
 
+        # Retry policy of the tasks of this stage
+        self._retry = None
+
     # ------------------------------------------------------------------------------------------------------------------
     # Getter functions
     # ------------------------------------------------------------------------------------------------------------------
@@ -116,6 +120,27 @@ class Stage(object):
         '''
         return self._post_exec
 
+    @property
+    def retry(self):
+        '''
+        Retry policy of the tasks of the stage which do not have a policy of
+        their own (see Task.retry). In addition, the stage and its pipeline fail
+        as soon as 'max_failures' tasks failed permanently. Following is the
+        expected structure, all keys are optional:
+
+        self._retry = {
+                        |  'max_attempts'   : 3,
+                        |  'backoff'        : 10.0,
+                        |  'backoff_factor' : 2.0,
+                        |  'max_backoff'    : 600.0,
+                        |  'max_failures'   : 5        # None to never fail
+                    }
+
+        Without a policy, failed tasks are resubmitted without limit if the
+        AppManager was created with resubmit_failed=True.
+        '''
+        return self._retry
+
     # ------------------------------------------------------------------------------------------------------------------
     # Setter functions
     # ------------------------------------------------------------------------------------------------------------------
@@ -201,6 +226,14 @@ class Stage(object):
 
         self._on_false = on_false
 
+    @retry.setter
+    def retry(self, val):
+
+        if val is None:
+            self._retry = None
+        else:
+            self._retry = validate_policy(self._uid, val, STAGE_POLICY)
+
     # ------------------------------------------------------------------------------------------------------------------
     # Public methods
     # ------------------------------------------------------------------------------------------------------------------
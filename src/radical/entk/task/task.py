@@ -1,6 +1,24 @@
 import radical.utils as ru
 from radical.entk.exceptions import *
 from radical.entk import states
+from radical.entk.utils.retry import validate_policy, TASK_POLICY
+from collections import namedtuple
+import os
+
+
+# Staging entry of a Task, parsed from 'source [> target]'. The target of
+# entries with a placeholder in their source and without an explicit target is
+# None, it is derived from the resolved source.
+StagingDirective = namedtuple('StagingDirective', ['source', 'target', 'action', 'has_placeholder'])
+
+# Action of the staging directives of each staging attribute of a Task
+STAGING_ACTIONS = {'upload_input_data': 'transfer',
+                   'copy_input_data': 'copy',
+                   'link_input_data': 'link',
+                   'move_input_data': 'move',
+                   'copy_output_data': 'copy',
+                   'move_output_data': 'move',
+                   'download_output_data': 'transfer'}
 
 
 class Task(object):
@@ -60,6 +78,13 @@ class Task(object):
         self._exit_code = None
         self._tag = None
 
+        # Parsed staging attributes: attribute -> (entries, directives)
+        self._staging = dict()
+
+        # Number of times the task was scheduled and its retry policy
+        self._attempts = 0
+        self._retry = None
+
         # Keep track of states attained
         self._state_history = [states.INITIAL]
 
@@ -386,6 +411,38 @@ class Task(object):
 
         return self._tag
 
+    @property
+    def attempts(self):
+        """
+        Number of times the task was scheduled for execution, including the
+        current execution.
+
+        :getter: return the number of attempts of the current task
+        """
+
+        return self._attempts
+
+    @property
+    def retry(self):
+        """
+        Retry policy of the task, which overrides the policy of its stage. A
+        failed task is resubmitted after a delay that grows exponentially, until
+        it was executed 'max_attempts' times. Following is the expected
+        structure, all keys are optional:
+
+        self._retry = {
+                        |  'max_attempts'   : 3,       # None for no limit
+                        |  'backoff'        : 10.0,    # delay of the first retry (s)
+                        |  'backoff_factor' : 2.0,
+                        |  'max_backoff'    : 600.0
+                    }
+
+        :getter: return the retry policy of the current task, None if unset
+        :setter: assign the retry policy of the current task
+        """
+
+        return self._retry
+
     @property
     def parent_stage(self):
         """
@@ -587,6 +644,7 @@ class Task(object):
     @upload_input_data.setter
     def upload_input_data(self, val):
         if isinstance(val, list):
+            self._staging['upload_input_data'] = (list(val), self._parse_staging('upload_input_data', val))
             self._upload_input_data = val
         else:
             raise TypeError(expected_type=list, actual_type=type(val))
@@ -594,6 +652,7 @@ class Task(object):
     @copy_input_data.setter
     def copy_input_data(self, val):
         if isinstance(val, list):
+            self._staging['copy_input_data'] = (list(val), self._parse_staging('copy_input_data', val))
             self._copy_input_data = val
         else:
             raise TypeError(expected_type=list, actual_type=type(val))
@@ -602,6 +661,7 @@ class Task(object):
     @move_input_data.setter
     def move_input_data(self, val):
         if isinstance(val, list):
+            self._staging['move_input_data'] = (list(val), self._parse_staging('move_input_data', val))
             self._move_input_data = val
         else:
             raise TypeError(expected_type=list, actual_type=type(val))
@@ -609,6 +669,7 @@ class Task(object):
     @link_input_data.setter
     def link_input_data(self, val):
         if isinstance(val, list):
+            self._staging['link_input_data'] = (list(val), self._parse_staging('link_input_data', val))
             self._link_input_data = val
         else:
             raise TypeError(expected_type=list, actual_type=type(val))
@@ -616,6 +677,7 @@ class Task(object):
     @copy_output_data.setter
     def copy_output_data(self, val):
         if isinstance(val, list):
+            self._staging['copy_output_data'] = (list(val), self._parse_staging('copy_output_data', val))
             self._copy_output_data = val
         else:
             raise TypeError(expected_type=list, actual_type=type(val))
@@ -624,6 +686,7 @@ class Task(object):
     @move_output_data.setter
     def move_output_data(self, val):
         if isinstance(val, list):
+            self._staging['move_output_data'] = (list(val), self._parse_staging('move_output_data', val))
             self._move_output_data = val
         else:
             raise TypeError(expected_type=list, actual_type=type(val))
@@ -631,6 +694,7 @@ class Task(object):
     @download_output_data.setter
     def download_output_data(self, val):
         if isinstance(val, list):
+            self._staging['download_output_data'] = (list(val), self._parse_staging('download_output_data', val))
             self._download_output_data = val
         else:
             raise TypeError(expected_type=list, actual_type=type(val))
@@ -673,6 +737,13 @@ class Task(object):
             raise TypeError(entity='tag', expected_type=str,
                             actual_type=type(val))
 
+    @retry.setter
+    def retry(self, val):
+        if val is None:
+            self._retry = None
+        else:
+            self._retry = validate_policy(self._uid, val, TASK_POLICY)
+
     @parent_stage.setter
     def parent_stage(self, val):
         if isinstance(val, dict):
@@ -691,6 +762,34 @@ class Task(object):
     # Public methods
     # ------------------------------------------------------------------------------------------------------------------
 
+    def staging_directives(self, attribute):
+        """
+        Staging entries of a staging attribute of the task, e.g. 'copy_input_data', as StagingDirective records.
+        Entries are parsed once, when they are assigned, and again only if the list was modified in place.
+
+        :argument: name of the staging attribute
+        :return: list of StagingDirective
+        """
+
+        if attribute not in STAGING_ACTIONS:
+            raise ValueError(obj=self._uid,
+                             attribute='staging attribute',
+                             expected_value=sorted(STAGING_ACTIONS.keys()),
+                             actual_value=attribute)
+
+        entries = getattr(self, '_%s' % attribute)
+
+        if not entries:
+            return list()
+
+        parsed = self._staging.get(attribute)
+
+        if parsed is None or parsed[0] != entries:
+            parsed = (list(entries), self._parse_staging(attribute, entries))
+            self._staging[attribute] = parsed
+
+        return parsed[1]
+
     def to_dict(self):
         """
         Convert current Task into a dictionary
@@ -726,6 +825,7 @@ class Task(object):
             'exit_code': self._exit_code,
             'path': self._path,
             'tag': self._tag,
+            'attempts': self._attempts,
 
             'parent_stage': self._p_stage,
             'parent_pipeline': self._p_pipeline,
@@ -903,6 +1003,13 @@ class Task(object):
                     raise TypeError(expected_type=str,
                                     actual_type=type(d['tag']))
 
+        if 'attempts' in d:
+            if isinstance(d['attempts'], int):
+                self._attempts = d['attempts']
+            else:
+                raise TypeError(entity='attempts', expected_type=int,
+                                actual_type=type(d['attempts']))
+
         if 'parent_stage' in d:
             if isinstance(d['parent_stage'], dict):
                 self._p_stage = d['parent_stage']
@@ -921,6 +1028,60 @@ class Task(object):
     # Private methods
     # ------------------------------------------------------------------------------------------------------------------
 
+    def _parse_staging(self, attribute, entries):
+        """
+        Purpose: Parse the entries of a staging attribute into StagingDirective records. Malformed entries are rejected
+        here instead of when the task is submitted.
+        """
+
+        action = STAGING_ACTIONS[attribute]
+        directives = list()
+
+        for entry in entries:
+
+            if not isinstance(entry, basestring):
+                raise TypeError(entity=attribute, expected_type=str, actual_type=type(entry))
+
+            parts = [part.strip() for part in str(entry).split('>')]
+
+            if len(parts) > 2 or not all(parts):
+                raise ValueError(obj=self._uid,
+                                 attribute=attribute,
+                                 expected_value='source or source > target',
+                                 actual_value=entry)
+
+            has_placeholder = '$' in entry
+
+            for part in parts:
+
+                if '$' not in part:
+                    continue
+
+                # Expected placeholder format:
+                # $SHARED or $Pipeline_(pipeline_name)_Stage_(stage_name)_Task_(task_name)
+                placeholder = part.split('/')[0]
+
+                if placeholder != '$SHARED' and \
+                        (not placeholder.startswith('$') or len(placeholder.split('_')) != 6):
+                    raise ValueError(obj=self._uid,
+                                     attribute=attribute,
+                                     expected_value='$Pipeline_(pipeline_name)_Stage_(stage_name)_Task_(task_name) ' +
+                                                    'or $SHARED',
+                                     actual_value=entry)
+
+            source = parts[0]
+
+            if len(parts) == 2:
+                target = parts[1]
+            elif has_placeholder:
+                target = None
+            else:
+                target = os.path.basename(source)
+
+            directives.append(StagingDirective(source, target, action, has_placeholder))
+
+        return directives
+
     def _assign_uid(self, sid):
         """
         Purpose: Assign a uid to the current object based on the sid passed
@@ -0,0 +1,301 @@
+__copyright__ = "Copyright 2017-2018, http://radical.rutgers.edu"
+__license__ = "MIT"
+
+import radical.utils as ru
+
+try:
+    import numpy as np
+except ImportError:
+    raise ImportError('radical.entk.utils.analytics requires numpy, an optional dependency of EnTK: '
+                      'pip install radical.entk[analytics]')
+
+from radical.entk.exceptions import *
+from radical.entk import states as res
+from prof_utils import get_session_profile
+
+
+# Every EnTK state gets its own code, in the order in which the states are
+# traversed. Unlike `states.state_numbers`, final states are kept apart.
+STATES = [res.INITIAL,
+          res.SCHEDULING,
+          res.SUSPENDED,
+          res.SCHEDULED,
+          res.SUBMITTING,
+          res.SUBMITTED,
+          res.COMPLETED,
+          res.DEQUEUEING,
+          res.DEQUEUED,
+          res.DONE,
+          res.FAILED,
+          res.CANCELED]
+
+STATE_CODES = dict([(state, code) for code, state in enumerate(STATES)])
+
+
+class StateEvents(object):
+
+    """
+    Columnar representation of the state transitions of a session. Event `i` is
+    the transition of entity `entity[i]` to the state `STATES[state[i]]` at
+    time `time[i]`, recorded by the component `comps[comp[i]]`.
+
+    The events are sorted by entity and, per entity, by time. Duplicate events
+    (same entity, state and time) are dropped.
+
+    :arguments:
+        :uids: array with the uid of each entity
+        :etypes: array with the entity type ('task', 'stage', 'pipeline') of each entity
+        :comps: array with the name of each component
+        :entity: array with the entity index of each event
+        :state: array with the state code of each event
+        :time: array with the timestamp of each event
+        :comp: array with the component index of each event
+    """
+
+    def __init__(self, uids, etypes, comps, entity, state, time, comp):
+
+        order = np.lexsort((state, time, entity))
+        entity, state, time, comp = entity[order], state[order], time[order], comp[order]
+
+        keep = np.ones(len(entity), dtype=bool)
+        keep[1:] = (entity[1:] != entity[:-1]) | \
+                   (state[1:] != state[:-1]) | \
+                   (time[1:] != time[:-1])
+
+        self.uids = uids
+        self.etypes = etypes
+        self.comps = comps
+        self.entity = entity[keep]
+        self.state = state[keep]
+        self.time = time[keep]
+        self.comp = comp[keep]
+
+    def __len__(self):
+
+        return len(self.entity)
+
+    def select(self, etype):
+        """
+        **Purpose**: Return the events of all entities of the given type. Entity
+        indices are kept, so the result can be used with `uids` as before.
+        """
+
+        mask = self.etypes[self.entity] == etype
+
+        return StateEvents(uids=self.uids,
+                           etypes=self.etypes,
+                           comps=self.comps,
+                           entity=self.entity[mask],
+                           state=self.state[mask],
+                           time=self.time[mask],
+                           comp=self.comp[mask])
+
+
+def load_state_events(sid, src=None, profile=None):
+    """
+    **Purpose**: Load the state transitions of a session into a `StateEvents`
+    object.
+
+    :arguments:
+        :sid: session id
+        :src: directory containing the session folder
+        :profile: already loaded session profile (optional), as returned by
+                  `get_session_profile`
+
+    :return: StateEvents
+    """
+
+    if profile is None:
+        profile, _, _ = get_session_profile(sid=sid, src=src)
+
+    rows = [row for row in profile
+            if row[ru.EVENT] == 'state' and row[ru.STATE] in STATE_CODES]
+
+    if not rows:
+        raise EnTKError('No state transitions found in session %s' % sid)
+
+    uids, entity = np.unique(np.array([row[ru.UID] for row in rows]),
+                             return_inverse=True)
+    comps, comp = np.unique(np.array([row[ru.COMP] for row in rows]),
+                            return_inverse=True)
+
+    state = np.array([STATE_CODES[row[ru.STATE]] for row in rows], dtype=np.int8)
+    time = np.array([row[ru.TIME] for row in rows], dtype=np.float64)
+    etypes = np.array([uid.split('.', 1)[0] for uid in uids])
+
+    return StateEvents(uids=uids,
+                       etypes=etypes,
+                       comps=comps,
+                       entity=entity.astype(np.int32),
+                       state=state,
+                       time=time,
+                       comp=comp.astype(np.int16))
+
+
+def _first_time(events, state):
+    """
+    **Purpose**: Return, for each entity, the time at which it first reached
+    the given state (NaN if it never did).
+    """
+
+    ret = np.full(len(events.uids), np.nan)
+
+    mask = events.state == STATE_CODES[state]
+    entity = events.entity[mask]
+
+    # Events are sorted by entity and time, so the first occurrence of an
+    # entity is its earliest transition to that state
+    uniq, idx = np.unique(entity, return_index=True)
+    ret[uniq] = events.time[mask][idx]
+
+    return ret
+
+
+def get_durations(events, start, end):
+    """
+    **Purpose**: Get the time each entity took to get from state `start` to
+    state `end`.
+
+    :return: array indexed by entity, NaN for entities that did not reach both
+             states
+    """
+
+    return _first_time(events, end) - _first_time(events, start)
+
+
+def get_state_durations(events):
+    """
+    **Purpose**: Get the time entities spent in each state, i.e., the time
+    between the transition to that state and the next transition of the same
+    entity.
+
+    :return: dictionary {state: {'count': int, 'total': float, 'mean': float}}
+    """
+
+    # Consecutive events of the same entity
+    same = events.entity[1:] == events.entity[:-1]
+    dt = (events.time[1:] - events.time[:-1])[same]
+    codes = events.state[:-1][same]
+
+    counts = np.bincount(codes, minlength=len(STATES))
+    totals = np.bincount(codes, weights=dt, minlength=len(STATES))
+
+    ret = dict()
+    for code in np.nonzero(counts)[0]:
+        ret[STATES[code]] = {'count': int(counts[code]),
+                             'total': float(totals[code]),
+                             'mean': float(totals[code] / counts[code])}
+
+    return ret
+
+
+def get_throughput(events, state=res.DONE, bin_size=1.0):
+    """
+    **Purpose**: Get the rate at which entities reached the given state over
+    the course of the session.
+
+    :return: (bin start times relative to the first event, entities per second)
+    """
+
+    if not len(events):
+        return np.array([]), np.array([])
+
+    t0 = events.time.min()
+    times = events.time[events.state == STATE_CODES[state]] - t0
+
+    nbins = max(int(np.ceil((events.time.max() - t0) / bin_size)), 1)
+    counts, edges = np.histogram(times, bins=nbins, range=(0, nbins * bin_size))
+
+    return edges[:-1], counts / float(bin_size)
+
+
+def get_concurrency(events, start, end, sampling=1.0):
+    """
+    **Purpose**: Get the number of entities that are between state `start` and
+    state `end` over the course of the session.
+
+    :return: (sample times relative to the first event, number of entities)
+    """
+
+    if not len(events):
+        return np.array([]), np.array([])
+
+    t0 = events.time.min()
+    starts = _first_time(events, start) - t0
+    ends = _first_time(events, end) - t0
+
+    # Entities that never started are ignored, entities that never ended are
+    # considered active till the end of the session
+    valid = ~np.isnan(starts)
+    starts = np.sort(starts[valid])
+    ends = np.sort(np.where(np.isnan(ends[valid]), np.inf, ends[valid]))
+
+    samples = np.arange(0, events.time.max() - t0 + sampling, sampling)
+    active = np.searchsorted(starts, samples, side='right') - \
+        np.searchsorted(ends, samples, side='right')
+
+    return samples, active
+
+
+def get_component_overheads(events):
+    """
+    **Purpose**: Get the time each component took to advance entities, i.e.,
+    the time between the previous transition of an entity and its transition
+    recorded by the component. Transitions to COMPLETED are excluded, as they
+    are dominated by the execution time of the tasks.
+
+    :return: dictionary {component: {'count': int, 'total': float, 'mean': float}}
+    """
+
+    same = events.entity[1:] == events.entity[:-1]
+    same &= events.state[1:] != STATE_CODES[res.COMPLETED]
+
+    dt = (events.time[1:] - events.time[:-1])[same]
+    comp = events.comp[1:][same]
+
+    counts = np.bincount(comp, minlength=len(events.comps))
+    totals = np.bincount(comp, weights=dt, minlength=len(events.comps))
+
+    ret = dict()
+    for idx in np.nonzero(counts)[0]:
+        ret[str(events.comps[idx])] = {'count': int(counts[idx]),
+                                       'total': float(totals[idx]),
+                                       'mean': float(totals[idx] / counts[idx])}
+
+    return ret
+
+
+def get_summary(sid, src=None, bin_size=1.0):
+    """
+    **Purpose**: Summarize the task execution of a session: time spent in
+    each state, the scheduling, execution and processing durations, task
+    throughput, task concurrency and component overheads.
+
+    :return: python dictionary
+    """
+
+    events = load_state_events(sid=sid, src=src)
+    tasks = events.select('task')
+
+    summary = dict()
+    summary['tasks'] = int(np.sum(events.etypes == 'task'))
+    summary['states'] = get_state_durations(tasks)
+
+    for name, start, end in [('schedule', res.SCHEDULING, res.SUBMITTED),
+                             ('execute', res.SUBMITTED, res.COMPLETED),
+                             ('process', res.COMPLETED, res.DONE)]:
+
+        durations = get_durations(tasks, start, end)
+        durations = durations[~np.isnan(durations)]
+
+        if len(durations):
+            summary[name] = {'min': float(durations.min()),
+                             'max': float(durations.max()),
+                             'mean': float(durations.mean()),
+                             'median': float(np.median(durations))}
+
+    summary['throughput'] = get_throughput(tasks, res.DONE, bin_size)
+    summary['concurrency'] = get_concurrency(tasks, res.SUBMITTED, res.COMPLETED, bin_size)
+    summary['overheads'] = get_component_overheads(events)
+
+    return summary
@@ -1,7 +1,13 @@
 from sync_initiator import sync_with_master
+from metrics import get_registry
 
 
-def transition(obj, obj_type, new_state, channel, queue, profiler, logger):
+def transition(obj, obj_type, new_state, channel, queue, profiler, logger, state_table=None):
+    """
+    **Purpose**: Move an object to a new state and communicate the state to the AppManager, by writing it to the
+    state table if one is given and knows the object, by a sync message otherwise. Without a channel, the object is
+    the one of the AppManager and the state is not communicated.
+    """
 
     try:
         old_state = obj.state
@@ -19,12 +25,17 @@ def transition(obj, obj_type, new_state, channel, queue, profiler, logger):
                       state=obj.state,
                       msg=msg)
 
-        sync_with_master(obj=obj,
-                         obj_type=obj_type,
-                         channel=channel,
-                         queue=queue,
-                         logger=logger,
-                         local_prof=profiler)
+        if not (state_table and state_table.update(obj)) and channel is not None:
+            sync_with_master(obj=obj,
+                             obj_type=obj_type,
+                             channel=channel,
+                             queue=queue,
+                             logger=logger,
+                             local_prof=profiler)
+
+        get_registry().counter('entk_transitions_total',
+                               'Number of state transitions',
+                               labels={'type': obj_type, 'state': new_state}).inc()
 
         logger.info('Transition of %s to new state %s successful' % (obj.uid, new_state))
 
@@ -32,10 +43,11 @@ def transition(obj, obj_type, new_state, channel, queue, profiler, logger):
 
         logger.exception('Transition of %s to %s state failed, error: %s' % (obj.uid, new_state, ex))
         obj.state = old_state
-        sync_with_master(obj=obj,
-                         obj_type=obj_type,
-                         channel=channel,
-                         queue=queue,
-                         logger=logger,
-                         local_prof=profiler)
+        if not (state_table and state_table.update(obj)) and channel is not None:
+            sync_with_master(obj=obj,
+                             obj_type=obj_type,
+                             channel=channel,
+                             queue=queue,
+                             logger=logger,
+                             local_prof=profiler)
         raise
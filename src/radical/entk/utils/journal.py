@@ -0,0 +1,177 @@
+__copyright__ = "Copyright 2017-2018, http://radical.rutgers.edu"
+__license__ = "MIT"
+
+import os
+import json
+import threading
+from collections import OrderedDict
+
+
+class Journal(object):
+
+    """
+    Append-only record of the tasks held by a TaskManager process. The tmgr
+    acknowledges the messages of the pending queue as soon as it received them,
+    so the tasks it holds are lost if its process dies. With the journal, a
+    restarted tmgr can recover the tasks which it consumed but did not submit
+    yet and the tasks which were submitted to the RTS but did not complete.
+
+    Each line of the journal file is a JSON document with one of the events:
+
+        * consumed  : {'op': 'consumed',  'tasks': [<task dict>, ...]}
+        * submitted : {'op': 'submitted', 'units': {<task uid>: <unit uid>}}
+        * completed : {'op': 'completed', 'uids': [<task uid>, ...]}
+
+    Lines are flushed after each event, which makes them survive the death of
+    the process (not of the node). A partially written last line is ignored.
+
+    :arguments:
+        :path: path of the journal file
+    """
+
+    def __init__(self, path):
+
+        self._path = path
+        self._lock = threading.Lock()
+
+        # task uid -> {'task': task dict, 'unit': unit uid or None}
+        self._in_flight = OrderedDict()
+
+        self._replay()
+
+        # The journal only has to hold the tasks in flight, rewrite it so that
+        # it does not grow across restarts
+        self._compact()
+
+        self._file = open(self._path, 'a')
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Private methods
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def _replay(self):
+
+        if not os.path.exists(self._path):
+            return
+
+        with open(self._path, 'r') as f:
+
+            for line in f:
+
+                try:
+                    entry = json.loads(line)
+                except Exception:
+                    continue
+
+                self._apply(entry)
+
+    def _apply(self, entry):
+
+        op = entry.get('op')
+
+        if op == 'consumed':
+            for task in entry['tasks']:
+                self._in_flight[task['uid']] = {'task': task, 'unit': None}
+
+        elif op == 'submitted':
+            for uid, unit in entry['units'].iteritems():
+                if uid in self._in_flight:
+                    self._in_flight[uid]['unit'] = unit
+
+        elif op == 'completed':
+            for uid in entry['uids']:
+                self._in_flight.pop(uid, None)
+
+    def _compact(self):
+
+        tmp = '%s.tmp' % self._path
+
+        with open(tmp, 'w') as f:
+
+            tasks = [v['task'] for v in self._in_flight.itervalues()]
+            if tasks:
+                f.write(json.dumps({'op': 'consumed', 'tasks': tasks}) + '\n')
+
+            units = dict([(k, v['unit']) for k, v in self._in_flight.iteritems() if v['unit']])
+            if units:
+                f.write(json.dumps({'op': 'submitted', 'units': units}) + '\n')
+
+        os.rename(tmp, self._path)
+
+    def _write(self, entry):
+
+        with self._lock:
+
+            self._apply(entry)
+            self._file.write(json.dumps(entry) + '\n')
+            self._file.flush()
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Public methods
+    # ------------------------------------------------------------------------------------------------------------------
+
+    @property
+    def path(self):
+        return self._path
+
+    def consumed(self, tasks):
+        """
+        **Purpose**: Record tasks received from the pending queue. Tasks which
+        are already in flight (e.g. a redelivered message whose tasks were
+        recovered from the journal) are not recorded again.
+
+        :arguments:
+            :tasks: list of task dictionaries
+        :return: list of the task dictionaries which are not in flight yet
+        """
+
+        with self._lock:
+            tasks = [t for t in tasks if t['uid'] not in self._in_flight]
+
+        if tasks:
+            self._write({'op': 'consumed', 'tasks': tasks})
+
+        return tasks
+
+    def submitted(self, units):
+        """
+        **Purpose**: Record the units which the RTS created for the tasks.
+
+        :arguments:
+            :units: dictionary of task uid -> unit uid
+        """
+
+        if units:
+            self._write({'op': 'submitted', 'units': units})
+
+    def completed(self, uids):
+        """
+        **Purpose**: Record tasks which were pushed to the completed queue.
+
+        :arguments:
+            :uids: list of task uids
+        """
+
+        if uids:
+            self._write({'op': 'completed', 'uids': list(uids)})
+
+    def recover(self):
+        """
+        **Purpose**: Tasks which were in flight when the journal was opened.
+
+        :return: tuple of (list of task dictionaries which were not submitted,
+                 dictionary of task uid -> {'task': task dictionary, 'unit':
+                 unit uid} for tasks which were submitted but not completed)
+        """
+
+        with self._lock:
+
+            unsubmitted = [v['task'] for v in self._in_flight.itervalues() if not v['unit']]
+            submitted = OrderedDict([(k, dict(v)) for k, v in self._in_flight.iteritems() if v['unit']])
+
+        return unsubmitted, submitted
+
+    def close(self):
+
+        with self._lock:
+            self._file.close()
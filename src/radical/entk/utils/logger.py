@@ -0,0 +1,294 @@
+__copyright__ = "Copyright 2017-2018, http://radical.rutgers.edu"
+__license__ = "MIT"
+
+import os
+import re
+import time
+import logging
+import threading
+import multiprocessing.util
+from collections import deque
+import radical.utils as ru
+
+
+# Defaults, can be overwritten via the environment
+ASYNC = os.environ.get('RADICAL_ENTK_LOG_ASYNC', 'True').lower() not in ['false', '0', 'no']
+TASK_SAMPLING = int(os.environ.get('RADICAL_ENTK_LOG_TASK_SAMPLING', 1))
+TASK_RATE = float(os.environ.get('RADICAL_ENTK_LOG_TASK_RATE', 0))
+
+_task_uid = re.compile(r'task\.(\d+)')
+
+
+class _Writer(object):
+
+    """
+    The single writer thread of a process. It pops records from a queue and
+    passes them to the handlers of the AsyncHandler which enqueued them. The
+    writer is started on first use in every process, as threads (and the
+    records still queued by the parent) must not survive a fork.
+
+    The queue is a plain deque: appending to it is atomic and much cheaper than
+    a `Queue.Queue`, which keeps the cost for the logging threads low. The
+    writer thread polls the deque instead of being notified.
+    """
+
+    def __init__(self, interval=0.05):
+
+        self._interval = interval
+        self._pid = None
+        self._records = None
+        self._thread = None
+        self._terminate = None
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def _run(self, terminate):
+
+        while not terminate.is_set():
+
+            if not self._write():
+                terminate.wait(self._interval)
+
+    def _write(self):
+        """
+        **Purpose**: Write all queued records, return False if there were none.
+        """
+
+        with self._write_lock:
+
+            records = self._records
+            if not records:
+                return False
+
+            popleft = records.popleft
+            while records:
+
+                handler, record = popleft()
+
+                try:
+                    handler.dispatch(record)
+                except Exception:
+                    pass
+
+        return True
+
+    def put(self, handler, record):
+
+        if self._pid != os.getpid():
+            self.start()
+
+        self._records.append((handler, record))
+
+    def start(self):
+
+        with self._lock:
+
+            if self._pid == os.getpid():
+                return
+
+            self._pid = os.getpid()
+            self._records = deque()
+            self._write_lock = threading.Lock()
+            self._terminate = threading.Event()
+            self._thread = threading.Thread(target=self._run, args=(self._terminate,),
+                                            name='log-writer')
+            self._thread.daemon = True
+            self._thread.start()
+
+            # Write all pending records when the process exits. multiprocessing
+            # runs its finalizers in forked children as well, unlike atexit.
+            multiprocessing.util.Finalize(None, self.stop, exitpriority=100)
+
+    def flush(self):
+        """
+        **Purpose**: Write all records queued so far.
+        """
+
+        if self._pid == os.getpid():
+            self._write()
+
+    def stop(self):
+
+        if self._pid != os.getpid():
+            return
+
+        self._terminate.set()
+        self._thread.join()
+        self._write()
+
+
+_writer = _Writer()
+
+
+class AsyncHandler(logging.Handler):
+
+    """
+    A handler which moves the formatting and writing of log records off the
+    calling thread: records are enqueued and handed to the wrapped handlers by
+    the writer thread of the process.
+
+    :arguments:
+        :handlers: list of handlers the records are written to
+    """
+
+    def __init__(self, handlers):
+
+        logging.Handler.__init__(self)
+
+        self._handlers = handlers
+        self._pid = os.getpid()
+
+    def emit(self, record):
+
+        try:
+            # Render the message in the calling thread, the arguments might be
+            # modified before the writer thread gets to the record
+            record.msg = record.getMessage()
+            record.args = None
+
+            if record.exc_info:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+                record.exc_info = None
+
+            _writer.put(self, record)
+
+        except Exception:
+            self.handleError(record)
+
+    def dispatch(self, record):
+        """
+        **Purpose**: Write a record to the wrapped handlers. Called by the
+        writer thread.
+        """
+
+        # Locks of the wrapped handlers might have been held by the writer
+        # thread of the parent at the time of the fork
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            for handler in self._handlers:
+                handler.createLock()
+
+        for handler in self._handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+    def flush(self):
+
+        _writer.flush()
+
+        for handler in self._handlers:
+            handler.flush()
+
+    def close(self):
+
+        _writer.flush()
+
+        for handler in self._handlers:
+            handler.close()
+
+        logging.Handler.close(self)
+
+
+class TaskFilter(logging.Filter):
+
+    """
+    Reduces the number of log lines about individual tasks. Records of level
+    WARNING and above, and records which do not refer to a task, always pass.
+
+    :arguments:
+        :sampling: only log records about every n-th task (by uid), so that the
+                   complete history of the sampled tasks is kept
+        :rate: maximum number of records about tasks per second, 0 disables
+               the limit
+    """
+
+    def __init__(self, sampling=1, rate=0):
+
+        logging.Filter.__init__(self)
+
+        self._sampling = max(sampling, 1)
+        self._rate = rate
+
+        self._window = None
+        self._count = 0
+
+    def filter(self, record):
+
+        if record.levelno >= logging.WARNING:
+            return True
+
+        match = _task_uid.search(record.getMessage())
+
+        if not match:
+            return True
+
+        if self._sampling > 1 and int(match.group(1)) % self._sampling:
+            return False
+
+        if self._rate:
+
+            window = int(time.time())
+            if window != self._window:
+                self._window = window
+                self._count = 0
+
+            self._count += 1
+            if self._count > self._rate:
+                return False
+
+        return True
+
+
+def get_logger(name, path=None, targets=None, level=None, background=None,
+               task_sampling=None, task_rate=None):
+    """
+    **Purpose**: Create a `radical.utils.Logger` for an EnTK component. Unless
+    disabled, its handlers are wrapped into an `AsyncHandler` so that the
+    component threads do not write to the log files themselves, and records
+    about individual tasks can be sampled and rate limited.
+
+    :arguments:
+        :name: name of the logger
+        :path: directory where the log files are written
+        :targets: log targets, as accepted by `radical.utils.Logger`
+        :level: log level
+        :background: route the records through the writer thread, default is
+                     `RADICAL_ENTK_LOG_ASYNC` (True)
+        :task_sampling: only log records about every n-th task, default is
+                        `RADICAL_ENTK_LOG_TASK_SAMPLING` (1)
+        :task_rate: maximum number of records about tasks per second, default
+                    is `RADICAL_ENTK_LOG_TASK_RATE` (0, unlimited)
+
+    :return: radical.utils.Logger
+    """
+
+    if background is None:
+        background = ASYNC
+
+    if task_sampling is None:
+        task_sampling = TASK_SAMPLING
+
+    if task_rate is None:
+        task_rate = TASK_RATE
+
+    logger = ru.Logger(name, path=path, targets=targets, level=level)
+    base = logging.getLogger(name)
+
+    # Loggers are singletons per name, wrap their handlers only once
+    if any([isinstance(h, AsyncHandler) for h in base.handlers]) or \
+            any([isinstance(f, TaskFilter) for f in base.filters]):
+        return logger
+
+    if task_sampling > 1 or task_rate:
+        base.addFilter(TaskFilter(sampling=task_sampling, rate=task_rate))
+
+    if background:
+        handlers = list(base.handlers)
+        for handler in handlers:
+            base.removeHandler(handler)
+
+        handler = AsyncHandler(handlers)
+        handler.name = name
+        base.addHandler(handler)
+
+    return logger
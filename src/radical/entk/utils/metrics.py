@@ -0,0 +1,369 @@
+__copyright__ = "Copyright 2017-2018, http://radical.rutgers.edu"
+__license__ = "MIT"
+
+import os
+import threading
+
+
+# Time (in seconds) between two exports of the metrics of a process to its
+# metrics file, 0 disables the periodic export
+EXPORT_INTERVAL = float(os.environ.get('RADICAL_ENTK_METRICS_INTERVAL', 10.0))
+
+# Time (in seconds) between two samples of values which have to be polled,
+# e.g. queue depths
+SAMPLING_INTERVAL = float(os.environ.get('RADICAL_ENTK_METRICS_SAMPLING', 1.0))
+
+# Default histogram buckets, suitable for latencies in seconds
+DEFAULT_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0]
+
+# Histogram buckets for sizes, e.g. the number of tasks in a bulk
+SIZE_BUCKETS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+
+
+def _series(name, labels):
+
+    if not labels:
+        return name
+
+    return '%s{%s}' % (name, ','.join(['%s="%s"' % (k, v) for k, v in labels]))
+
+
+class Counter(object):
+
+    """
+    A value that only goes up, e.g. the number of tasks submitted.
+    """
+
+    kind = 'counter'
+
+    def __init__(self):
+
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def value(self):
+        return self._value
+
+    def inc(self, value=1):
+
+        with self._lock:
+            self._value += value
+
+    def samples(self, name, labels):
+
+        return [(_series(name, labels), self._value)]
+
+
+class Gauge(object):
+
+    """
+    A value that can go up and down, e.g. the depth of a queue.
+    """
+
+    kind = 'gauge'
+
+    def __init__(self):
+
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def value(self):
+        return self._value
+
+    def set(self, value):
+
+        self._value = float(value)
+
+    def inc(self, value=1):
+
+        with self._lock:
+            self._value += value
+
+    def dec(self, value=1):
+
+        with self._lock:
+            self._value -= value
+
+    def samples(self, name, labels):
+
+        return [(_series(name, labels), self._value)]
+
+
+class Histogram(object):
+
+    """
+    Counts observations, e.g. latencies, in cumulative buckets and keeps their
+    sum and count.
+
+    :arguments:
+        :buckets: sorted list of the upper bounds of the buckets
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, buckets=None):
+
+        self._buckets = sorted(buckets or DEFAULT_BUCKETS)
+        self._counts = [0] * (len(self._buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    @property
+    def count(self):
+        return self._count
+
+    @property
+    def sum(self):
+        return self._sum
+
+    def observe(self, value):
+
+        idx = len(self._buckets)
+        for i, bound in enumerate(self._buckets):
+            if value <= bound:
+                idx = i
+                break
+
+        with self._lock:
+            self._counts[idx] += 1
+            self._sum += value
+            self._count += 1
+
+    def samples(self, name, labels):
+
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+            count = self._count
+
+        ret = list()
+        cumulative = 0
+        for bound, c in zip(self._buckets + ['+Inf'], counts):
+            cumulative += c
+            ret.append((_series('%s_bucket' % name, labels + [('le', bound)]), cumulative))
+
+        ret.append((_series('%s_sum' % name, labels), total))
+        ret.append((_series('%s_count' % name, labels), count))
+
+        return ret
+
+
+class Registry(object):
+
+    """
+    A registry holds the metrics of one process. Metrics are identified by name
+    and labels and are created on first access. The registry can export its
+    metrics periodically to a file in the Prometheus text format; all series
+    carry the label 'component' with the name of the registry.
+
+    :arguments:
+        :name: name of the component owning the registry
+    """
+
+    def __init__(self, name=None):
+
+        self._name = name
+        self._metrics = dict()
+        self._help = dict()
+        self._lock = threading.Lock()
+
+        self._exporter = None
+        self._export_terminate = None
+        self._export_path = None
+
+    @property
+    def name(self):
+        return self._name
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Private methods
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def _get(self, cls, name, doc, labels, **kwargs):
+
+        labels = sorted((labels or dict()).items())
+        key = (name, tuple(labels))
+
+        metric = self._metrics.get(key)
+        if metric:
+            return metric
+
+        with self._lock:
+
+            if key not in self._metrics:
+                self._metrics[key] = cls(**kwargs)
+                self._help.setdefault(name, (cls.kind, doc))
+
+            return self._metrics[key]
+
+    def _iter(self):
+
+        with self._lock:
+            items = sorted(self._metrics.items())
+
+        component = [('component', self._name)] if self._name else []
+
+        for (name, labels), metric in items:
+            yield name, component + list(labels), metric
+
+    def _export(self, interval):
+
+        while not self._export_terminate.wait(interval):
+            self.write(self._export_path)
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Public methods
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def counter(self, name, doc='', labels=None):
+
+        return self._get(Counter, name, doc, labels)
+
+    def gauge(self, name, doc='', labels=None):
+
+        return self._get(Gauge, name, doc, labels)
+
+    def histogram(self, name, doc='', labels=None, buckets=None):
+
+        return self._get(Histogram, name, doc, labels, buckets=buckets)
+
+    def snapshot(self):
+        """
+        **Purpose**: Get the current value of all series of the registry.
+
+        :return: dictionary {series: value}, where series is the name of the
+                 series including its labels in the Prometheus notation
+        """
+
+        ret = dict()
+        for name, labels, metric in self._iter():
+            for series, value in metric.samples(name, labels):
+                ret[series] = float(value)
+
+        return ret
+
+    def to_prometheus(self):
+        """
+        **Purpose**: Render all metrics in the Prometheus text format.
+        """
+
+        lines = list()
+        last = None
+
+        for name, labels, metric in self._iter():
+
+            if name != last:
+                kind, doc = self._help[name]
+                if doc:
+                    lines.append('# HELP %s %s' % (name, doc))
+                lines.append('# TYPE %s %s' % (name, kind))
+                last = name
+
+            for series, value in metric.samples(name, labels):
+                lines.append('%s %s' % (series, repr(float(value))))
+
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        """
+        **Purpose**: Write all metrics to the given file. The file is replaced
+        atomically, so that readers never see a partial export.
+        """
+
+        tmp = '%s.%s.tmp' % (path, os.getpid())
+
+        with open(tmp, 'w') as f:
+            f.write(self.to_prometheus())
+
+        os.rename(tmp, path)
+
+    def start_exporter(self, path, name=None, interval=None):
+        """
+        **Purpose**: Start a thread which writes the metrics to `path` every
+        `interval` seconds (default: `RADICAL_ENTK_METRICS_INTERVAL`). The
+        metrics are written once in any case.
+        """
+
+        if name:
+            self._name = name
+
+        if interval is None:
+            interval = EXPORT_INTERVAL
+
+        self._export_path = path
+
+        try:
+            os.makedirs(os.path.dirname(path))
+        except OSError:
+            pass  # already exists
+
+        self.write(path)
+
+        if interval > 0 and not self._exporter:
+            self._export_terminate = threading.Event()
+            self._exporter = threading.Thread(target=self._export, args=(interval,), name='metrics-exporter')
+            self._exporter.daemon = True
+            self._exporter.start()
+
+    def stop_exporter(self):
+        """
+        **Purpose**: Stop the exporter thread and write the final metrics.
+        """
+
+        if self._exporter:
+            self._export_terminate.set()
+            self._exporter.join()
+            self._exporter = None
+
+        if self._export_path:
+            self.write(self._export_path)
+
+
+_registry = None
+_registry_pid = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """
+    **Purpose**: Get the metrics registry of the current process. A forked
+    process gets a new, empty registry.
+    """
+
+    global _registry, _registry_pid
+
+    if _registry_pid != os.getpid():
+
+        with _registry_lock:
+
+            if _registry_pid != os.getpid():
+                _registry = Registry()
+                _registry_pid = os.getpid()
+
+    return _registry
+
+
+def read_metrics(path):
+    """
+    **Purpose**: Read a file in the Prometheus text format, as written by
+    `Registry.write()`.
+
+    :return: dictionary {series: value}
+    """
+
+    ret = dict()
+
+    with open(path) as f:
+        for line in f:
+
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+
+            series, value = line.rsplit(' ', 1)
+            ret[series] = float(value)
+
+    return ret
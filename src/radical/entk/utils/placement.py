@@ -0,0 +1,180 @@
+__copyright__ = "Copyright 2017-2018, http://radical.rutgers.edu"
+__license__ = "MIT"
+
+import threading
+from radical.entk.exceptions import *
+
+
+# Policies to place the tasks on the pilots of a ResourceManager:
+#
+#   round_robin  : pilots are used in turn
+#   least_loaded : pilot with the fewest tasks in flight per core
+#   resource     : least loaded pilot which has enough cores (and gpus) for the
+#                  task, the largest pilot if no pilot is large enough
+PLACEMENT_POLICIES = ['round_robin', 'least_loaded', 'resource']
+
+
+class Placement(object):
+
+    """
+    Placement of tasks on the pilots described by a ResourceManager. The
+    placement keeps the number of tasks in flight on each pilot, tasks have to
+    be released once they completed.
+
+    :arguments:
+        :policy: one of PLACEMENT_POLICIES
+        :pilot_descs: list of pilot descriptions (dictionaries with 'cpus' and
+                      optionally 'gpus'), see `ResourceManager.pilot_descs`
+    """
+
+    def __init__(self, policy, pilot_descs):
+
+        if policy not in PLACEMENT_POLICIES:
+            raise ValueError(obj='placement',
+                             attribute='policy',
+                             expected_value=PLACEMENT_POLICIES,
+                             actual_value=policy)
+
+        if not pilot_descs:
+            raise MissingError(obj='placement', missing_attribute='pilot_descs')
+
+        self._policy = policy
+        self._cpus = [max(desc.get('cpus') or 1, 1) for desc in pilot_descs]
+        self._gpus = [desc.get('gpus') or 0 for desc in pilot_descs]
+        self._load = [0] * len(pilot_descs)
+        self._retired = set()
+        self._next = 0
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Getter methods
+    # ------------------------------------------------------------------------------------------------------------------
+
+    @property
+    def policy(self):
+        return self._policy
+
+    @property
+    def load(self):
+        """
+        :getter: Number of tasks in flight on each pilot
+        """
+        return list(self._load)
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Private methods
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def _active(self):
+
+        return [i for i in range(len(self._load)) if i not in self._retired]
+
+    def _least_loaded(self, candidates):
+
+        return min(candidates, key=lambda i: (float(self._load[i]) / self._cpus[i], i))
+
+    def _matching(self, task):
+
+        cpu_reqs = task.cpu_reqs
+        cores = max((cpu_reqs.get('processes') or 1) * (cpu_reqs.get('threads_per_process') or 1), 1)
+
+        gpu_reqs = task.gpu_reqs
+        gpus = (gpu_reqs.get('processes') or 0) * (gpu_reqs.get('threads_per_process') or 1)
+
+        active = self._active()
+        candidates = [i for i in active if self._cpus[i] >= cores and self._gpus[i] >= gpus]
+
+        if not candidates:
+            largest = max([self._cpus[i] for i in active])
+            candidates = [i for i in active if self._cpus[i] == largest]
+
+        return candidates
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Public methods
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def place(self, task):
+        """
+        **Purpose**: Select the pilot on which a task is executed.
+
+        :arguments:
+            :task: Task object
+        :return: index of the pilot in the pilot descriptions
+        """
+
+        with self._lock:
+
+            if not len(self._retired) < len(self._load):
+                raise EnTKError('All pilots are retired')
+
+            if self._policy == 'round_robin':
+
+                while self._next in self._retired:
+                    self._next = (self._next + 1) % len(self._load)
+
+                index = self._next
+                self._next = (self._next + 1) % len(self._load)
+
+            elif self._policy == 'least_loaded':
+                index = self._least_loaded(self._active())
+
+            else:
+                index = self._least_loaded(self._matching(task))
+
+            self._load[index] += 1
+
+        return index
+
+    def release(self, index):
+        """
+        **Purpose**: Record that a task placed on a pilot completed.
+
+        :arguments:
+            :index: index returned by place(), None is ignored
+        """
+
+        if index is None:
+            return
+
+        with self._lock:
+            self._load[index] = max(self._load[index] - 1, 0)
+
+    def add(self, pilot_desc):
+        """
+        **Purpose**: Add a pilot on which tasks can be placed.
+
+        :arguments:
+            :pilot_desc: description of the pilot
+        :return: index of the pilot
+        """
+
+        with self._lock:
+
+            self._cpus.append(max(pilot_desc.get('cpus') or 1, 1))
+            self._gpus.append(pilot_desc.get('gpus') or 0)
+            self._load.append(0)
+
+            return len(self._load) - 1
+
+    def retire(self, index):
+        """
+        **Purpose**: Stop placing tasks on a pilot. Tasks already placed on it
+        are still released.
+
+        :arguments:
+            :index: index of the pilot
+        """
+
+        with self._lock:
+            self._retired.add(index)
+
+    def idle(self):
+        """
+        **Purpose**: Pilots which are not retired and have no tasks in flight.
+
+        :return: list of pilot indices
+        """
+
+        with self._lock:
+            return [i for i in self._active() if not self._load[i]]
@@ -0,0 +1,237 @@
+__copyright__ = "Copyright 2017-2018, http://radical.rutgers.edu"
+__license__ = "MIT"
+
+import time
+import Queue
+import threading
+from collections import deque
+from radical.entk.exceptions import *
+
+
+class _Job(object):
+
+    def __init__(self, pipe, stage):
+
+        self.pipe = pipe
+        self.stage = stage
+        self.start = None
+        self.abandoned = False
+
+
+class PostExecPool(object):
+
+    """
+    Pool of threads which execute the post_exec callbacks of stages, so that
+    the thread which processes completed tasks does not wait for them.
+
+    The callbacks of one pipeline are executed one after the other, in the
+    order in which they were submitted; with more than one worker, callbacks
+    of different pipelines run concurrently and have to be thread-safe. The
+    callbacks are executed without the lock of their
+    pipeline. The caller collects the finished callbacks with `results()` and
+    advances their pipelines itself, so that all transitions happen on its
+    own thread.
+
+    A callback which runs longer than the timeout is reported as failed. Its
+    thread cannot be stopped: the callback keeps running and can still change
+    its pipeline after the pipeline was marked as FAILED. Its result is
+    ignored and another thread takes its place in the pool.
+
+    :arguments:
+        :workers: number of threads
+        :timeout: seconds after which a callback is reported as failed, 0 for
+                  no timeout
+        :notify: function called by the pool whenever a callback finished, e.g.
+                 to wake up the caller
+    """
+
+    def __init__(self, workers=1, timeout=0, notify=None):
+
+        self._workers = max(int(workers), 1)
+        self._timeout = timeout
+        self._notify = notify
+
+        self._lock = threading.Lock()
+        self._threads = list()
+
+        # Pipelines with a callback that can run, callbacks waiting to run
+        # (pipeline uid -> deque of jobs), running callbacks (pipeline uid ->
+        # job) and callbacks which finished but were not collected
+        self._ready = Queue.Queue()
+        self._waiting = dict()
+        self._running = dict()
+        self._finished = deque()
+
+    def _start_worker(self):
+
+        thread = threading.Thread(target=self._worker,
+                                  name='post-exec-thread-%s' % len(self._threads))
+        thread.daemon = True
+        thread.start()
+        self._threads.append(thread)
+
+    def _worker(self):
+
+        while True:
+
+            uid = self._ready.get()
+            if uid is None:
+                return
+
+            with self._lock:
+
+                # Dropped when the pool was closed
+                if uid not in self._waiting:
+                    continue
+
+                job = self._waiting[uid].popleft()
+                if not self._waiting[uid]:
+                    del self._waiting[uid]
+
+                job.start = time.time()
+                self._running[uid] = job
+
+            error = None
+
+            try:
+
+                if job.stage.post_exec['condition']():
+                    job.stage.post_exec['on_true']()
+                else:
+                    job.stage.post_exec['on_false']()
+
+            except Exception, ex:
+                error = ex
+
+            with self._lock:
+
+                # The callback timed out and was replaced by another thread
+                if job.abandoned:
+                    return
+
+                del self._running[uid]
+                self._finished.append((job.pipe, job.stage, error))
+
+                if uid in self._waiting:
+                    self._ready.put(uid)
+
+            if self._notify:
+                self._notify()
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Getter methods
+    # ------------------------------------------------------------------------------------------------------------------
+
+    @property
+    def pending(self):
+        """
+        :getter: Number of callbacks which are waiting or running
+        """
+
+        with self._lock:
+            return sum([len(jobs) for jobs in self._waiting.values()]) + len(self._running)
+
+    @property
+    def has_results(self):
+        """
+        :getter: True if callbacks finished since the last call of `results()`
+        """
+
+        return bool(self._finished)
+
+    @property
+    def next_deadline(self):
+        """
+        :getter: Time at which the first running callback times out, None if there is no timeout or no callback runs
+        """
+
+        if not self._timeout:
+            return None
+
+        with self._lock:
+
+            starts = [job.start for job in self._running.values()]
+            if not starts:
+                return None
+
+            return min(starts) + self._timeout
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Public methods
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def submit(self, pipe, stage):
+        """
+        **Purpose**: Execute the post_exec callbacks of a stage after the callbacks which were submitted before for the
+        same pipeline.
+
+        :arguments:
+            :pipe: Pipeline of the stage
+            :stage: Stage whose post_exec is executed
+        """
+
+        if not stage.post_exec['condition']:
+            raise MissingError(obj=stage.uid, missing_attribute='post_exec')
+
+        with self._lock:
+
+            if not self._threads:
+                for _ in range(self._workers):
+                    self._start_worker()
+
+            queued = pipe.uid in self._waiting or pipe.uid in self._running
+
+            self._waiting.setdefault(pipe.uid, deque()).append(_Job(pipe, stage))
+
+            # Otherwise the pipeline is made ready when its current callback finishes
+            if not queued:
+                self._ready.put(pipe.uid)
+
+    def results(self):
+        """
+        **Purpose**: Collect the callbacks which finished or timed out since the last call.
+
+        :return: list of tuples of pipeline, stage and error, which is None if the callback succeeded and the exception
+                 otherwise
+        """
+
+        now = time.time()
+
+        with self._lock:
+
+            if self._timeout:
+
+                for uid, job in self._running.items():
+
+                    if now - job.start < self._timeout:
+                        continue
+
+                    job.abandoned = True
+                    del self._running[uid]
+
+                    error = EnTKError('post_exec of stage %s did not finish within %s seconds' %
+                                      (job.stage.uid, self._timeout))
+                    self._finished.append((job.pipe, job.stage, error))
+
+                    if uid in self._waiting:
+                        self._ready.put(uid)
+
+                    self._start_worker()
+
+            results = list(self._finished)
+            self._finished.clear()
+
+        return results
+
+    def close(self):
+        """
+        **Purpose**: Stop the threads of the pool once they finished their current callbacks, without waiting for them.
+        Callbacks which did not start yet are not executed.
+        """
+
+        with self._lock:
+
+            self._waiting.clear()
+
+            for _ in self._threads:
+                self._ready.put(None)
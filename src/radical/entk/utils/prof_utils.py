@@ -5,6 +5,8 @@ import glob
 import time
 import threading
 import json
+import cPickle
+import multiprocessing
 import radical.utils as ru
 
 from radical.entk.exceptions import *
@@ -60,7 +62,59 @@ def get_hostmap_deprecated(profiles):
     return hostmap
 
 
-def get_session_profile(sid, src=None):
+def _read_profile(args):
+    """
+    **Purpose**: Read a single profile. This is executed by the worker
+    processes of the pool in `get_session_profile`, hence it is a module level
+    function.
+    """
+
+    path, sid = args
+    rows = ru.read_profiles(profiles=[path], sid=sid)[path]
+
+    # Most fields repeat across rows, interning them keeps the rows small in
+    # memory and in the pickles sent back to the parent process and to the
+    # cache
+    for row in rows:
+        for field in [ru.EVENT, ru.COMP, ru.TID, ru.UID, ru.STATE, ru.ENTITY]:
+            if isinstance(row[field], str):
+                row[field] = intern(row[field])
+
+    return path, rows
+
+
+def _get_cache_key(profiles):
+    """
+    **Purpose**: Key the cached session profile by name, mtime and size of all
+    the profiles it was created from
+    """
+
+    key = list()
+    for path in sorted(profiles):
+        stat = os.stat(path)
+        key.append((os.path.basename(path), stat.st_mtime, stat.st_size))
+
+    return key
+
+
+def get_session_profile(sid, src=None, cache=True, procs=None):
+    """
+    **Purpose**: Read, combine and clean all the profiles of a session.
+
+    The profiles are parsed in parallel by a pool of processes. The result is
+    cached in a binary file next to the profiles and reused as long as none of
+    the profiles has changed (by mtime or size).
+
+    :arguments:
+        :sid: session id
+        :src: directory containing the session folder (default is the current
+              working directory)
+        :cache: read/write the cached session profile (True/False)
+        :procs: number of processes used to parse the profiles (default is the
+                number of cpus)
+
+    :return: (profile, accuracy, hostmap)
+    """
 
     if not src:
         src = os.getcwd()
@@ -76,9 +130,39 @@ def get_session_profile(sid, src=None):
     if len(profiles) == 0:
         raise EnTKError('No profiles found at %s' % src)
 
+    cache_file = "%s/%s/radical.entk.%s.prof.cache" % (src, sid, sid)
+
     try:
 
-        profiles = ru.read_profiles(profiles=profiles, sid=sid)
+        key = _get_cache_key(profiles)
+
+        if cache and os.path.isfile(cache_file):
+
+            try:
+                with open(cache_file, 'rb') as f:
+                    cached = cPickle.load(f)
+
+                if cached['key'] == key:
+                    return cached['prof'], cached['acc'], cached['hostmap']
+
+            except Exception:
+                # Stale or corrupt cache, we simply rebuild it
+                pass
+
+        if not procs:
+            procs = multiprocessing.cpu_count()
+        procs = min(procs, len(profiles))
+
+        if procs > 1:
+            pool = multiprocessing.Pool(processes=procs)
+            try:
+                profiles = dict(pool.map(_read_profile, [(path, sid) for path in profiles]))
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            profiles = dict([_read_profile((path, sid)) for path in profiles])
+
         prof, acc = ru.combine_profiles(profiles)
         prof = ru.clean_profile(prof,
                                 sid=sid,
@@ -91,6 +175,29 @@ def get_session_profile(sid, src=None):
             # FIXME: legacy host notation - deprecated
             hostmap = get_hostmap_deprecated(profiles)
 
+        if cache:
+
+            # Write to a temporary file first so that concurrent readers never
+            # see a partial cache. The cache is optional, the profile is
+            # returned even if it cannot be written.
+            tmp_file = '%s.%s' % (cache_file, os.getpid())
+            try:
+                with open(tmp_file, 'wb') as f:
+                    cPickle.dump({'key': key,
+                                  'prof': prof,
+                                  'acc': acc,
+                                  'hostmap': hostmap}, f, cPickle.HIGHEST_PROTOCOL)
+                os.rename(tmp_file, cache_file)
+
+            except (IOError, OSError) as ex:
+
+                print 'Profile cache %s not written: %s' % (cache_file, ex)
+
+                try:
+                    os.remove(tmp_file)
+                except OSError:
+                    pass
+
         return prof, acc, hostmap
 
     except Exception as ex:
@@ -161,15 +268,18 @@ def write_session_description(amgr):
                        'children': list()
                        }
 
-    # Adding tmgr to the tree
+    # Adding tmgr to the tree, the local engine executes tasks without one
     tmgr = amgr._task_manager
-    tree[amgr._uid]['children'].append(tmgr._uid)
-    tree[tmgr._uid] = {'uid': tmgr._uid,
-                       'etype': 'task_manager',
-                       'cfg': {},
-                       'has': [],
-                       'children': list()
-                       }
+    if tmgr:
+        tree[amgr._uid]['children'].append(tmgr._uid)
+        tree[tmgr._uid] = {'uid': tmgr._uid,
+                           'etype': 'task_manager',
+                           'cfg': {},
+                           'has': [],
+                           'children': list()
+                           }
+    else:
+        tree[amgr._uid]['has'].remove('task_manager')
 
     # Adding pipelines to the tree
     wf = amgr._workflow
@@ -0,0 +1,192 @@
+__copyright__ = "Copyright 2017-2018, http://radical.rutgers.edu"
+__license__ = "MIT"
+
+import os
+import time
+import threading
+from collections import deque
+import radical.utils as ru
+
+
+# Events that are never dropped by sampling: state transitions are needed by
+# all analytics and the remaining ones delimit the profile
+SAMPLING_EXEMPT = ['advance', 'sync_abs', 'flush', 'END']
+
+# Defaults, can be overwritten via the environment
+BUFFER_SIZE = int(os.environ.get('RADICAL_ENTK_PROF_BUFFER', 2 ** 16))
+FLUSH_INTERVAL = float(os.environ.get('RADICAL_ENTK_PROF_FLUSH_INTERVAL', 1.0))
+SAMPLING = int(os.environ.get('RADICAL_ENTK_PROF_SAMPLING', 1))
+
+
+class Profiler(ru.Profiler):
+
+    """
+    A profiler for the hot paths of EnTK. Instead of formatting and writing
+    one line per event, events are recorded into a bounded in-memory buffer of
+    fixed-size records (time, event, component, thread, uid, state, msg). The
+    records only reference the strings passed by the caller, the formatting is
+    done by a background thread which drains the buffer and writes the records
+    in large chunks. If the buffer is full, the recording thread drains it
+    itself, so no events are lost.
+
+    The profile written is identical in format to the one written by
+    `radical.utils.Profiler`, so it can be read with `get_session_profile`.
+    The profiler is enabled via the same environment variables. Records that
+    are still in the buffer are only written once `flush()` or `close()` is
+    called or the background thread wakes up, so the profiler must be closed
+    by the process that created it.
+
+    :arguments:
+        :name: name of the profiler, used as name of the profile
+        :ns: namespace used to check if the profiler is enabled
+        :path: directory where the profile is written
+        :size: maximum number of records in the buffer
+        :interval: time (in seconds) between two flushes of the background
+                   thread
+        :sampling: only every n-th occurrence of each event is recorded.
+                   Events with a state and the events in `SAMPLING_EXEMPT` are
+                   always recorded.
+    """
+
+    def __init__(self, name, ns=None, path=None, size=None, interval=None, sampling=None):
+
+        super(Profiler, self).__init__(name=name, ns=ns, path=path)
+
+        if not self._enabled:
+            return
+
+        self._size = size or BUFFER_SIZE
+        self._interval = interval or FLUSH_INTERVAL
+        self._sampling = max(sampling or SAMPLING, 1)
+        self._pid = os.getpid()
+
+        # Records are appended by the recording threads and popped by the
+        # flushing thread, both are atomic operations on a deque
+        self._buffer = deque()
+
+        self._counts = dict()
+
+        # Keeps the chunks in order if several threads flush
+        self._write_lock = threading.Lock()
+
+        self._wakeup = threading.Event()
+        self._terminate = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, name='profile-flusher')
+        self._flusher.daemon = True
+        self._flusher.start()
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Private methods
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def _flush_loop(self):
+
+        while not self._terminate.is_set():
+
+            self._wakeup.wait(self._interval)
+            self._wakeup.clear()
+            self._flush()
+
+    def _flush(self):
+        """
+        **Purpose**: Drain the buffer and write all records with a single
+        write.
+        """
+
+        with self._write_lock:
+
+            # A forked child inherits the buffer of the parent, which is
+            # written by the parent only
+            if os.getpid() != self._pid:
+                self._buffer.clear()
+                return
+
+            popleft = self._buffer.popleft
+            records = [popleft() for _ in xrange(len(self._buffer))]
+
+            if not records:
+                return
+
+            if not self._handle:
+                return
+
+            data = ''.join(["%.4f,%s,%s,%s,%s,%s,%s\n" % record for record in records])
+
+            self._handle.write(data)
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Public methods
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def prof(self, event, uid=None, state=None, msg=None, timestamp=None, comp=None, tid=None):
+
+        if not self._enabled:
+            return
+
+        if isinstance(uid, list):
+            for _uid in uid:
+                self.prof(event=event, uid=_uid, state=state, msg=msg,
+                          timestamp=timestamp, comp=comp, tid=tid)
+            return
+
+        if timestamp is None:
+            timestamp = time.time()
+
+        if self._sampling > 1 and state is None and event not in SAMPLING_EXEMPT:
+
+            count = self._counts.get(event, 0)
+            self._counts[event] = count + 1
+
+            if count % self._sampling:
+                return
+
+        if comp is None:
+            comp = self._name
+
+        if tid is None:
+            tid = threading.current_thread().name
+
+        self._buffer.append((timestamp, event, comp, tid,
+                             uid or '', state or '', msg or ''))
+
+        # Buffer is full: drain it in this thread instead of dropping events
+        if len(self._buffer) >= self._size:
+            self._flush()
+
+    def flush(self, verbose=True):
+
+        if not self._enabled:
+            return
+
+        if not self._handle:
+            return
+
+        if verbose:
+            self.prof('flush')
+
+        self._flush()
+
+        self._handle.flush()
+        os.fsync(self._handle.fileno())
+
+    def close(self):
+
+        if not self._enabled:
+            return
+
+        if not self._handle:
+            return
+
+        self._terminate.set()
+        self._wakeup.set()
+
+        if self._flusher.is_alive() and self._flusher is not threading.current_thread():
+            self._flusher.join()
+
+        if os.getpid() != self._pid:
+            return
+
+        self.prof('END')
+        self.flush(verbose=False)
+        self._handle.close()
+        self._handle = None
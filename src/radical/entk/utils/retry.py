@@ -0,0 +1,98 @@
+__copyright__ = "Copyright 2017-2018, http://radical.rutgers.edu"
+__license__ = "MIT"
+
+from radical.entk.exceptions import *
+
+
+# Keys of the retry policy of a Task and their defaults:
+#
+#   max_attempts   : number of times a task is executed before its failure is
+#                    permanent, None for no limit
+#   backoff        : delay (in seconds) before the first resubmission
+#   backoff_factor : factor by which the delay grows with every resubmission
+#   max_backoff    : upper limit of the delay (in seconds)
+TASK_POLICY = {'max_attempts': 1,
+               'backoff': 0.0,
+               'backoff_factor': 2.0,
+               'max_backoff': 600.0}
+
+# The retry policy of a Stage applies to all its Tasks which do not have a
+# policy of their own. In addition:
+#
+#   max_failures   : number of permanently failed tasks after which the stage
+#                    (and its pipeline) fails, None to never fail the stage
+STAGE_POLICY = dict(TASK_POLICY, max_failures=None)
+
+# Policy used if neither the task nor its stage have one: failed tasks are
+# resubmitted without limit and without delay if the AppManager was created
+# with resubmit_failed=True
+LEGACY_POLICY = dict(STAGE_POLICY, max_attempts=None)
+
+
+def validate_policy(uid, policy, defaults):
+    """
+    **Purpose**: Validate a retry policy and complete it with the defaults.
+
+    :arguments:
+        :uid: uid of the object the policy is assigned to
+        :policy: dictionary with a subset of the keys of 'defaults'
+        :defaults: TASK_POLICY or STAGE_POLICY
+    :return: dictionary with all keys of 'defaults'
+    """
+
+    if not isinstance(policy, dict):
+        raise TypeError(entity='retry', expected_type=dict, actual_type=type(policy))
+
+    unknown = set(policy.keys()) - set(defaults.keys())
+    if unknown:
+        raise ValueError(obj=uid,
+                         attribute='retry',
+                         expected_value=sorted(defaults.keys()),
+                         actual_value=sorted(unknown))
+
+    validated = dict(defaults)
+    validated.update(policy)
+
+    for key in ['max_attempts', 'max_failures']:
+
+        if key not in validated or validated[key] is None:
+            continue
+
+        if not isinstance(validated[key], int) or validated[key] < 1:
+            raise ValueError(obj=uid,
+                             attribute=key,
+                             expected_value='positive integer or None',
+                             actual_value=validated[key])
+
+    for key in ['backoff', 'backoff_factor', 'max_backoff']:
+
+        if not isinstance(validated[key], (int, float)) or validated[key] < 0:
+            raise ValueError(obj=uid,
+                             attribute=key,
+                             expected_value='non-negative number',
+                             actual_value=validated[key])
+
+    return validated
+
+
+def retry_delay(policy, attempts):
+    """
+    **Purpose**: Delay (in seconds) before a task is resubmitted after its
+    attempts-th execution failed.
+    """
+
+    if not policy['backoff']:
+        return 0.0
+
+    delay = policy['backoff'] * policy['backoff_factor'] ** min(max(attempts - 1, 0), 64)
+
+    return min(delay, policy['max_backoff'])
+
+
+def can_retry(policy, attempts):
+    """
+    **Purpose**: True if a task which failed after 'attempts' executions can be
+    resubmitted.
+    """
+
+    return policy['max_attempts'] is None or attempts < policy['max_attempts']
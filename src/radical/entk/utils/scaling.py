@@ -0,0 +1,149 @@
+__copyright__ = "Copyright 2017-2018, http://radical.rutgers.edu"
+__license__ = "MIT"
+
+import time
+from radical.entk.exceptions import *
+
+
+# Keys of the 'scaling' entry of a resource description and their defaults:
+#
+#   min_pilots   : number of pilots below which no pilot is retired
+#   max_pilots   : number of pilots above which no pilot is added
+#   backlog      : number of tasks waiting for cores above which the backlog is
+#                  considered too large
+#   grow_after   : time (in seconds) the backlog has to stay too large before a
+#                  pilot is added, also the minimum time between two additions
+#   shrink_after : time (in seconds) a pilot has to stay idle without backlog
+#                  before it is retired
+#   pilot        : description of the added pilots, keys which are not given
+#                  are taken from the top level of the resource description
+SCALING_POLICY = {'min_pilots': 1,
+                  'max_pilots': 1,
+                  'backlog': 0,
+                  'grow_after': 60.0,
+                  'shrink_after': 300.0,
+                  'pilot': None}
+
+GROW = 'grow'
+SHRINK = 'shrink'
+
+
+def validate_scaling(policy):
+    """
+    **Purpose**: Validate a scaling policy and complete it with the defaults.
+
+    :arguments:
+        :policy: dictionary with a subset of the keys of SCALING_POLICY
+    :return: dictionary with all keys of SCALING_POLICY
+    """
+
+    if not isinstance(policy, dict):
+        raise TypeError(entity='scaling', expected_type=dict, actual_type=type(policy))
+
+    unknown = set(policy.keys()) - set(SCALING_POLICY.keys())
+    if unknown:
+        raise ValueError(obj='resource description',
+                         attribute='scaling',
+                         expected_value=sorted(SCALING_POLICY.keys()),
+                         actual_value=sorted(unknown))
+
+    validated = dict(SCALING_POLICY)
+    validated.update(policy)
+
+    for key in ['min_pilots', 'max_pilots', 'backlog']:
+
+        if not isinstance(validated[key], int) or validated[key] < 0:
+            raise ValueError(obj='scaling',
+                             attribute=key,
+                             expected_value='non-negative integer',
+                             actual_value=validated[key])
+
+    if not 1 <= validated['min_pilots'] <= validated['max_pilots']:
+        raise ValueError(obj='scaling',
+                         attribute='max_pilots',
+                         expected_value='1 <= min_pilots <= max_pilots',
+                         actual_value='%s, %s' % (validated['min_pilots'], validated['max_pilots']))
+
+    for key in ['grow_after', 'shrink_after']:
+
+        if not isinstance(validated[key], (int, float)) or validated[key] < 0:
+            raise ValueError(obj='scaling',
+                             attribute=key,
+                             expected_value='non-negative number',
+                             actual_value=validated[key])
+
+    if validated['pilot'] is not None and not isinstance(validated['pilot'], dict):
+        raise TypeError(entity='pilot', expected_type=dict, actual_type=type(validated['pilot']))
+
+    return validated
+
+
+class Scaler(object):
+
+    """
+    Decides when pilots are added to or retired from a resource allocation.
+    A pilot is added once the backlog stayed above the threshold for
+    'grow_after' seconds, and retired once a pilot stayed idle without any
+    backlog for 'shrink_after' seconds, within the bounds of the policy. The
+    caller measures the backlog and applies the decisions.
+
+    :arguments:
+        :policy: validated scaling policy, see validate_scaling()
+    """
+
+    def __init__(self, policy):
+
+        self._policy = policy
+        self._backlog_since = None
+        self._idle_since = None
+
+    @property
+    def policy(self):
+        return self._policy
+
+    def decide(self, backlog, pilots, idle, now=None):
+        """
+        **Purpose**: Decide whether to add or retire a pilot.
+
+        :arguments:
+            :backlog: number of tasks waiting for cores
+            :pilots: number of pilots which are not retired
+            :idle: number of pilots which could be retired, i.e. which do not
+                   execute any task
+            :now: current time, for testing
+        :return: GROW, SHRINK or None
+        """
+
+        if now is None:
+            now = time.time()
+
+        if backlog > self._policy['backlog']:
+
+            self._idle_since = None
+
+            if self._backlog_since is None:
+                self._backlog_since = now
+
+            if pilots < self._policy['max_pilots'] and now - self._backlog_since >= self._policy['grow_after']:
+
+                # The next pilot is only added if the backlog persists
+                self._backlog_since = now
+                return GROW
+
+            return None
+
+        self._backlog_since = None
+
+        if backlog or not idle:
+            self._idle_since = None
+            return None
+
+        if self._idle_since is None:
+            self._idle_since = now
+
+        if pilots > self._policy['min_pilots'] and now - self._idle_since >= self._policy['shrink_after']:
+
+            self._idle_since = now
+            return SHRINK
+
+        return None
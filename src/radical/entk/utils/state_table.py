@@ -0,0 +1,249 @@
+__copyright__ = "Copyright 2017-2018, http://radical.rutgers.edu"
+__license__ = "MIT"
+
+import time
+import mmap
+import ctypes
+import threading
+from radical.entk import states
+from radical.entk.exceptions import *
+
+
+# States in the order of their codes in the table
+STATES = [states.INITIAL,
+          states.SCHEDULING,
+          states.SUSPENDED,
+          states.SCHEDULED,
+          states.SUBMITTING,
+          states.SUBMITTED,
+          states.COMPLETED,
+          states.DEQUEUEING,
+          states.DEQUEUED,
+          states.DONE,
+          states.FAILED,
+          states.CANCELED]
+
+STATE_CODES = dict([(state, code) for code, state in enumerate(STATES)])
+
+# Stored for objects without an exit code
+NO_EXIT_CODE = -2 ** 31
+
+
+class _Header(ctypes.Structure):
+
+    # head: number of entries appended to the change log so far
+    _fields_ = [('head', ctypes.c_uint64)]
+
+
+class _Entry(ctypes.Structure):
+
+    # version: number of updates of the entry, written after the other fields
+    _fields_ = [('version', ctypes.c_uint32),
+                ('state', ctypes.c_int8),
+                ('exit_code', ctypes.c_int32),
+                ('attempts', ctypes.c_int32),
+                ('time', ctypes.c_double)]
+
+
+class _Change(ctypes.Structure):
+
+    _fields_ = [('slot', ctypes.c_int32),
+                ('state', ctypes.c_int8)]
+
+
+class StateTable(object):
+
+    """
+    Table of the states of the pipelines, stages and tasks of a workflow in
+    anonymous shared memory. The table is created in the master process before
+    the WFprocessor process is forked, both processes use the same memory: the
+    WFprocessor writes the state transitions, exit codes and attempts of the
+    objects to the table instead of sending them to the synchronizer of the
+    AppManager, the master reads them from the table.
+
+    Every update is appended to a change log (a ring buffer of slot and state),
+    from which the master replays the transitions in the order in which they
+    happened. If the master falls behind by more than the size of the log, it
+    compares the versions of all entries instead and only sees the latest state
+    of each object.
+
+    Objects are known to the table by their uid. Objects which are added to the
+    workflow at runtime have no entry and are still synchronized by messages.
+
+    :arguments:
+        :workflow: list of Pipelines with assigned uids
+        :log_size: number of transitions the change log holds (default: twice
+                   the number of objects, at least 4096)
+    """
+
+    def __init__(self, workflow, log_size=None):
+
+        self._slots = dict()
+        self._objects = list()
+
+        for pipe in workflow:
+            self._register(pipe)
+            for stage in pipe.stages:
+                self._register(stage)
+                for task in stage.tasks:
+                    self._register(task)
+
+        size = len(self._objects)
+        self._log_size = log_size or max(2 * size, 4096)
+
+        entries_offset = ctypes.sizeof(_Header)
+        log_offset = entries_offset + ctypes.sizeof(_Entry) * size
+        nbytes = log_offset + ctypes.sizeof(_Change) * self._log_size
+
+        # Anonymous maps are shared with the processes forked later on
+        self._mmap = mmap.mmap(-1, nbytes)
+
+        self._header = _Header.from_buffer(self._mmap)
+        self._entries = (_Entry * size).from_buffer(self._mmap, entries_offset)
+        self._log = (_Change * self._log_size).from_buffer(self._mmap, log_offset)
+
+        for slot, obj in enumerate(self._objects):
+            self._entries[slot].state = STATE_CODES[obj.state]
+            self._entries[slot].exit_code = NO_EXIT_CODE
+
+        # Writers are the threads of one process
+        self._lock = threading.Lock()
+
+        # Position of the reader in the change log, versions it has seen
+        self._tail = 0
+        self._seen = [0] * size
+
+    def _register(self, obj):
+
+        if not obj.uid:
+            raise MissingError(obj='state table', missing_attribute='uid')
+
+        self._slots[obj.uid] = len(self._objects)
+        self._objects.append(obj)
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Getter methods
+    # ------------------------------------------------------------------------------------------------------------------
+
+    @property
+    def size(self):
+        """
+        :getter: Number of objects in the table
+        """
+        return len(self._objects)
+
+    @property
+    def log_size(self):
+        """
+        :getter: Number of transitions the change log holds
+        """
+        return self._log_size
+
+    def __contains__(self, uid):
+
+        return uid in self._slots
+
+    def get(self, uid):
+        """
+        **Purpose**: Read the entry of an object.
+
+        :arguments:
+            :uid: uid of the object
+        :return: tuple of state, exit code, attempts and time of the last update
+        """
+
+        if uid not in self._slots:
+            raise MissingError(obj='state table', missing_attribute=uid)
+
+        entry = self._entries[self._slots[uid]]
+        exit_code = entry.exit_code if entry.exit_code != NO_EXIT_CODE else None
+
+        return STATES[entry.state], exit_code, entry.attempts, entry.time
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Public methods
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def update(self, obj):
+        """
+        **Purpose**: Write the state (and for tasks, the exit code and attempts) of an object to the table.
+
+        :arguments:
+            :obj: Pipeline, Stage or Task
+        :return: False if the object is not known to the table, True otherwise
+        """
+
+        slot = self._slots.get(obj.uid)
+        if slot is None:
+            return False
+
+        exit_code = getattr(obj, 'exit_code', None)
+
+        with self._lock:
+
+            entry = self._entries[slot]
+            entry.state = STATE_CODES[obj.state]
+            entry.exit_code = exit_code if exit_code is not None else NO_EXIT_CODE
+            entry.attempts = getattr(obj, 'attempts', 0)
+            entry.time = time.time()
+            entry.version += 1
+
+            head = self._header.head
+            change = self._log[head % self._log_size]
+            change.slot = slot
+            change.state = entry.state
+            self._header.head = head + 1
+
+        return True
+
+    def changes(self):
+        """
+        **Purpose**: Transitions written to the table since the last call, in the order in which they happened. Only
+        to be used by the single reader of the table.
+
+        :return: list of tuples of the object registered in this process, state, exit code, attempts and time
+        """
+
+        changes = list()
+        head = self._header.head
+
+        if head - self._tail <= self._log_size:
+
+            for pos in xrange(self._tail, head):
+                change = self._log[pos % self._log_size]
+                changes.append((change.slot, STATES[change.state]))
+
+        # The log was overwritten before or while it was read
+        if self._header.head - self._tail > self._log_size:
+
+            head = self._header.head
+            changes = [(slot, STATES[entry.state]) for slot, entry in enumerate(self._entries)
+                       if entry.version != self._seen[slot]]
+
+        self._tail = head
+
+        result = list()
+        for slot, state in changes:
+
+            entry = self._entries[slot]
+            self._seen[slot] = entry.version
+            exit_code = entry.exit_code if entry.exit_code != NO_EXIT_CODE else None
+            result.append((self._objects[slot], state, exit_code, entry.attempts, entry.time))
+
+        return result
+
+    def close(self):
+        """
+        **Purpose**: Release the shared memory of the table in the calling process.
+        """
+
+        if self._mmap is None:
+            return
+
+        # The structures point into the map and must not outlive it
+        self._header = None
+        self._entries = None
+        self._log = None
+
+        self._mmap.close()
+        self._mmap = None
@@ -1,6 +1,8 @@
 import uuid
 import json
+import time
 import pika
+from metrics import get_registry
 
 
 def sync_with_master(obj, obj_type, channel, queue, logger, local_prof):
@@ -16,6 +18,7 @@ def sync_with_master(obj, obj_type, channel, queue, logger, local_prof):
         object_as_dict['type'] = 'Pipeline'
 
     corr_id = str(uuid.uuid4())
+    start = time.time()
 
     logger.debug('Attempting to sync %s with state %s with AppManager' % (obj.uid, obj.state))
     channel.basic_publish(exchange='',
@@ -58,6 +61,117 @@ def sync_with_master(obj, obj_type, channel, queue, logger, local_prof):
 
                 logger.debug('%s with state %s synced with AppManager' % (obj.uid, obj.state))
 
+                get_registry().histogram('entk_sync_rtt_seconds',
+                                         'Round trip time of the synchronization of an object with the AppManager',
+                                         labels={'type': obj_type}).observe(time.time() - start)
+
                 channel.basic_ack(delivery_tag=method_frame.delivery_tag)
 
                 break
+
+
+def sync_stages_with_master(pipe, stages, tasks, channel, queue, logger, local_prof):
+    """
+    Synchronize the stages and tasks which were added to a pipeline at runtime with the AppManager in one message,
+    instead of one message per object. The AppManager adds them to its workflow in one step.
+
+    :arguments:
+        :pipe: Pipeline whose stages and tasks were added
+        :stages: list of new Stages (with their tasks), in the order of the pipeline
+        :tasks: list of new Tasks of Stages which the AppManager knows already
+    """
+
+    object_as_dict = {'type': 'Structure',
+                      'object': {'uid': pipe.uid,
+                                 'state': pipe.state,
+                                 'stages': [stage.to_dict() for stage in stages],
+                                 'tasks': [task.to_dict() for stage in stages for task in stage.tasks] +
+                                          [task.to_dict() for task in tasks]}}
+
+    count = len(stages) + len(object_as_dict['object']['tasks'])
+    corr_id = str(uuid.uuid4())
+    start = time.time()
+
+    logger.debug('Attempting to sync %s new stages and tasks of %s with AppManager' % (count, pipe.uid))
+    channel.basic_publish(exchange='',
+                          routing_key=queue,
+                          body=json.dumps(object_as_dict),
+                          properties=pika.BasicProperties(correlation_id=corr_id)
+                          )
+
+    local_prof.prof('publishing %s new objects for sync' % count, uid=pipe.uid)
+
+    sid = '-'.join(queue.split('-')[:-3])
+    qname = queue.split('-')[-3:]
+    qname.reverse()
+    reply_queue = sid + '-' + '-'.join(qname)
+
+    while True:
+
+        method_frame, props, body = channel.basic_get(queue=reply_queue)
+
+        if body and corr_id == props.correlation_id:
+
+            local_prof.prof('%s new objects synchronized' % count, uid=pipe.uid)
+            logger.debug('%s new stages and tasks of %s synced with AppManager' % (count, pipe.uid))
+
+            get_registry().histogram('entk_sync_rtt_seconds',
+                                     'Round trip time of the synchronization of an object with the AppManager',
+                                     labels={'type': 'Structure'}).observe(time.time() - start)
+
+            channel.basic_ack(delivery_tag=method_frame.delivery_tag)
+
+            break
+
+
+def sync_pilot_with_master(action, index, uid, channel, queue, logger, local_prof):
+    """
+    Report a pilot which the TaskManager added to or retired from the resource request to the AppManager, which
+    records it in its ResourceManager. A retired pilot is cancelled by the AppManager.
+
+    :arguments:
+        :action: GROW or SHRINK (see radical.entk.utils.scaling)
+        :index: index of the pilot in the pilot descriptions of the ResourceManager
+        :uid: uid of the pilot in the RTS, None if the RTS has no pilots
+    """
+
+    # The action is sent as the state of the pilot, the AppManager logs and
+    # profiles it like the states of the other objects
+    object_as_dict = {'type': 'Pilot',
+                      'object': {'uid': uid,
+                                 'index': index,
+                                 'state': action}}
+
+    corr_id = str(uuid.uuid4())
+    start = time.time()
+
+    logger.debug('Attempting to sync %s of pilot %s with AppManager' % (action, index))
+    channel.basic_publish(exchange='',
+                          routing_key=queue,
+                          body=json.dumps(object_as_dict),
+                          properties=pika.BasicProperties(correlation_id=corr_id)
+                          )
+
+    local_prof.prof('publishing pilot %s for sync' % action, uid=uid)
+
+    sid = '-'.join(queue.split('-')[:-3])
+    qname = queue.split('-')[-3:]
+    qname.reverse()
+    reply_queue = sid + '-' + '-'.join(qname)
+
+    while True:
+
+        method_frame, props, body = channel.basic_get(queue=reply_queue)
+
+        if body and corr_id == props.correlation_id:
+
+            local_prof.prof('pilot %s synchronized' % action, uid=uid)
+            logger.debug('%s of pilot %s synced with AppManager' % (action, index))
+
+            get_registry().histogram('entk_sync_rtt_seconds',
+                                     'Round trip time of the synchronization of an object with the AppManager',
+                                     labels={'type': 'Pilot'}).observe(time.time() - start)
+
+            channel.basic_ack(delivery_tag=method_frame.delivery_tag)
+
+            break
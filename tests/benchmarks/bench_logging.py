@@ -0,0 +1,128 @@
+"""
+Benchmark the cost of EnTK logging.
+
+Every configuration is run in a separate process, as the logging settings are
+read from the environment at import time:
+
+    python bench_logging.py [--tasks N] [--mode replay|mock]
+
+In `replay` mode, the log calls that the enqueue, dequeue, synchronizer and
+tmgr threads issue for every task are replayed from 4 threads, without any
+other EnTK component. In `mock` mode, a complete EnTK application with N
+tasks is executed on the mock RTS (requires RabbitMQ, see RMQ_HOSTNAME and
+RMQ_PORT).
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+
+CONFIGS = [('DEBUG, sync', {'RADICAL_ENTK_VERBOSE': 'DEBUG', 'RADICAL_ENTK_LOG_ASYNC': 'False'}),
+           ('INFO, sync', {'RADICAL_ENTK_VERBOSE': 'INFO', 'RADICAL_ENTK_LOG_ASYNC': 'False'}),
+           ('DEBUG, async', {'RADICAL_ENTK_VERBOSE': 'DEBUG', 'RADICAL_ENTK_LOG_ASYNC': 'True'}),
+           ('INFO, async', {'RADICAL_ENTK_VERBOSE': 'INFO', 'RADICAL_ENTK_LOG_ASYNC': 'True'}),
+           ('DEBUG, async, sampling 10', {'RADICAL_ENTK_VERBOSE': 'DEBUG', 'RADICAL_ENTK_LOG_ASYNC': 'True',
+                                          'RADICAL_ENTK_LOG_TASK_SAMPLING': '10'})]
+
+# Log calls per task and thread, as issued by the EnTK components
+CALLS = [('debug', 'Task %s in state %s'),
+         ('info', 'Transition of %s to %s state'),
+         ('debug', 'Syncing %s with master, state %s'),
+         ('info', 'Found task %s in state %s')]
+
+
+def replay(ntasks):
+
+    from radical.entk.utils.logger import get_logger
+
+    path = tempfile.mkdtemp()
+
+    try:
+        loggers = [get_logger('radical.entk.bench.%d' % i, path=path, targets=['.'])
+                   for i in range(4)]
+
+        def work(logger):
+            for i in range(ntasks):
+                uid = 'task.%04d' % i
+                for level, msg in CALLS:
+                    getattr(logger, level)(msg % (uid, 'SCHEDULING'))
+
+        threads = [threading.Thread(target=work, args=(logger,)) for logger in loggers]
+
+        start = time.time()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        hot = time.time() - start
+
+        for logger in loggers:
+            for handler in logger.handlers:
+                handler.flush()
+        total = time.time() - start
+
+    finally:
+        shutil.rmtree(path)
+
+    return {'hot': hot, 'total': total}
+
+
+def mock(ntasks):
+
+    from radical.entk import Pipeline, Stage, Task, AppManager
+
+    p = Pipeline()
+    s = Stage()
+    for _ in range(ntasks):
+        t = Task()
+        t.executable = ['/bin/date']
+        s.add_tasks(t)
+    p.add_stages(s)
+
+    appman = AppManager(hostname=os.environ.get('RMQ_HOSTNAME', 'localhost'),
+                        port=int(os.environ.get('RMQ_PORT', 5672)),
+                        rts='mock')
+    appman.resource_desc = {'resource': 'local.localhost',
+                            'walltime': 60,
+                            'cpus': 1}
+    appman.workflow = [p]
+
+    start = time.time()
+    appman.run()
+    total = time.time() - start
+
+    shutil.rmtree(appman.sid, ignore_errors=True)
+
+    return {'total': total}
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tasks', type=int, default=10000)
+    parser.add_argument('--mode', choices=['replay', 'mock'], default='replay')
+    parser.add_argument('--run', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        func = replay if args.mode == 'replay' else mock
+        print json.dumps(func(args.tasks))
+        sys.exit(0)
+
+    for name, env in CONFIGS:
+
+        environ = dict(os.environ)
+        environ.update(env)
+
+        out = subprocess.check_output([sys.executable, __file__, '--run',
+                                       '--mode', args.mode, '--tasks', str(args.tasks)],
+                                      env=environ)
+        res = json.loads(out.strip().splitlines()[-1])
+
+        print '%-28s %s' % (name, '  '.join(['%s: %8.3fs' % (k, v) for k, v in sorted(res.items())]))
@@ -0,0 +1,95 @@
+"""
+Startup benchmark of EnTK on the mock RTS.
+
+Measures, in a fresh process for every repetition:
+
+    * import         : time to import radical.entk
+    * create         : time to create an AppManager and assign the resource
+                       description and the workflow
+    * first publish  : time from the start of run() to the first task in
+                       SCHEDULED state, i.e. published to the pending queue
+    * radical.pilot  : whether radical.pilot was imported, which should not be
+                       the case with the mock RTS
+
+Requires RabbitMQ, see RMQ_HOSTNAME and RMQ_PORT.
+
+    python bench_startup.py --repeat 5
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import subprocess
+
+import numpy as np
+
+
+def run(tasks):
+
+    start = time.time()
+    from radical.entk import Pipeline, Stage, Task, AppManager
+    imported = time.time()
+
+    from radical.entk.utils.analytics import load_state_events, STATE_CODES
+
+    p = Pipeline()
+    s = Stage()
+    for _ in range(tasks):
+        t = Task()
+        t.executable = ['/bin/date']
+        s.add_tasks(t)
+    p.add_stages(s)
+
+    appman = AppManager(hostname=os.environ.get('RMQ_HOSTNAME', 'localhost'),
+                        port=int(os.environ.get('RMQ_PORT', 5672)),
+                        rts='mock')
+    appman.resource_desc = {'resource': 'local.localhost',
+                            'walltime': 60,
+                            'cpus': 1}
+    appman.workflow = [p]
+    created = time.time()
+
+    appman.run()
+
+    events = load_state_events(sid=appman.sid, src=os.getcwd()).select('task')
+    scheduled = events.time[events.state == STATE_CODES['SCHEDULED']]
+
+    shutil.rmtree(appman.sid, ignore_errors=True)
+
+    return {'import': imported - start,
+            'create': created - imported,
+            'first_publish': float(scheduled.min() - created) if len(scheduled) else None,
+            'radical.pilot': 'radical.pilot' in sys.modules}
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=5, help='number of repetitions (default: 5)')
+    parser.add_argument('--tasks', type=int, default=1, help='number of tasks of the workflow (default: 1)')
+    parser.add_argument('--run', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print json.dumps(run(args.tasks))
+        sys.exit(0)
+
+    environ = dict(os.environ)
+    environ['RADICAL_ENTK_PROFILE'] = 'True'
+
+    results = list()
+    for _ in range(args.repeat):
+
+        out = subprocess.check_output([sys.executable, __file__, '--run', '--tasks', str(args.tasks)], env=environ)
+        results.append(json.loads(out.strip().splitlines()[-1]))
+
+    for key in ['import', 'create', 'first_publish']:
+        values = [res[key] for res in results if res[key] is not None]
+        if values:
+            print '%-16s median %8.4fs  min %8.4fs  max %8.4fs' % (key, np.median(values), min(values), max(values))
+
+    print '%-16s %s' % ('radical.pilot', 'imported' if any([res['radical.pilot'] for res in results])
+                        else 'not imported')
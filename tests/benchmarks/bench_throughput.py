@@ -0,0 +1,199 @@
+"""
+Throughput benchmark of EnTK on the mock RTS.
+
+Runs complete EnTK applications with the mock TaskManager and ResourceManager
+for a grid of workflow shapes (pipelines x stages x tasks per stage) and
+reports, for each shape:
+
+    * tasks/sec       : tasks completed per second of AppManager.run()
+    * first submission: time from the start of run() to the first task in
+                        SUBMITTED state
+    * latencies       : 50th/90th/99th percentile of the time tasks spent
+                        between consecutive states
+    * peak rss        : peak resident set size of the master process
+
+Every shape is run in a separate process. Requires RabbitMQ, see RMQ_HOSTNAME
+and RMQ_PORT, unless the local engine is used (--engine local), and numpy
+(pip install radical.entk[analytics]).
+
+    python bench_throughput.py --grid 1x1x100,4x4x64 --output results.json
+    python bench_throughput.py --grid 1x1x100,4x4x64 --baseline results.json
+
+With --baseline, the results are compared to a previous output file and the
+script exits with 1 if the throughput dropped or the median latencies grew by
+more than --tolerance.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import resource
+import argparse
+import subprocess
+
+import numpy as np
+
+from radical.entk import states
+
+TRANSITIONS = [(states.SCHEDULING, states.SCHEDULED),
+               (states.SCHEDULED, states.SUBMITTING),
+               (states.SUBMITTING, states.SUBMITTED),
+               (states.SUBMITTED, states.COMPLETED),
+               (states.COMPLETED, states.DEQUEUEING),
+               (states.DEQUEUEING, states.DEQUEUED),
+               (states.DEQUEUED, states.DONE)]
+
+PERCENTILES = [50, 90, 99]
+
+
+def run(pipelines, stages, tasks, engine='rmq'):
+
+    from radical.entk import Pipeline, Stage, Task, AppManager
+    import radical.utils as ru
+    from radical.entk.utils import get_session_profile
+    from radical.entk.utils.analytics import load_state_events, get_durations, STATE_CODES
+
+    workflow = list()
+    for _ in range(pipelines):
+        p = Pipeline()
+        for _ in range(stages):
+            s = Stage()
+            for _ in range(tasks):
+                t = Task()
+                t.executable = ['/bin/date']
+                s.add_tasks(t)
+            p.add_stages(s)
+        workflow.append(p)
+
+    appman = AppManager(hostname=os.environ.get('RMQ_HOSTNAME', 'localhost'),
+                        port=int(os.environ.get('RMQ_PORT', 5672)),
+                        rts='mock',
+                        engine=engine)
+    appman.resource_desc = {'resource': 'local.localhost',
+                            'walltime': 60,
+                            'cpus': 1}
+    appman.workflow = workflow
+
+    start = time.time()
+    appman.run()
+    duration = time.time() - start
+
+    # ru_maxrss is reported in KB on Linux
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    profile, _, _ = get_session_profile(sid=appman.sid, src=os.getcwd())
+    events = load_state_events(sid=appman.sid, profile=profile).select('task')
+
+    # Profile times are relative to the start of the session
+    run_started = min([row[ru.TIME] for row in profile if row[ru.EVENT] == 'amgr run started'])
+    submitted = events.time[events.state == STATE_CODES[states.SUBMITTED]]
+
+    latencies = dict()
+    for first, second in TRANSITIONS:
+        durations = get_durations(events, first, second)
+        durations = durations[~np.isnan(durations)]
+        if len(durations):
+            latencies['%s-%s' % (first, second)] = dict([('p%d' % p, float(np.percentile(durations, p)))
+                                                         for p in PERCENTILES])
+
+    shutil.rmtree(appman.sid, ignore_errors=True)
+
+    ntasks = pipelines * stages * tasks
+
+    return {'tasks': ntasks,
+            'duration': duration,
+            'tasks_per_sec': ntasks / duration,
+            'first_submission': float(submitted.min() - run_started) if len(submitted) else None,
+            'latencies': latencies,
+            'peak_rss': peak_rss}
+
+
+def compare(results, baseline, tolerance):
+    """
+    Return a list of regressions of `results` with respect to `baseline`.
+    """
+
+    regressions = list()
+
+    for shape, res in sorted(results.items()):
+
+        base = baseline.get(shape)
+        if not base:
+            continue
+
+        if res['tasks_per_sec'] < base['tasks_per_sec'] * (1 - tolerance):
+            regressions.append('%s: tasks/sec %.1f < %.1f' % (shape, res['tasks_per_sec'], base['tasks_per_sec']))
+
+        for transition, lat in sorted(res['latencies'].items()):
+            base_lat = base['latencies'].get(transition)
+            if base_lat and lat['p50'] > base_lat['p50'] * (1 + tolerance):
+                regressions.append('%s: %s p50 %.4fs > %.4fs' % (shape, transition, lat['p50'], base_lat['p50']))
+
+    return regressions
+
+
+def report(shape, res):
+
+    first_submission = res['first_submission']
+    print '%-12s %8d tasks  %8.1f tasks/s  first submission %s  peak rss %6.1f MB' % \
+        (shape, res['tasks'], res['tasks_per_sec'],
+         '%7.3fs' % first_submission if first_submission is not None else '      -',
+         res['peak_rss'] / 1024.0 / 1024.0)
+
+    for first, second in TRANSITIONS:
+        lat = res['latencies'].get('%s-%s' % (first, second))
+        if lat:
+            print '    %-24s %s' % ('%s-%s' % (first, second),
+                                    '  '.join(['p%d: %8.4fs' % (p, lat['p%d' % p]) for p in PERCENTILES]))
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--grid', default='1x1x10,1x1x100,1x1x1000,1x10x100,10x1x100,10x10x10',
+                        help='comma separated list of shapes <pipelines>x<stages>x<tasks per stage>')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='compare the results to this JSON file')
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='relative change which is considered a regression (default: 0.1)')
+    parser.add_argument('--engine', default='rmq', choices=['rmq', 'local'],
+                        help='engine of the AppManager (default: rmq)')
+    parser.add_argument('--run', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        pipelines, stages, tasks = [int(x) for x in args.run.split('x')]
+        print json.dumps(run(pipelines, stages, tasks, args.engine))
+        sys.exit(0)
+
+    environ = dict(os.environ)
+    environ['RADICAL_ENTK_PROFILE'] = 'True'
+
+    results = dict()
+    for shape in args.grid.split(','):
+
+        out = subprocess.check_output([sys.executable, __file__, '--run', shape, '--engine', args.engine],
+                                      env=environ)
+        results[shape] = json.loads(out.strip().splitlines()[-1])
+        report(shape, results[shape])
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4, sort_keys=True)
+
+    if args.baseline:
+
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+        regressions = compare(results, baseline, args.tolerance)
+
+        if regressions:
+            print '\nRegressions:'
+            for regression in regressions:
+                print '    %s' % regression
+            sys.exit(1)
+
+        print '\nNo regressions'
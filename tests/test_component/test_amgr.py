@@ -3,7 +3,9 @@ from hypothesis import given
 import hypothesis.strategies as st
 from radical.entk import Pipeline, Stage, Task, states
 from radical.entk.exceptions import *
-from radical.entk.utils.sync_initiator import sync_with_master
+from radical.entk.utils.sync_initiator import sync_with_master, sync_stages_with_master, sync_pilot_with_master
+from radical.entk.utils.scaling import GROW, SHRINK
+from radical.entk.utils.metrics import Registry, get_registry
 import radical.utils as ru
 import pytest
 import pika
@@ -268,7 +270,9 @@ def test_amgr_setup_mqs():
         '%s-sync-to-tmgr' % amgr._sid,
         '%s-sync-to-cb' % amgr._sid,
         '%s-sync-to-enq' % amgr._sid,
-        '%s-sync-to-deq' % amgr._sid
+        '%s-sync-to-deq' % amgr._sid,
+        '%s-hb-request' % amgr._sid,
+        '%s-hb-response' % amgr._sid
     ]
 
     for q in qs:
@@ -283,6 +287,51 @@ def test_amgr_setup_mqs():
     assert set(qs) < set(lines)
 
 
+
+def test_amgr_setup_mqs_single_connection():
+
+    # All queues are declared over one connection
+    class Channel(object):
+
+        def __init__(self):
+            self.declared = list()
+
+        def queue_declare(self, queue):
+            self.declared.append(queue)
+
+    class Connection(object):
+
+        def __init__(self, params):
+            self.chan = Channel()
+
+        def channel(self):
+            return self.chan
+
+        def close(self):
+            pass
+
+    connections = list()
+
+    def connect(params):
+        connections.append(Connection(params))
+        return connections[-1]
+
+    amgr = Amgr(hostname=hostname, port=port)
+    blocking_connection = pika.BlockingConnection
+    pika.BlockingConnection = connect
+
+    try:
+        assert amgr._setup_mqs() == True
+    finally:
+        pika.BlockingConnection = blocking_connection
+        if os.path.exists('.%s.txt' % amgr._sid):
+            os.remove('.%s.txt' % amgr._sid)
+
+    assert len(connections) == 1
+    declared = connections[0].chan.declared
+    assert len(declared) == 12
+    assert set(amgr._pending_queue + amgr._completed_queue) < set(declared)
+
 def test_amgr_cleanup_mqs():
 
     amgr = Amgr(hostname=hostname, port=port)
@@ -396,6 +445,133 @@ def test_amgr_synchronizer():
     sync_thread.join()
 
 
+def func_for_structure_test(sid, p, logger, profiler):
+
+    mq_connection = pika.BlockingConnection(pika.ConnectionParameters(host=hostname, port=port))
+    mq_channel = mq_connection.channel()
+
+    # Stages added at runtime, as by a post_exec callback
+    stages = list()
+    for _ in range(10):
+        s = Stage()
+        s.add_tasks([Task() for _ in range(10)])
+        stages.append(s)
+
+    p.add_stages(stages)
+
+    for s in stages:
+        s.parent_pipeline['uid'] = p.uid
+        s._assign_uid(sid)
+
+    sync_stages_with_master(pipe=p,
+                            stages=stages,
+                            tasks=list(),
+                            channel=mq_channel,
+                            queue='%s-deq-to-sync' % sid,
+                            logger=logger,
+                            local_prof=profiler)
+
+    # A state update of a new task does not add it again
+    t = list(stages[0].tasks)[0]
+    t.state = states.SCHEDULING
+    sync_with_master(obj=t,
+                     obj_type='Task',
+                     channel=mq_channel,
+                     queue='%s-tmgr-to-sync' % sid,
+                     logger=logger,
+                     local_prof=profiler)
+
+    mq_connection.close()
+
+
+def test_amgr_synchronizer_structure():
+
+    logger = ru.get_logger('radical.entk.temp_logger')
+    profiler = ru.Profiler(name='radical.entk.temp')
+    amgr = Amgr(hostname=hostname, port=port)
+
+    amgr._setup_mqs()
+
+    p = Pipeline()
+    s = Stage()
+    t = Task()
+    t.executable = ['/bin/date']
+    s.add_tasks(t)
+    p.add_stages(s)
+    p._assign_uid(amgr._sid)
+    p._validate()
+
+    amgr.workflow = [p]
+
+    amgr._terminate_sync = Event()
+    sync_thread = Thread(target=amgr._synchronizer, name='synchronizer-thread')
+    sync_thread.start()
+
+    proc = Process(target=func_for_structure_test, name='temp-proc',
+                   args=(amgr._sid, p, logger, profiler))
+
+    proc.start()
+    proc.join()
+
+    amgr._terminate_sync.set()
+    sync_thread.join()
+
+    # All stages and tasks were added by one message
+    assert len(p.stages) == 11
+    assert [len(s.tasks) for s in p.stages[1:]] == [10] * 10
+    assert [t.state for t in p.stages[1].tasks].count(states.SCHEDULING) == 1
+
+
+
+def func_for_pilot_test(sid, logger, profiler):
+
+    mq_connection = pika.BlockingConnection(pika.ConnectionParameters(host=hostname, port=port))
+    mq_channel = mq_connection.channel()
+
+    # Pilots added and retired by the tmgr
+    for action, index in [(GROW, 1), (GROW, 2), (SHRINK, 2)]:
+        sync_pilot_with_master(action=action,
+                               index=index,
+                               uid=None,
+                               channel=mq_channel,
+                               queue='%s-tmgr-to-sync' % sid,
+                               logger=logger,
+                               local_prof=profiler)
+
+    mq_connection.close()
+
+
+def test_amgr_synchronizer_pilots():
+
+    logger = ru.get_logger('radical.entk.temp_logger')
+    profiler = ru.Profiler(name='radical.entk.temp')
+    amgr = Amgr(hostname=hostname, port=port, rts='mock')
+    amgr.resource_desc = {'resource': 'local.localhost',
+                          'walltime': 30,
+                          'cpus': 8,
+                          'scaling': {'max_pilots': 3, 'pilot': {'cpus': 4}}}
+
+    amgr._setup_mqs()
+
+    amgr._terminate_sync = Event()
+    sync_thread = Thread(target=amgr._synchronizer, name='synchronizer-thread')
+    sync_thread.start()
+
+    proc = Process(target=func_for_pilot_test, name='temp-proc',
+                   args=(amgr._sid, logger, profiler))
+
+    proc.start()
+    proc.join()
+
+    amgr._terminate_sync.set()
+    sync_thread.join()
+
+    # The ResourceManager of the AppManager knows the pilots of the tmgr
+    rmgr = amgr._resource_manager
+    assert len(rmgr.pilot_descs) == 3
+    assert rmgr.retired_pilots == set([2])
+    assert rmgr.cpus == 12
+
 def test_sid_in_mqs():
 
     appman = Amgr(hostname=hostname, port=port)
@@ -488,3 +664,19 @@ def test_state_order():
         t_state_hist = t.state_history
         assert t_state_hist == ['DESCRIBED', 'SCHEDULING', 'SCHEDULED', 'SUBMITTING', 'SUBMITTED',
                             'EXECUTED', 'DEQUEUEING', 'DEQUEUED', 'DONE']
+
+
+def test_amgr_metrics():
+
+    amgr = Amgr(hostname=hostname, port=port)
+
+    registry = Registry(name='wfprocessor.0000')
+    registry.counter('entk_tasks_enqueued_total').inc(5)
+    registry.write('%s/radical.entk.wfprocessor.0000.prom' % amgr._path)
+
+    get_registry().gauge('entk_queue_depth', labels={'queue': 'pendingq-1'}).set(3)
+
+    metrics = amgr.metrics()
+
+    assert metrics['wfprocessor.0000'] == {'entk_tasks_enqueued_total{component="wfprocessor.0000"}': 5}
+    assert metrics[amgr._uid]['entk_queue_depth{queue="pendingq-1"}'] == 3
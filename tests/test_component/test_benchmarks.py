@@ -0,0 +1,56 @@
+import os
+import sys
+import json
+import shutil
+import tempfile
+import subprocess
+
+BENCHMARKS = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks')
+
+
+def run_benchmark(script, args, cwd):
+
+    return subprocess.call([sys.executable, os.path.join(BENCHMARKS, script)] + args, cwd=cwd)
+
+
+def test_bench_throughput_smoke():
+
+    path = tempfile.mkdtemp()
+
+    try:
+        results = os.path.join(path, 'results.json')
+
+        # A tiny grid on the local engine, which needs no RabbitMQ
+        assert run_benchmark('bench_throughput.py',
+                             ['--grid', '1x1x2,1x2x2', '--engine', 'local', '--output', results], path) == 0
+
+        with open(results) as f:
+            res = json.load(f)
+
+        assert sorted(res.keys()) == ['1x1x2', '1x2x2']
+        assert res['1x2x2']['tasks'] == 4
+        assert res['1x2x2']['first_submission'] >= 0
+        assert 'SUBMITTED-EXECUTED' in res['1x2x2']['latencies']
+
+        # No regressions against a slower baseline, regressions against a faster one
+        for shape in res.values():
+            shape['tasks_per_sec'] = 0
+            for lat in shape['latencies'].values():
+                lat['p50'] = 3600
+
+        baseline = os.path.join(path, 'baseline.json')
+        with open(baseline, 'w') as f:
+            json.dump(res, f)
+
+        assert run_benchmark('bench_throughput.py',
+                             ['--grid', '1x1x2', '--engine', 'local', '--baseline', baseline], path) == 0
+
+        res['1x1x2']['tasks_per_sec'] = 1e9
+        with open(baseline, 'w') as f:
+            json.dump(res, f)
+
+        assert run_benchmark('bench_throughput.py',
+                             ['--grid', '1x1x2', '--engine', 'local', '--baseline', baseline], path) == 1
+
+    finally:
+        shutil.rmtree(path)
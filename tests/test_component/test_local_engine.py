@@ -0,0 +1,143 @@
+from radical.entk import Pipeline, Stage, Task, states
+from radical.entk import AppManager as Amgr
+from radical.entk.appman.local_engine import LocalEngine
+import radical.utils as ru
+import shutil
+import os
+
+
+def create_pipeline(stages=2, tasks=3):
+
+    p = Pipeline()
+    for _ in range(stages):
+        s = Stage()
+        for _ in range(tasks):
+            t = Task()
+            t.executable = ['/bin/date']
+            s.add_tasks(t)
+        p.add_stages(s)
+
+    return p
+
+
+def test_local_engine_run():
+
+    name = ru.generate_id('test.local_engine.%(item_counter)04d', ru.ID_CUSTOM)
+
+    # Neither RabbitMQ nor further processes are needed
+    amgr = Amgr(rts='mock', engine='local', name=name,
+                rts_config={'runtime': {'distribution': 'fixed', 'value': 0.01},
+                            'failure_probability': 0.3,
+                            'seed': 1})
+    amgr.resource_desc = {'resource': 'local.localhost', 'walltime': 10, 'cpus': 2}
+
+    pipelines = [create_pipeline() for _ in range(2)]
+    for p in pipelines:
+        for s in p.stages:
+            for t in s.tasks:
+                t.retry = {'max_attempts': 20}
+
+    amgr.workflow = pipelines
+    amgr.run()
+
+    assert isinstance(amgr._wfp, LocalEngine)
+    assert not amgr._task_manager
+
+    tasks = [t for p in pipelines for s in p.stages for t in s.tasks]
+    assert [p.state for p in pipelines] == [states.DONE] * 2
+    assert set([t.state for t in tasks]) == set([states.DONE])
+    assert max([t.attempts for t in tasks]) > 1
+
+    # The workflow of the AppManager went through all states
+    history = [state for i, state in enumerate(tasks[0].state_history)
+               if not i or state != tasks[0].state_history[i - 1]]
+    assert history[-4:] == [states.COMPLETED, states.DEQUEUEING, states.DEQUEUED, states.DONE]
+
+    shutil.rmtree(name, ignore_errors=True)
+
+
+def test_local_engine_post_exec():
+
+    name = ru.generate_id('test.local_engine.%(item_counter)04d', ru.ID_CUSTOM)
+
+    amgr = Amgr(rts='mock', engine='local', name=name)
+    amgr.resource_desc = {'resource': 'local.localhost', 'walltime': 10, 'cpus': 1}
+
+    p = create_pipeline(stages=1)
+
+    def condition():
+        return len(p.stages) < 3
+
+    def on_true():
+        s = Stage()
+        s.add_tasks([Task() for _ in range(2)])
+        s.post_exec = {'condition': condition, 'on_true': on_true, 'on_false': on_false}
+        p.add_stages(s)
+
+    def on_false():
+        pass
+
+    p.stages[0].post_exec = {'condition': condition, 'on_true': on_true, 'on_false': on_false}
+
+    amgr.workflow = [p]
+    amgr.run()
+
+    # Stages added at runtime are executed as well
+    assert len(p.stages) == 3
+    assert [s.state for s in p.stages] == [states.DONE] * 3
+    assert p.state == states.DONE
+
+    shutil.rmtree(name, ignore_errors=True)
+
+
+def test_local_engine_post_exec_failed():
+
+    name = ru.generate_id('test.local_engine.%(item_counter)04d', ru.ID_CUSTOM)
+
+    amgr = Amgr(rts='mock', engine='local', name=name)
+    amgr.resource_desc = {'resource': 'local.localhost', 'walltime': 10, 'cpus': 1}
+
+    p1 = create_pipeline()
+    p2 = create_pipeline()
+
+    def fail():
+        raise RuntimeError('post_exec failed')
+
+    p1.stages[0].post_exec = {'condition': lambda: True, 'on_true': fail, 'on_false': fail}
+
+    amgr.workflow = [p1, p2]
+    amgr.run()
+
+    # Only the pipeline of the failed callback is affected
+    assert p1.state == states.FAILED
+    assert p1.stages[1].state == states.INITIAL
+    assert p2.state == states.DONE
+
+    shutil.rmtree(name, ignore_errors=True)
+
+
+def test_local_engine_profile():
+
+    name = ru.generate_id('test.local_engine.%(item_counter)04d', ru.ID_CUSTOM)
+
+    env = os.environ.get('RADICAL_ENTK_PROFILE')
+    os.environ['RADICAL_ENTK_PROFILE'] = 'True'
+
+    try:
+        amgr = Amgr(rts='mock', engine='local', name=name)
+        amgr.resource_desc = {'resource': 'local.localhost', 'walltime': 10, 'cpus': 1}
+        amgr.workflow = [create_pipeline(stages=1, tasks=1)]
+        amgr.run()
+
+        # The session is described without a task manager
+        desc = ru.read_json('%s/radical.entk.%s.json' % (name, name))
+        assert desc['tree'][amgr._uid]['has'] == ['pipeline', 'wfprocessor', 'resource_manager']
+        assert amgr._wfp._uid in desc['tree'][amgr._uid]['children']
+
+    finally:
+        if env is None:
+            os.environ.pop('RADICAL_ENTK_PROFILE', None)
+        else:
+            os.environ['RADICAL_ENTK_PROFILE'] = env
+
+        shutil.rmtree(name, ignore_errors=True)
@@ -0,0 +1,122 @@
+from radical.entk import AppManager as Amgr
+from radical.entk import ResourcePool, Pipeline, Stage, Task
+from radical.entk.exceptions import *
+import radical.utils as ru
+import pytest
+import shutil
+import os
+
+hostname = os.environ.get('RMQ_HOSTNAME', 'localhost')
+port = int(os.environ.get('RMQ_PORT', 5672))
+
+
+def test_resource_pool_attach():
+
+    pool_name = ru.generate_id('test.pool.%(item_counter)04d', ru.ID_CUSTOM)
+    pool = ResourcePool(name=pool_name)
+
+    assert pool.sid == pool_name
+    assert not pool.resource_manager
+    assert not pool.closed
+
+    with pytest.raises(TypeError):
+        Amgr(hostname=hostname, port=port, pool='pool')
+
+    with pytest.raises(ValueError):
+        Amgr(hostname=hostname, port=port, pool=pool, name='other')
+
+    res_dict = {'resource': 'local.localhost', 'walltime': 10, 'cpus': 1}
+
+    amgr_1 = Amgr(hostname=hostname, port=port, rts='mock', pool=pool)
+    amgr_1.resource_desc = res_dict
+
+    assert amgr_1.sid == pool_name
+    assert pool.resource_manager is amgr_1._resource_manager
+
+    # Later AppManagers attach to the resource of the pool
+    amgr_2 = Amgr(hostname=hostname, port=port, rts='mock', pool=pool)
+
+    assert amgr_2.sid == pool_name
+    assert amgr_2._uid != amgr_1._uid
+    assert amgr_2._resource_manager is amgr_1._resource_manager
+
+    amgr_2.resource_desc = res_dict
+    assert amgr_2._resource_manager is amgr_1._resource_manager
+
+    with pytest.raises(ValueError):
+        amgr_2.resource_desc = dict(res_dict, cpus=2)
+
+    shutil.rmtree(pool_name, ignore_errors=True)
+
+
+def test_resource_pool_lifecycle():
+
+    pool_name = ru.generate_id('test.pool.%(item_counter)04d', ru.ID_CUSTOM)
+    pool = ResourcePool(name=pool_name)
+
+    amgr_1 = Amgr(hostname=hostname, port=port, rts='mock', pool=pool)
+    amgr_2 = Amgr(hostname=hostname, port=port, rts='mock', pool=pool)
+    amgr_1.resource_desc = {'resource': 'local.localhost', 'walltime': 10, 'cpus': 1}
+
+    # Only one AppManager runs at a time
+    pool._acquire(amgr_1)
+
+    with pytest.raises(EnTKError):
+        pool._acquire(amgr_2)
+
+    with pytest.raises(EnTKError):
+        pool.close()
+
+    amgr_1._mqs_setup = True
+    amgr_1._pending_queue.append('%s-pendingq-1' % pool_name)
+    pool._release(amgr_1)
+
+    # The components of the previous run are handed to the next one
+    pool._acquire(amgr_2)
+
+    assert amgr_2._mqs_setup
+    assert amgr_2._pending_queue == ['%s-pendingq-1' % pool_name]
+    assert amgr_2._resource_manager is amgr_1._resource_manager
+
+    # Components terminated after an error close the pool
+    pool._release(amgr_2, terminated=True)
+
+    assert pool.closed
+    pool.close()
+
+    with pytest.raises(EnTKError):
+        pool._acquire(amgr_1)
+
+    shutil.rmtree(pool_name, ignore_errors=True)
+
+
+def test_resource_pool_run_errors():
+
+    pool_name = ru.generate_id('test.pool.%(item_counter)04d', ru.ID_CUSTOM)
+    pool = ResourcePool(name=pool_name)
+
+    # Errors in the script do not close the pool
+    amgr = Amgr(hostname=hostname, port=port, rts='mock', pool=pool)
+
+    with pytest.raises(MissingError):
+        amgr.run()
+
+    p = Pipeline()
+    s = Stage()
+    t = Task()
+    t.executable = ['/bin/date']
+    s.add_tasks(t)
+    p.add_stages(s)
+    amgr.workflow = [p]
+
+    with pytest.raises(MissingError):
+        amgr.run()
+
+    assert not pool.closed
+    assert not pool._running
+
+    amgr.resource_desc = {'resource': 'local.localhost', 'walltime': 10, 'cpus': 1}
+    assert pool.resource_manager is amgr._resource_manager
+
+    pool.close()
+    shutil.rmtree(pool_name, ignore_errors=True)
@@ -233,6 +233,46 @@ def test_rmgr_base_populate(t, i):
     assert rmgr._queue == 'high'
     assert rmgr._validated == True
 
+def test_rmgr_base_pilots():
+
+    res_dict = {
+        'walltime': 30,
+        'project': 'new',
+        'placement': 'least_loaded',
+        'pilots': [{'resource': 'local.localhost', 'cpus': 8},
+                   {'resource': 'xsede.comet', 'cpus': 16, 'walltime': 60, 'queue': 'debug'}]
+    }
+
+    rmgr = BaseRmgr(res_dict, sid='test.0000', rts=None, rts_config={})
+    rmgr._validate_resource_desc()
+    rmgr._populate()
+
+    assert rmgr.placement == 'least_loaded'
+    assert len(rmgr.pilot_descs) == 2
+    assert rmgr.pilot_descs[0]['walltime'] == 30
+    assert rmgr.pilot_descs[0]['project'] == 'new'
+    assert rmgr.pilot_descs[0]['queue'] == None
+    assert rmgr.pilot_descs[1]['walltime'] == 60
+    assert rmgr.pilot_descs[1]['queue'] == 'debug'
+    assert rmgr.resource == 'local.localhost'
+    assert rmgr.cpus == 24
+    assert rmgr.walltime == 60
+
+    with pytest.raises(ValueError):
+        rm = BaseRmgr(dict(res_dict, placement='random'), sid='test.0000', rts=None, rts_config={})
+        rm._validate_resource_desc()
+
+    with pytest.raises(MissingError):
+        rm = BaseRmgr(dict(res_dict, pilots=[{'resource': 'local.localhost'}]),
+                      sid='test.0000', rts=None, rts_config={})
+        rm._validate_resource_desc()
+
+    with pytest.raises(TypeError):
+        rm = BaseRmgr(dict(res_dict, pilots={'resource': 'local.localhost', 'cpus': 8}),
+                      sid='test.0000', rts=None, rts_config={})
+        rm._validate_resource_desc()
+
+
 def test_rmgr_base_submit_resource_request():
 
     rmgr = BaseRmgr({}, 'test.0000', None, {})
@@ -291,10 +331,44 @@ def test_rmgr_mock_methods():
     assert not rmgr.get_completed_states()
     assert rmgr._validate_resource_desc()
     assert not rmgr._populate()
+    assert not rmgr.wait_for_resource(timeout=0)
     assert not rmgr._submit_resource_request()
+    assert rmgr.wait_for_resource(timeout=0)
     assert not rmgr._terminate_resource_request()
 
 
+def test_rmgr_mock_scaling():
+
+    res_dict = {'resource': 'local.localhost',
+                'walltime': 30,
+                'cpus': 8,
+                'scaling': {'max_pilots': 3, 'pilot': {'cpus': 4}}}
+
+    rmgr = MockRmgr(resource_desc=res_dict, sid='test.0000')
+    rmgr._populate()
+
+    assert rmgr.scaling['max_pilots'] == 3
+    assert rmgr.scaling['pilot']['cpus'] == 4
+    assert rmgr.scaling['pilot']['resource'] == 'local.localhost'
+
+    assert rmgr._add_pilot() == 1
+    assert rmgr.cpus == 12
+    assert len(rmgr.pilot_descs) == 2
+
+    rmgr._retire_pilot(1)
+    rmgr._retire_pilot(1)
+    assert rmgr.cpus == 8
+    assert rmgr.retired_pilots == set([1])
+
+    with pytest.raises(ValueError):
+        rm = BaseRmgr(dict(res_dict, scaling={'max_pilots': 0}), sid='test.0000', rts=None, rts_config={})
+        rm._validate_resource_desc()
+
+    with pytest.raises(TypeError):
+        rm = BaseRmgr(dict(res_dict, scaling={'pilot': {'cpus': 'x'}}), sid='test.0000', rts=None, rts_config={})
+        rm._validate_resource_desc()
+
+
 @given(d=st.dictionaries(st.text(), st.text()))
 def test_rmgr_rp_initialization(d):
 
@@ -0,0 +1,70 @@
+from radical.entk.execman.mock.runtime_model import RuntimeModel
+from radical.entk.exceptions import *
+from radical.entk import Task
+import pytest
+
+
+def test_runtime_model_disabled():
+
+    model = RuntimeModel({"sandbox_cleanup": False, "db_cleanup": False})
+
+    assert not model.enabled
+    assert model.runtime(Task()) == 0
+    assert not model.fails(Task())
+
+
+def test_runtime_model_validation():
+
+    with pytest.raises(TypeError):
+        RuntimeModel([])
+
+    with pytest.raises(ValueError):
+        RuntimeModel({'runtime': {'distribution': 'gamma'}})
+
+    with pytest.raises(MissingError):
+        RuntimeModel({'runtime': {'distribution': 'attribute'}})
+
+    with pytest.raises(ValueError):
+        RuntimeModel({'failure_probability': 2})
+
+
+def test_runtime_model_distributions():
+
+    t = Task()
+
+    model = RuntimeModel({'runtime': {'distribution': 'fixed', 'value': 3}})
+    assert model.enabled
+    assert model.runtime(t) == 3
+
+    model = RuntimeModel({'runtime': {'distribution': 'uniform', 'min': 1, 'max': 2}, 'seed': 1})
+    assert all([1 <= model.runtime(t) <= 2 for _ in range(100)])
+
+    model = RuntimeModel({'runtime': {'distribution': 'lognormal', 'mu': 0, 'sigma': 0.5}, 'seed': 1})
+    assert all([model.runtime(t) > 0 for _ in range(100)])
+
+    # The same seed gives the same runtimes
+    other = RuntimeModel({'runtime': {'distribution': 'lognormal', 'mu': 0, 'sigma': 0.5}, 'seed': 1})
+    model = RuntimeModel({'runtime': {'distribution': 'lognormal', 'mu': 0, 'sigma': 0.5}, 'seed': 1})
+    assert [model.runtime(t) for _ in range(10)] == [other.runtime(t) for _ in range(10)]
+
+    model = RuntimeModel({'runtime': {'distribution': 'attribute', 'attribute': 'arguments', 'value': 5}})
+    t.arguments = ['10']
+    assert model.runtime(t) == 10
+    t.arguments = ['-c', 'sleep 10']
+    assert model.runtime(t) == 5
+
+
+def test_runtime_model_failures_and_cores():
+
+    t = Task()
+
+    model = RuntimeModel({'failure_probability': 1})
+    assert model.enabled
+    assert model.fails(t)
+
+    model = RuntimeModel({'failure_probability': 0.5, 'seed': 1})
+    assert 30 < sum([model.fails(t) for _ in range(100)]) < 70
+
+    t.cpu_reqs = {'processes': 4, 'process_type': None, 'threads_per_process': 2, 'thread_type': None}
+    assert model.cores(t) == 8
+    assert model.cores(t, capacity=6) == 6
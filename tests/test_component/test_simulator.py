@@ -0,0 +1,175 @@
+from radical.entk import Pipeline, Stage, Task, states
+from radical.entk.appman.simulator import Simulator
+from radical.entk.exceptions import *
+import pytest
+import shutil
+import os
+
+
+def create_pipeline(stages=2, tasks=4, runtimes=None):
+
+    p = Pipeline()
+
+    for _ in range(stages):
+
+        s = Stage()
+        for i in range(tasks):
+            t = Task()
+            t.executable = ['/bin/sleep']
+            if runtimes:
+                t.arguments = [str(runtimes[i])]
+            s.add_tasks(t)
+
+        p.add_stages(s)
+
+    return p
+
+
+def test_simulator_validation():
+
+    with pytest.raises(ValueError):
+        Simulator(policy='random')
+
+    with pytest.raises(ValueError):
+        Simulator(resource_desc={'cpus': 0})
+
+    sim = Simulator(name='test.simulator.0000')
+
+    with pytest.raises(MissingError):
+        sim.run()
+
+    with pytest.raises(TypeError):
+        sim.workflow = [Stage()]
+
+    shutil.rmtree(sim.sid, ignore_errors=True)
+
+
+def test_simulator_run():
+
+    sim = Simulator(resource_desc={'cpus': 4},
+                    rts_config={'runtime': {'distribution': 'fixed', 'value': 10}},
+                    name='test.simulator.0001')
+
+    workflow = [create_pipeline(), create_pipeline()]
+    sim.workflow = workflow
+
+    res = sim.run()
+
+    # 8 tasks per stage on 4 cores
+    assert res['makespan'] == 40
+    assert res['utilization'] == 1.0
+    assert res['submitted'] == res['done'] == 16
+    assert not res['failed']
+    assert not res['incomplete']
+
+    for p in workflow:
+        assert p.completed
+        assert p.state == states.DONE
+        for s in p.stages:
+            assert s.state == states.DONE
+            for t in s.tasks:
+                assert t.state_history == [states.INITIAL, states.SCHEDULING, states.SCHEDULED,
+                                           states.SUBMITTING, states.SUBMITTED, states.COMPLETED,
+                                           states.DEQUEUEING, states.DEQUEUED, states.DONE]
+
+    shutil.rmtree(sim.sid, ignore_errors=True)
+
+
+def test_simulator_post_exec():
+
+    sim = Simulator(resource_desc={'cpus': 4},
+                    rts_config={'runtime': {'distribution': 'fixed', 'value': 10}},
+                    name='test.simulator.0002')
+
+    p = create_pipeline(stages=1)
+    times = list()
+
+    def condition():
+        times.append(sim.now)
+        return len(p.stages) < 3
+
+    def on_true():
+        s = Stage()
+        s.add_tasks([Task() for _ in range(2)])
+        s.post_exec = {'condition': condition, 'on_true': on_true, 'on_false': on_false}
+        p.add_stages(s)
+
+    def on_false():
+        pass
+
+    p.stages[0].post_exec = {'condition': condition, 'on_true': on_true, 'on_false': on_false}
+
+    sim.workflow = [p]
+    res = sim.run()
+
+    assert times == [10, 20, 30]
+    assert len(p.stages) == 3
+    assert res['done'] == 8
+    assert p.state == states.DONE
+
+    shutil.rmtree(sim.sid, ignore_errors=True)
+
+
+def test_simulator_failures():
+
+    config = {'runtime': {'distribution': 'fixed', 'value': 1}, 'failure_probability': 0.3, 'seed': 1}
+
+    sim = Simulator(resource_desc={'cpus': 8}, rts_config=config, name='test.simulator.0003')
+    p = create_pipeline(tasks=20)
+    sim.workflow = [p]
+    res = sim.run()
+
+    assert res['failed']
+    assert res['done'] + res['failed'] == 40
+    assert p.state == states.DONE
+    assert states.FAILED in [t.state for t in p.stages[0].tasks]
+
+    sim = Simulator(resource_desc={'cpus': 8}, rts_config=config, resubmit_failed=True,
+                    name='test.simulator.0004')
+    p = create_pipeline(tasks=20)
+    sim.workflow = [p]
+    res = sim.run()
+
+    assert res['failed']
+    assert res['done'] == 40
+    assert res['submitted'] == 40 + res['failed']
+
+    shutil.rmtree('test.simulator.0003', ignore_errors=True)
+    shutil.rmtree('test.simulator.0004', ignore_errors=True)
+
+
+def test_simulator_policies():
+
+    config = {'runtime': {'distribution': 'attribute', 'attribute': 'arguments'}}
+    runtimes = [10, 1, 1, 1]
+    makespans = dict()
+
+    for policy in ['fifo', 'sjf', 'ljf']:
+
+        sim = Simulator(resource_desc={'cpus': 2}, rts_config=config, policy=policy,
+                        name='test.simulator.%s' % policy)
+        sim.workflow = [create_pipeline(stages=1, runtimes=runtimes)]
+        makespans[policy] = sim.run()['makespan']
+
+        shutil.rmtree(sim.sid, ignore_errors=True)
+
+    assert makespans['ljf'] == 10
+    assert makespans['sjf'] == 11
+
+
+def test_simulator_walltime():
+
+    sim = Simulator(resource_desc={'cpus': 1, 'walltime': 1},
+                    rts_config={'runtime': {'distribution': 'fixed', 'value': 20}},
+                    name='test.simulator.0005')
+    p = create_pipeline()
+    sim.workflow = [p]
+    res = sim.run()
+
+    assert res['incomplete']
+    assert res['makespan'] == 60
+    assert res['done'] == 3
+    assert res['utilization'] == 1.0
+    assert not p.completed
+
+    shutil.rmtree(sim.sid, ignore_errors=True)
@@ -139,6 +139,23 @@ def test_stage_post_exec_assignment(l, d):
     s.post_exec = pe_d
 
 
+def test_stage_retry_assignment():
+
+    s = Stage()
+    assert s.retry == None
+
+    with pytest.raises(TypeError):
+        s.retry = [3]
+
+    with pytest.raises(ValueError):
+        s.retry = {'max_failures': 0}
+
+    s.retry = {'max_attempts': None, 'max_failures': 2}
+    assert s.retry['max_attempts'] == None
+    assert s.retry['max_failures'] == 2
+    assert s.retry['backoff'] == 0
+
+
 def test_stage_task_addition():
 
     s = Stage()
@@ -40,6 +40,8 @@ def test_task_initialization():
     assert t.exit_code == None
     assert t.tag == None
     assert t.path == None
+    assert t.attempts == 0
+    assert t.retry == None
     assert t.state_history == [states.INITIAL]
     assert t.parent_pipeline['uid'] == None
     assert t.parent_pipeline['name'] == None
@@ -211,6 +213,7 @@ def test_task_to_dict():
                     'exit_code': None,
                     'path': None,
                     'tag': None,
+                    'attempts': 0,
                     'parent_stage': {'uid':None, 'name': None},
                     'parent_pipeline': {'uid':None, 'name': None}}
 
@@ -274,6 +277,7 @@ def test_task_to_dict():
                     'exit_code': 1,
                     'path': 'a/b/c',
                     'tag': 'task.0010',
+                    'attempts': 0,
                     'parent_stage': {'uid': 's1', 'name': 'stage1'},
                     'parent_pipeline': {'uid': 'p1', 'name': 'pipeline1'}}
 
@@ -316,6 +320,7 @@ def test_task_from_dict():
             'exit_code': 555,
             'path': 'here/it/is',
             'tag': 'task.0010',
+            'attempts': 2,
             'parent_stage': {'uid': 's1', 'name': 'stage1'},
             'parent_pipeline': {'uid': 'p1', 'name': 'pipe1'}}
 
@@ -345,10 +350,76 @@ def test_task_from_dict():
     assert t.exit_code             == d['exit_code']
     assert t.path                  == d['path']
     assert t.tag                   == d['tag']
+    assert t.attempts              == d['attempts']
     assert t.parent_stage          == d['parent_stage']
     assert t.parent_pipeline       == d['parent_pipeline']
 
 
+def test_task_retry_assignment():
+
+    t = Task()
+
+    with pytest.raises(TypeError):
+        t.retry = 3
+
+    with pytest.raises(ValueError):
+        t.retry = {'attempts': 3}
+
+    with pytest.raises(ValueError):
+        t.retry = {'max_attempts': 0}
+
+    with pytest.raises(ValueError):
+        t.retry = {'backoff': -1}
+
+    # Stage policies only
+    with pytest.raises(ValueError):
+        t.retry = {'max_failures': 1}
+
+    t.retry = {'max_attempts': 3, 'backoff': 10}
+    assert t.retry == {'max_attempts': 3,
+                       'backoff': 10,
+                       'backoff_factor': 2.0,
+                       'max_backoff': 600.0}
+
+    t.retry = None
+    assert t.retry == None
+
+
+def test_task_staging_directives():
+
+    t = Task()
+    assert t.staging_directives('copy_input_data') == []
+
+    t.copy_input_data = ['/home/vivek/test.dat', '/home/vivek/test.dat > new_test.dat ',
+                         '$SHARED/test.dat', '$Pipeline_p1_Stage_s1_Task_t1/test.dat > new_test.dat']
+
+    assert t.staging_directives('copy_input_data') == [('/home/vivek/test.dat', 'test.dat', 'copy', False),
+                                                        ('/home/vivek/test.dat', 'new_test.dat', 'copy', False),
+                                                        ('$SHARED/test.dat', None, 'copy', True),
+                                                        ('$Pipeline_p1_Stage_s1_Task_t1/test.dat', 'new_test.dat',
+                                                         'copy', True)]
+
+    # Lists modified in place are parsed again
+    t.copy_input_data.append('a.dat')
+    assert t.staging_directives('copy_input_data')[-1] == ('a.dat', 'a.dat', 'copy', False)
+
+    t.upload_input_data = ['a.dat']
+    assert t.staging_directives('upload_input_data')[0].action == 'transfer'
+
+    with pytest.raises(ValueError):
+        t.staging_directives('pre_exec')
+
+    # Malformed entries are rejected when they are assigned
+    for entry in ['a > b > c', ' > b', 'a > ', '$Task_2/a.dat', 'a > /data/$HOME/b']:
+        with pytest.raises(ValueError):
+            t.link_input_data = [entry]
+
+    with pytest.raises(TypeError):
+        t.move_output_data = [1]
+
+    assert t.link_input_data == []
+
+
 def test_task_assign_uid():
 
     t = Task()
@@ -222,6 +222,53 @@ def test_tmgr_base_terminate_manager():
     assert tmgr._tmgr_terminate.is_set()
 
 
+def test_tmgr_base_heartbeat_liveness():
+
+    sid = 'test.0000'
+    rmgr = BaseRmgr({}, sid, None, {})
+
+    os.environ['ENTK_HB_INTERVAL'] = '1'
+    os.environ['ENTK_HB_TIMEOUT'] = '1'
+
+    tmgr = BaseTmgr(sid=sid,
+                    pending_queue=['pending-1'],
+                    completed_queue=['completed-1'],
+                    rmgr=rmgr,
+                    mq_hostname=hostname,
+                    port=port,
+                    rts=None)
+
+    # Regular traffic of the tmgr keeps the heartbeat alive without requests
+    tmgr._tmgr_process = Process(target=sleep, args=(5,))
+    tmgr._tmgr_process.start()
+
+    assert tmgr.start_heartbeat()
+    for _ in range(30):
+        tmgr.record_activity()
+        sleep(0.1)
+    assert tmgr.check_heartbeat()
+
+    # Without traffic and responses, the tmgr is declared dead after the
+    # interval and the timeout
+    sleep(3)
+    assert not tmgr.check_heartbeat()
+
+    tmgr._hb_thread = None
+    tmgr._tmgr_process.terminate()
+    tmgr._tmgr_process.join()
+
+    # A dead tmgr process is detected within a fraction of a second
+    tmgr._tmgr_process = Process(target=sleep, args=(0.5,))
+    tmgr._tmgr_process.start()
+
+    assert tmgr.start_heartbeat()
+    sleep(1)
+    assert not tmgr.check_heartbeat()
+
+    os.environ['ENTK_HB_INTERVAL'] = '30'
+    del os.environ['ENTK_HB_TIMEOUT']
+
+
 def test_tmgr_base_check_heartbeat():
 
     sid = 'test.0000'
@@ -1,4 +1,6 @@
-from radical.entk.execman.rp.task_processor import create_task_from_cu, resolve_arguments, resolve_tags
+from radical.entk.execman.rp.task_processor import create_task_from_cu, resolve_arguments, resolve_tags, \
+    resolve_placeholders, PlaceholderIndex, SharedInputs, get_input_list_from_task, resume_units, \
+    create_task_from_unit_doc
 from radical.entk.exceptions import *
 from radical.entk import Task, Stage, Pipeline
 import radical.pilot as rp
@@ -99,3 +101,114 @@ def test_resolve_tags():
         resolve_tags(   tag='t3',
                         parent_pipeline_name=pipeline_name,
                         placeholder_dict=placeholder_dict) == 'unit.0002'
+
+
+def test_placeholder_index():
+
+    placeholder_dict = PlaceholderIndex()
+
+    for pipeline_name, task_name, rts_uid in [('p1', 't1', 'unit.0000'),
+                                              ('p2', 't1', 'unit.0001'),
+                                              ('p2', 't2', 'unit.0002')]:
+        t = Task()
+        t.name = task_name
+        t.path = '/home/vivek/%s' % rts_uid
+        t.parent_stage = {'uid': 'stage.0000', 'name': 's1'}
+        t.parent_pipeline = {'uid': 'pipeline.0000', 'name': pipeline_name}
+        placeholder_dict.add(t, rts_uid)
+
+    # Task without a name cannot be referenced
+    placeholder_dict.add(Task(), 'unit.0003')
+
+    assert placeholder_dict['p2']['s1']['t2'] == {'path': '/home/vivek/unit.0002', 'rts_uid': 'unit.0002'}
+
+    # Tags of the own pipeline are preferred
+    assert resolve_tags(tag='t1', parent_pipeline_name='p1', placeholder_dict=placeholder_dict) == 'unit.0000'
+    assert resolve_tags(tag='t1', parent_pipeline_name='p2', placeholder_dict=placeholder_dict) == 'unit.0001'
+    assert resolve_tags(tag='t2', parent_pipeline_name='p1', placeholder_dict=placeholder_dict) == 'unit.0002'
+
+    with pytest.raises(EnTKError):
+        resolve_tags(tag='t3', parent_pipeline_name='p1', placeholder_dict=placeholder_dict)
+
+    assert resolve_placeholders('$Pipeline_p2_Stage_s1_Task_t2/out.txt > in.txt',
+                                placeholder_dict) == '/home/vivek/unit.0002/out.txt > in.txt'
+    assert resolve_arguments(['$Pipeline_p1_Stage_s1_Task_t1/out.txt'],
+                             placeholder_dict) == ['/home/vivek/unit.0000/out.txt']
+
+    # Existing dictionaries are indexed as well
+    placeholder_dict = PlaceholderIndex({'p1': {'s1': {'t1': {'path': '/home/vivek/t1', 'rts_uid': 'unit.0002'}}}})
+    assert resolve_tags(tag='t1', parent_pipeline_name='p2', placeholder_dict=placeholder_dict) == 'unit.0002'
+
+
+def test_shared_inputs():
+
+    tasks = list()
+    for _ in range(3):
+        t = Task()
+        t.upload_input_data = ['/home/vivek/input.dat', '/home/vivek/other.dat > b.dat', '$SHARED/x.dat']
+        tasks.append(t.to_dict())
+
+    shared_inputs = SharedInputs(threshold=2)
+
+    assert shared_inputs.update(tasks[:2]) == []
+    directives = shared_inputs.update(tasks[2:])
+    assert [d['source'] for d in directives] == ['/home/vivek/input.dat', '/home/vivek/other.dat']
+    assert directives[0]['target'].startswith('pilot:///')
+    assert directives[0]['target'].endswith('.input.dat')
+
+    # Files are only shared once they were staged
+    assert shared_inputs.staged == {}
+    shared_inputs.commit(directives)
+    assert shared_inputs.update(tasks) == []
+
+    t = Task()
+    t.upload_input_data = ['/home/vivek/input.dat', '/home/vivek/other.dat > b.dat', '/home/vivek/own.dat']
+    ip_list = get_input_list_from_task(t, dict(), shared_inputs.staged)
+
+    assert ip_list[0] == {'source': directives[0]['target'], 'target': 'input.dat', 'action': rp.LINK}
+    assert ip_list[1] == {'source': directives[1]['target'], 'target': 'b.dat', 'action': rp.LINK}
+    assert ip_list[2] == {'source': '/home/vivek/own.dat', 'target': 'own.dat'}
+
+    assert SharedInputs(threshold=0).update(tasks * 10) == []
+
+
+def test_resume_units():
+
+    in_flight = dict()
+    docs = dict()
+
+    for i, (state, download) in enumerate([(rp.AGENT_EXECUTING, False),
+                                           (rp.DONE, False),
+                                           (rp.FAILED, False),
+                                           (None, False),
+                                           (rp.UMGR_SCHEDULING, False),
+                                           (rp.UMGR_STAGING_OUTPUT_PENDING, False),
+                                           (rp.UMGR_STAGING_OUTPUT_PENDING, True)]):
+
+        t = Task()
+        t.uid = 'task.%04d' % i
+        if download:
+            t.download_output_data = ['out.dat']
+
+        in_flight[t.uid] = {'task': t.to_dict(), 'unit': 'unit.%04d' % i}
+
+        # Units which are not in the database are missing
+        if state:
+            docs['unit.%04d' % i] = {'uid': 'unit.%04d' % i, 'name': '%s,t,s,s,p,p' % t.uid, 'state': state,
+                                     'target_state': rp.DONE, 'unit_sandbox': 'file://localhost/tmp/unit.%04d/' % i}
+
+    completed, resubmit, live = resume_units(in_flight, docs)
+
+    # The live unit is polled instead of being resubmitted
+    assert live.keys() == ['task.0000']
+    assert sorted([doc['uid'] for doc in completed]) == ['unit.0001', 'unit.0005']
+    assert sorted([t['uid'] for t in resubmit]) == ['task.0002', 'task.0003', 'task.0004', 'task.0006']
+
+    t = create_task_from_unit_doc([doc for doc in completed if doc['uid'] == 'unit.0005'][0])
+    assert t.uid == 'task.0005'
+    assert t.rts_uid == 'unit.0005'
+    assert t.exit_code == 0
+    assert t.path == '/tmp/unit.0005/'
+
+    # The document read from the database is not changed
+    assert docs['unit.0005']['state'] == rp.UMGR_STAGING_OUTPUT_PENDING
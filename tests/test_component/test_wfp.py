@@ -78,6 +78,75 @@ def test_wfp_initialize_workflow():
         assert t.uid is not None
 
 
+def test_wfp_retry_policy():
+
+    t = Task()
+    s = Stage()
+    s.add_tasks(t)
+
+    wfp = WFprocessor(sid='rp.session.local.0000',
+                      workflow=set(),
+                      pending_queue=['pending'],
+                      completed_queue=['completed'],
+                      mq_hostname=hostname,
+                      port=port,
+                      resubmit_failed=False)
+
+    assert wfp._retry_policy(t, s) == None
+
+    wfp._resubmit_failed = True
+    assert wfp._retry_policy(t, s)['max_attempts'] == None
+
+    s.retry = {'max_attempts': 2}
+    assert wfp._retry_policy(t, s) == s.retry
+
+    t.retry = {'max_attempts': 5}
+    assert wfp._retry_policy(t, s) == t.retry
+
+
+def test_wfp_assign_new_uids():
+
+    p = Pipeline()
+    for _ in range(2):
+        s = Stage()
+        t = Task()
+        t.executable = ['/bin/date']
+        s.add_tasks(t)
+        p.add_stages(s)
+
+    wfp = WFprocessor(sid='test.wfp',
+                      workflow=[p],
+                      pending_queue=list(),
+                      completed_queue=list(),
+                      mq_hostname=hostname,
+                      port=port,
+                      resubmit_failed=False)
+
+    wfp._initialize_workflow()
+
+    # Added at runtime, while the first stage is current
+    s = Stage()
+    s.add_tasks([Task(), Task()])
+    p.add_stages(s)
+    p.stages[1].add_tasks(Task())
+    p.stages[0].add_tasks(Task())
+
+    new_stages, new_tasks = wfp._assign_new_uids(p)
+
+    assert new_stages == [s]
+    assert s.uid and s.parent_pipeline['uid'] == p.uid
+    assert set([t.parent_stage['uid'] for t in s.tasks]) == set([s.uid])
+
+    assert len(new_tasks) == 1
+    assert new_tasks[0].uid
+    assert new_tasks[0].parent_stage['uid'] == p.stages[1].uid
+
+    # Tasks of the finished stage are not considered
+    assert [t for t in p.stages[0].tasks if not t.uid]
+
+    assert wfp._assign_new_uids(p) == ([], [])
+
+
 def func_for_enqueue_test(wfp):
 
     wfp._enqueue_thread_terminate = Event()
@@ -148,6 +217,39 @@ def test_wfp_enqueue():
     assert p.state == states.SCHEDULING
 
 
+def test_wfp_enqueue_collapsed():
+
+    p = Pipeline()
+    s = Stage()
+    t = Task()
+    t.executable = ['/bin/date']
+    s.add_tasks(t)
+    p.add_stages(s)
+
+    amgr = Amgr(hostname=hostname, port=port)
+    amgr._setup_mqs()
+
+    wfp = WFprocessor(sid=amgr._sid,
+                      workflow=[p],
+                      pending_queue=amgr._pending_queue,
+                      completed_queue=amgr._completed_queue,
+                      mq_hostname=amgr._mq_hostname,
+                      port=amgr._port,
+                      resubmit_failed=False,
+                      collapsed=True)
+
+    wfp._initialize_workflow()
+
+    # The threads change the workflow in this process, without a synchronizer
+    func_for_enqueue_test(wfp)
+
+    for t in p.stages[0].tasks:
+        assert t.state == states.SCHEDULED
+
+    assert p.stages[0].state == states.SCHEDULED
+    assert p.state == states.SCHEDULING
+
+
 def func_for_dequeue_test(wfp):
 
     wfp._dequeue_thread_terminate = Event()
@@ -371,3 +473,19 @@ def test_wfp_check_processor():
 
     wfp.terminate_processor()
     assert not wfp.check_processor()
+
+    wfp = WFprocessor(sid=amgr._sid,
+                      workflow=[p],
+                      pending_queue=amgr._pending_queue,
+                      completed_queue=amgr._completed_queue,
+                      mq_hostname=amgr._mq_hostname,
+                      port=amgr._port,
+                      resubmit_failed=False,
+                      collapsed=True)
+
+    wfp.start_processor()
+    assert isinstance(wfp._wfp_process, Thread)
+    assert wfp.check_processor()
+
+    wfp.terminate_processor()
+    assert not wfp.check_processor()
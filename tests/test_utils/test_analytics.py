@@ -0,0 +1,107 @@
+import pytest
+
+# numpy is an optional dependency of EnTK
+np = pytest.importorskip('numpy')
+
+from radical.entk.utils.analytics import *
+from radical.entk import states
+import os
+import shutil
+import tempfile
+
+sid = 're.session.vivek-HP-Pavilion-m6-Notebook-PC.vivek.017732.0002'
+
+
+def get_events():
+
+    curdir = os.path.dirname(os.path.abspath(__file__))
+    src = '%s/sample_data/profiler' % curdir
+    dst = tempfile.mkdtemp()
+
+    try:
+        shutil.copytree('%s/%s' % (src, sid), '%s/%s' % (dst, sid))
+        return load_state_events(sid=sid, src=dst)
+    finally:
+        shutil.rmtree(dst)
+
+
+def test_load_state_events():
+
+    events = get_events()
+
+    assert list(events.uids) == ['pipeline.0000', 'stage.0000', 'stage.0001', 'task.0000', 'task.0001']
+    assert list(events.etypes) == ['pipeline', 'stage', 'stage', 'task', 'task']
+    assert len(events) == 24
+
+    tasks = events.select('task')
+    assert len(tasks) == 16
+    assert set(tasks.entity) == set([3, 4])
+
+    # Sorted by entity and time
+    assert (np.diff(tasks.entity) >= 0).all()
+    for e in [3, 4]:
+        assert (np.diff(tasks.time[tasks.entity == e]) >= 0).all()
+
+    assert STATES[tasks.state[0]] == states.SCHEDULING
+    assert STATES[tasks.state[7]] == states.DONE
+
+
+def test_get_durations():
+
+    tasks = get_events().select('task')
+
+    durations = get_durations(tasks, states.SUBMITTED, states.COMPLETED)
+    assert np.isnan(durations[0])
+    assert round(durations[3], 4) == round(1520525814.6189 - 1520525811.1142, 4)
+    assert round(durations[4], 4) == round(1520525820.2495 - 1520525814.8556, 4)
+
+    state_durations = get_state_durations(tasks)
+    assert state_durations[states.SUBMITTED]['count'] == 2
+    assert round(state_durations[states.SUBMITTED]['total'], 4) == round(durations[3] + durations[4], 4)
+    assert states.DONE not in state_durations
+
+
+def test_get_throughput_concurrency():
+
+    events = get_events()
+    tasks = events.select('task')
+
+    times, rates = get_throughput(tasks, states.DONE, bin_size=1.0)
+    assert len(times) == len(rates)
+    assert rates.sum() == 2
+
+    samples, active = get_concurrency(tasks, states.SUBMITTED, states.COMPLETED, sampling=0.5)
+    assert active.max() == 1
+    assert active[0] == 0
+    assert active[-1] == 0
+
+    overheads = get_component_overheads(events)
+    assert set(overheads.keys()) == set(['radical.entk.wfprocessor.0000-proc',
+                                         'radical.entk.task_manager.0000-proc'])
+    assert overheads['radical.entk.task_manager.0000-proc']['count'] == 4
+
+
+def test_large_session():
+
+    # 100k tasks with 4 transitions each, in random order
+    ntasks = 100000
+    entity = np.repeat(np.arange(ntasks, dtype=np.int32), 4)
+    state = np.tile(np.array([STATE_CODES[s] for s in [states.SCHEDULING, states.SUBMITTED,
+                                                      states.COMPLETED, states.DONE]],
+                             dtype=np.int8), ntasks)
+    time = np.tile(np.arange(4, dtype=np.float64), ntasks) + entity
+    perm = np.random.permutation(len(entity))
+
+    events = StateEvents(uids=np.array(['task.%06d' % i for i in range(ntasks)]),
+                         etypes=np.array(['task'] * ntasks),
+                         comps=np.array(['comp']),
+                         entity=entity[perm],
+                         state=state[perm],
+                         time=time[perm],
+                         comp=np.zeros(len(entity), dtype=np.int16))
+
+    durations = get_durations(events, states.SUBMITTED, states.DONE)
+    assert (durations == 2).all()
+
+    samples, active = get_concurrency(events, states.SUBMITTED, states.COMPLETED, sampling=1.0)
+    assert active.max() == 1
@@ -0,0 +1,74 @@
+from radical.entk.utils.journal import Journal
+from radical.entk import Task
+import tempfile
+import shutil
+import os
+
+
+def create_tasks(n):
+
+    tasks = list()
+    for i in range(n):
+        t = Task()
+        t._uid = 'task.%04d' % i
+        tasks.append(t.to_dict())
+
+    return tasks
+
+
+def test_journal_recover():
+
+    path = tempfile.mkdtemp()
+    journal = Journal('%s/tmgr.journal' % path)
+
+    assert journal.recover() == ([], {})
+
+    tasks = create_tasks(4)
+    assert journal.consumed(tasks[:3]) == tasks[:3]
+    journal.submitted({'task.0000': 'unit.0000', 'task.0001': 'unit.0001'})
+    journal.completed(['task.0000'])
+
+    # Redelivered tasks which are in flight are dropped
+    assert journal.consumed(tasks[2:]) == [tasks[3]]
+    journal.close()
+
+    # Restarted tmgr
+    journal = Journal('%s/tmgr.journal' % path)
+    unsubmitted, submitted = journal.recover()
+
+    assert [t['uid'] for t in unsubmitted] == ['task.0002', 'task.0003']
+    assert submitted.keys() == ['task.0001']
+    assert submitted['task.0001']['unit'] == 'unit.0001'
+    assert submitted['task.0001']['task'] == tasks[1]
+
+    # The journal was compacted to the tasks in flight
+    with open(journal.path) as f:
+        assert len(f.readlines()) == 2
+
+    # Completed tasks can be resubmitted
+    journal.completed(['task.0001', 'task.0002', 'task.0003'])
+    assert journal.consumed(tasks[1:2]) == tasks[1:2]
+    journal.close()
+
+    shutil.rmtree(path)
+
+
+def test_journal_partial_line():
+
+    path = tempfile.mkdtemp()
+    journal = Journal('%s/tmgr.journal' % path)
+    journal.consumed(create_tasks(2))
+    journal.close()
+
+    with open('%s/tmgr.journal' % path, 'a') as f:
+        f.write('{"op": "completed", "uids": ["task.00')
+
+    journal = Journal('%s/tmgr.journal' % path)
+    unsubmitted, submitted = journal.recover()
+
+    assert len(unsubmitted) == 2
+    assert not submitted
+    assert not os.path.exists('%s/tmgr.journal.tmp' % path)
+
+    journal.close()
+    shutil.rmtree(path)
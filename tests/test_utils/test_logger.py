@@ -0,0 +1,91 @@
+from radical.entk.utils.logger import get_logger, AsyncHandler, TaskFilter
+import logging
+import shutil
+import tempfile
+
+
+def read_log(path, name):
+
+    with open('%s/%s.log' % (path, name)) as f:
+        return f.read()
+
+
+def test_async_handler():
+
+    path = tempfile.mkdtemp()
+
+    try:
+        name = 'radical.entk.test_async'
+        logger = get_logger(name, path=path, targets=['.'], level='DEBUG', background=True)
+
+        handlers = logging.getLogger(name).handlers
+        assert len(handlers) == 1
+        assert isinstance(handlers[0], AsyncHandler)
+
+        # Handlers are only wrapped once
+        get_logger(name, path=path, targets=['.'], level='DEBUG', background=True)
+        assert len(logging.getLogger(name).handlers) == 1
+
+        args = ['task.0000']
+        logger.debug('Task %s in state %s', args, 'SCHEDULING')
+        args.append('task.0001')
+
+        try:
+            raise ValueError('test error')
+        except ValueError:
+            logger.exception('Error in thread')
+
+        handlers[0].flush()
+        log = read_log(path, name)
+
+        assert "Task ['task.0000'] in state SCHEDULING" in log
+        assert 'Error in thread' in log
+        assert 'ValueError: test error' in log
+
+        logger.close()
+
+    finally:
+        shutil.rmtree(path)
+
+
+def test_task_filter():
+
+    path = tempfile.mkdtemp()
+
+    try:
+        name = 'radical.entk.test_filter'
+        logger = get_logger(name, path=path, targets=['.'], level='DEBUG', background=False,
+                            task_sampling=10)
+
+        filters = logging.getLogger(name).filters
+        assert len(filters) == 1
+        assert isinstance(filters[0], TaskFilter)
+
+        for i in range(100):
+            logger.info('Task task.%04d in state DONE' % i)
+        logger.info('Workflow completed')
+        logger.warning('Task task.0001 failed')
+
+        log = read_log(path, name)
+        assert log.count('in state DONE') == 10
+        assert 'task.0010 in state DONE' in log
+        assert 'task.0011 in state DONE' not in log
+        assert 'Workflow completed' in log
+        assert 'Task task.0001 failed' in log
+
+        logger.close()
+
+    finally:
+        shutil.rmtree(path)
+
+
+def test_task_filter_rate():
+
+    record = logging.LogRecord('radical.entk.test', logging.INFO, __file__, 0,
+                               'Task task.0000 in state DONE', None, None)
+
+    task_filter = TaskFilter(rate=5)
+    assert sum([task_filter.filter(record) for _ in range(100)]) in [5, 10]
+
+    record.levelno = logging.ERROR
+    assert all([task_filter.filter(record) for _ in range(100)])
@@ -0,0 +1,79 @@
+from radical.entk.utils.metrics import Registry, get_registry, read_metrics, SIZE_BUCKETS
+import multiprocessing
+import shutil
+import tempfile
+import os
+
+
+def test_registry():
+
+    registry = Registry(name='wfprocessor.0000')
+
+    counter = registry.counter('entk_tasks_total', 'Number of tasks', labels={'state': 'DONE'})
+    counter.inc()
+    counter.inc(2)
+    assert registry.counter('entk_tasks_total', labels={'state': 'DONE'}) is counter
+    assert counter.value == 3
+
+    gauge = registry.gauge('entk_queue_depth', labels={'queue': 'pendingq-1'})
+    gauge.set(10)
+    gauge.dec()
+    assert gauge.value == 9
+
+    histogram = registry.histogram('entk_batch_size', buckets=SIZE_BUCKETS)
+    for value in [1, 3, 3, 20000]:
+        histogram.observe(value)
+    assert histogram.count == 4
+    assert histogram.sum == 20007
+
+    snapshot = registry.snapshot()
+    assert snapshot['entk_tasks_total{component="wfprocessor.0000",state="DONE"}'] == 3
+    assert snapshot['entk_queue_depth{component="wfprocessor.0000",queue="pendingq-1"}'] == 9
+    assert snapshot['entk_batch_size_bucket{component="wfprocessor.0000",le="1"}'] == 1
+    assert snapshot['entk_batch_size_bucket{component="wfprocessor.0000",le="5"}'] == 3
+    assert snapshot['entk_batch_size_bucket{component="wfprocessor.0000",le="10000"}'] == 3
+    assert snapshot['entk_batch_size_bucket{component="wfprocessor.0000",le="+Inf"}'] == 4
+    assert snapshot['entk_batch_size_count{component="wfprocessor.0000"}'] == 4
+
+    text = registry.to_prometheus()
+    assert '# HELP entk_tasks_total Number of tasks' in text
+    assert '# TYPE entk_tasks_total counter' in text
+    assert '# TYPE entk_batch_size histogram' in text
+
+
+def test_export():
+
+    path = tempfile.mkdtemp()
+
+    try:
+        registry = Registry()
+        registry.counter('entk_tasks_total').inc(5)
+        registry.start_exporter(path='%s/radical.entk.tmgr.prom' % path, name='tmgr', interval=0.1)
+        registry.counter('entk_tasks_total').inc(5)
+        registry.stop_exporter()
+
+        assert read_metrics('%s/radical.entk.tmgr.prom' % path) == registry.snapshot()
+        assert registry.snapshot() == {'entk_tasks_total{component="tmgr"}': 10}
+
+    finally:
+        shutil.rmtree(path)
+
+
+def _child(queue):
+
+    queue.put(len(get_registry().snapshot()))
+
+
+def test_get_registry():
+
+    get_registry().counter('entk_test_total').inc()
+    assert get_registry() is get_registry()
+
+    # A forked process starts with an empty registry
+    queue = multiprocessing.Queue()
+    proc = multiprocessing.Process(target=_child, args=(queue,))
+    proc.start()
+    proc.join()
+
+    assert queue.get() == 0
+    assert get_registry().counter('entk_test_total').value == 1
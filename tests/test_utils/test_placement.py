@@ -0,0 +1,82 @@
+from radical.entk import Task
+from radical.entk.utils.placement import Placement
+from radical.entk.exceptions import *
+import pytest
+
+
+def test_placement_validation():
+
+    with pytest.raises(ValueError):
+        Placement('random', [{'cpus': 1}])
+
+    with pytest.raises(MissingError):
+        Placement('round_robin', [])
+
+
+def test_placement_round_robin():
+
+    placement = Placement('round_robin', [{'cpus': 4}, {'cpus': 4}, {'cpus': 4}])
+
+    assert [placement.place(Task()) for _ in range(5)] == [0, 1, 2, 0, 1]
+    assert placement.load == [2, 2, 1]
+
+    placement.release(0)
+    placement.release(None)
+    assert placement.load == [1, 2, 1]
+
+
+def test_placement_least_loaded():
+
+    placement = Placement('least_loaded', [{'cpus': 4}, {'cpus': 2}])
+
+    # Load is relative to the size of the pilots
+    assert [placement.place(Task()) for _ in range(6)] == [0, 1, 0, 0, 1, 0]
+    assert placement.load == [4, 2]
+
+    placement.release(1)
+    placement.release(1)
+    assert placement.place(Task()) == 1
+
+
+def test_placement_resource():
+
+    placement = Placement('resource', [{'cpus': 4}, {'cpus': 16, 'gpus': 2}])
+
+    t = Task()
+    t.cpu_reqs = {'processes': 8, 'process_type': None, 'threads_per_process': 1, 'thread_type': None}
+    assert placement.place(t) == 1
+
+    t = Task()
+    t.gpu_reqs = {'processes': 1, 'process_type': None, 'threads_per_process': 1, 'thread_type': None}
+    assert placement.place(t) == 1
+
+    # Small tasks go to the least loaded pilot
+    assert placement.place(Task()) == 0
+
+    # Tasks larger than all pilots go to the largest one
+    t = Task()
+    t.cpu_reqs = {'processes': 64, 'process_type': None, 'threads_per_process': 1, 'thread_type': None}
+    assert placement.place(t) == 1
+
+
+def test_placement_add_retire():
+
+    placement = Placement('round_robin', [{'cpus': 4}, {'cpus': 4}])
+
+    assert placement.add({'cpus': 8}) == 2
+    assert [placement.place(Task()) for _ in range(3)] == [0, 1, 2]
+
+    placement.retire(1)
+    assert [placement.place(Task()) for _ in range(3)] == [0, 2, 0]
+
+    placement.release(1)
+    assert placement.idle() == []
+
+    placement.release(2)
+    placement.release(2)
+    assert placement.idle() == [2]
+
+    placement.retire(0)
+    placement.retire(2)
+    with pytest.raises(EnTKError):
+        placement.place(Task())
@@ -0,0 +1,118 @@
+from radical.entk import Pipeline, Stage
+from radical.entk.utils.post_exec import PostExecPool
+from radical.entk.exceptions import *
+import threading
+import time
+import pytest
+
+
+def create_pipeline():
+
+    p = Pipeline()
+    p._assign_uid('test.post_exec')
+    for i in range(2):
+        s = Stage()
+        s._assign_uid('test.post_exec')
+        p.add_stages(s)
+
+    return p
+
+
+def set_post_exec(stage, on_true):
+
+    stage.post_exec = {'condition': lambda: True, 'on_true': on_true, 'on_false': lambda: None}
+
+
+def wait_for_results(pool, count, timeout=5):
+
+    results = list()
+    start = time.time()
+    while len(results) < count and time.time() - start < timeout:
+        results.extend(pool.results())
+        time.sleep(0.01)
+
+    return results
+
+
+def test_post_exec_order():
+
+    pool = PostExecPool(workers=4)
+    order = list()
+    release = threading.Event()
+
+    p1 = create_pipeline()
+    p2 = create_pipeline()
+
+    def block():
+        release.wait(5)
+        order.append('p1.s1')
+
+    set_post_exec(p1.stages[0], block)
+    set_post_exec(p1.stages[1], lambda: order.append('p1.s2'))
+    set_post_exec(p2.stages[0], lambda: order.append('p2.s1'))
+
+    pool.submit(p1, p1.stages[0])
+    pool.submit(p1, p1.stages[1])
+    pool.submit(p2, p2.stages[0])
+
+    # The callbacks of other pipelines are not held up
+    results = wait_for_results(pool, 1)
+    assert [(p.uid, s.uid, e) for p, s, e in results] == [(p2.uid, p2.stages[0].uid, None)]
+    assert pool.pending == 2
+
+    # The callbacks of one pipeline run in the order in which they were submitted
+    release.set()
+    results = wait_for_results(pool, 2)
+    assert [s.uid for _, s, _ in results] == [p1.stages[0].uid, p1.stages[1].uid]
+    assert order == ['p2.s1', 'p1.s1', 'p1.s2']
+    assert pool.pending == 0
+
+    pool.close()
+
+
+def test_post_exec_errors():
+
+    notified = threading.Event()
+    pool = PostExecPool(workers=1, timeout=0.2, notify=notified.set)
+    release = threading.Event()
+
+    p1 = create_pipeline()
+    p2 = create_pipeline()
+
+    def fail():
+        raise RuntimeError('failed')
+
+    set_post_exec(p1.stages[0], fail)
+    pool.submit(p1, p1.stages[0])
+
+    assert notified.wait(5)
+    assert pool.has_results
+    [(pipe, stage, error)] = pool.results()
+    assert isinstance(error, RuntimeError)
+    assert not pool.has_results
+
+    # A callback which times out is replaced by another thread
+    started = threading.Event()
+
+    def hang():
+        started.set()
+        release.wait(5)
+
+    set_post_exec(p1.stages[1], hang)
+    set_post_exec(p2.stages[0], lambda: None)
+    pool.submit(p1, p1.stages[1])
+    pool.submit(p2, p2.stages[0])
+
+    assert started.wait(5)
+    assert pool.next_deadline is not None
+    results = wait_for_results(pool, 2)
+    release.set()
+
+    errors = dict([(s.uid, e) for _, s, e in results])
+    assert isinstance(errors[p1.stages[1].uid], EnTKError)
+    assert errors[p2.stages[0].uid] is None
+
+    with pytest.raises(MissingError):
+        pool.submit(p2, p2.stages[1])
+
+    pool.close()
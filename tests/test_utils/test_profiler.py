@@ -0,0 +1,110 @@
+from radical.entk.utils.profiler import Profiler
+import radical.utils as ru
+import os
+import shutil
+import tempfile
+
+
+def read_events(path, name):
+
+    events = list()
+    with open('%s/%s.prof' % (path, name)) as f:
+        for line in f:
+            if not line.startswith('#'):
+                events.append(line.strip().split(','))
+
+    return events
+
+
+def test_profiler_format():
+
+    env = os.environ.get('RADICAL_ENTK_PROFILE')
+    os.environ['RADICAL_ENTK_PROFILE'] = 'True'
+    path = tempfile.mkdtemp()
+
+    try:
+        ref = ru.Profiler(name='radical.entk.ref', path=path)
+        prof = Profiler(name='radical.entk.buf', path=path, size=16)
+
+        # More events than fit into the buffer
+        for i in range(100):
+            for p in [ref, prof]:
+                p.prof('advance', uid='task.%04d' % i, state='SCHEDULING', timestamp=i)
+                p.prof('event', uid='task.%04d' % i, msg='msg', timestamp=i, tid='thread')
+
+        ref.close()
+        prof.close()
+
+        ref_events = read_events(path, 'radical.entk.ref')
+        buf_events = read_events(path, 'radical.entk.buf')
+
+        assert len(buf_events) == len(ref_events) == 202
+        assert buf_events[0][1] == 'sync_abs'
+        assert buf_events[-1][1] == 'END'
+
+        for r, b in zip(ref_events[1:-1], buf_events[1:-1]):
+            assert r[0] == b[0]
+            assert r[1] == b[1]
+            assert r[2].replace('ref', 'buf') == b[2]
+            assert r[4:] == b[4:]
+
+        assert buf_events[2][3] == 'thread'
+
+        profs = ru.read_profiles(['%s/radical.entk.buf.prof' % path])
+        profile = profs['%s/radical.entk.buf.prof' % path]
+        assert len([e for e in profile if e[ru.EVENT] == 'advance']) == 100
+
+    finally:
+        shutil.rmtree(path)
+        if env is None:
+            os.environ.pop('RADICAL_ENTK_PROFILE', None)
+        else:
+            os.environ['RADICAL_ENTK_PROFILE'] = env
+
+
+def test_profiler_sampling():
+
+    env = os.environ.get('RADICAL_ENTK_PROFILE')
+    os.environ['RADICAL_ENTK_PROFILE'] = 'True'
+    path = tempfile.mkdtemp()
+
+    try:
+        prof = Profiler(name='radical.entk.sampled', path=path, sampling=10)
+
+        for i in range(100):
+            prof.prof('advance', uid='task.%04d' % i, state='SCHEDULING')
+            prof.prof('event', uid='task.%04d' % i)
+
+        prof.flush()
+        events = read_events(path, 'radical.entk.sampled')
+        assert len([e for e in events if e[1] == 'advance']) == 100
+        assert len([e for e in events if e[1] == 'event']) == 10
+        assert len([e for e in events if e[1] == 'flush']) == 1
+
+        prof.close()
+
+    finally:
+        shutil.rmtree(path)
+        if env is None:
+            os.environ.pop('RADICAL_ENTK_PROFILE', None)
+        else:
+            os.environ['RADICAL_ENTK_PROFILE'] = env
+
+
+def test_profiler_disabled():
+
+    env = os.environ.pop('RADICAL_ENTK_PROFILE', None)
+    path = tempfile.mkdtemp()
+
+    try:
+        prof = Profiler(name='radical.entk.disabled', path=path)
+        prof.prof('event', uid='task.0000')
+        prof.close()
+
+        assert not prof.enabled
+        assert os.listdir(path) == []
+
+    finally:
+        shutil.rmtree(path)
+        if env is not None:
+            os.environ['RADICAL_ENTK_PROFILE'] = env
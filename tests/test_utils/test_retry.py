@@ -0,0 +1,37 @@
+from radical.entk.utils.retry import validate_policy, retry_delay, can_retry, TASK_POLICY, STAGE_POLICY
+from radical.entk.exceptions import *
+import pytest
+
+
+def test_validate_policy():
+
+    policy = validate_policy('task.0000', {'max_attempts': 3}, TASK_POLICY)
+    assert policy == dict(TASK_POLICY, max_attempts=3)
+
+    policy = validate_policy('stage.0000', {'max_failures': 1}, STAGE_POLICY)
+    assert policy['max_failures'] == 1
+
+    with pytest.raises(TypeError):
+        validate_policy('task.0000', 3, TASK_POLICY)
+
+    with pytest.raises(ValueError):
+        validate_policy('task.0000', {'max_failures': 1}, TASK_POLICY)
+
+    with pytest.raises(ValueError):
+        validate_policy('task.0000', {'max_attempts': 1.5}, TASK_POLICY)
+
+    with pytest.raises(ValueError):
+        validate_policy('task.0000', {'backoff_factor': 'x'}, TASK_POLICY)
+
+
+def test_retry_delay():
+
+    policy = validate_policy('task.0000', {'max_attempts': 5, 'backoff': 1, 'max_backoff': 5}, TASK_POLICY)
+
+    assert [retry_delay(policy, attempts) for attempts in range(1, 6)] == [1, 2, 4, 5, 5]
+    assert retry_delay(policy, 10000) == 5
+    assert retry_delay(TASK_POLICY, 3) == 0
+
+    assert can_retry(policy, 4)
+    assert not can_retry(policy, 5)
+    assert can_retry(dict(policy, max_attempts=None), 10000)
@@ -0,0 +1,62 @@
+from radical.entk.utils.scaling import validate_scaling, Scaler, GROW, SHRINK, SCALING_POLICY
+from radical.entk.exceptions import *
+import pytest
+
+
+def test_validate_scaling():
+
+    policy = validate_scaling({'max_pilots': 4})
+    assert policy == dict(SCALING_POLICY, max_pilots=4)
+
+    with pytest.raises(TypeError):
+        validate_scaling(4)
+
+    with pytest.raises(ValueError):
+        validate_scaling({'pilots': 4})
+
+    with pytest.raises(ValueError):
+        validate_scaling({'min_pilots': 2, 'max_pilots': 1})
+
+    with pytest.raises(ValueError):
+        validate_scaling({'backlog': -1})
+
+    with pytest.raises(ValueError):
+        validate_scaling({'grow_after': 'x'})
+
+    with pytest.raises(TypeError):
+        validate_scaling({'pilot': 32})
+
+
+def test_scaler_grow():
+
+    scaler = Scaler(validate_scaling({'max_pilots': 3, 'backlog': 10, 'grow_after': 60}))
+
+    assert scaler.decide(backlog=20, pilots=1, idle=0, now=0) is None
+    assert scaler.decide(backlog=20, pilots=1, idle=0, now=59) is None
+    assert scaler.decide(backlog=20, pilots=1, idle=0, now=60) == GROW
+
+    # The backlog has to persist for the next pilot
+    assert scaler.decide(backlog=20, pilots=2, idle=0, now=100) is None
+    assert scaler.decide(backlog=5, pilots=2, idle=0, now=110) is None
+    assert scaler.decide(backlog=20, pilots=2, idle=0, now=120) is None
+    assert scaler.decide(backlog=20, pilots=2, idle=0, now=180) == GROW
+
+    # Bounded by max_pilots
+    assert scaler.decide(backlog=20, pilots=3, idle=0, now=1000) is None
+
+
+def test_scaler_shrink():
+
+    scaler = Scaler(validate_scaling({'min_pilots': 1, 'max_pilots': 3, 'shrink_after': 300}))
+
+    assert scaler.decide(backlog=0, pilots=3, idle=2, now=0) is None
+    assert scaler.decide(backlog=0, pilots=3, idle=2, now=300) == SHRINK
+
+    # Tasks waiting reset the idle time
+    assert scaler.decide(backlog=0, pilots=2, idle=1, now=400) is None
+    assert scaler.decide(backlog=0, pilots=2, idle=0, now=500) is None
+    assert scaler.decide(backlog=0, pilots=2, idle=1, now=600) is None
+    assert scaler.decide(backlog=0, pilots=2, idle=1, now=900) == SHRINK
+
+    # Bounded by min_pilots
+    assert scaler.decide(backlog=0, pilots=1, idle=1, now=5000) is None
@@ -0,0 +1,121 @@
+from radical.entk import Task, Stage, Pipeline, states
+from radical.entk.utils.state_table import StateTable
+from radical.entk.utils.init_transition import transition
+from radical.entk.exceptions import *
+from multiprocessing import Process
+import radical.utils as ru
+import pytest
+
+
+def create_workflow():
+
+    p = Pipeline()
+    s = Stage()
+    for _ in range(2):
+        t = Task()
+        t.executable = ['/bin/date']
+        s.add_tasks(t)
+    p.add_stages(s)
+    p._assign_uid('test.state_table')
+
+    return [p]
+
+
+def test_state_table_shared():
+
+    workflow = create_workflow()
+    table = StateTable(workflow)
+    pipe = workflow[0]
+    stage = pipe.stages[0]
+    task = list(stage.tasks)[0]
+
+    assert table.size == 4
+    assert task.uid in table
+    assert table.get(task.uid)[:3] == (states.INITIAL, None, 0)
+
+    def writer():
+
+        task._attempts = 1
+        task.state = states.SCHEDULING
+        table.update(task)
+        stage.state = states.SCHEDULING
+        table.update(stage)
+        task.exit_code = 1
+        task.state = states.FAILED
+        table.update(task)
+
+    # Updates of a forked process are seen by the parent
+    proc = Process(target=writer)
+    proc.start()
+    proc.join()
+
+    changes = [(obj.uid, state, exit_code, attempts) for obj, state, exit_code, attempts, _ in table.changes()]
+    assert changes == [(task.uid, states.SCHEDULING, 1, 1),
+                       (stage.uid, states.SCHEDULING, None, 0),
+                       (task.uid, states.FAILED, 1, 1)]
+
+    assert table.get(task.uid)[:3] == (states.FAILED, 1, 1)
+    assert table.changes() == []
+
+    table.close()
+
+
+def test_state_table_overflow():
+
+    workflow = create_workflow()
+    table = StateTable(workflow, log_size=2)
+    tasks = list(workflow[0].stages[0].tasks)
+
+    for state in [states.SCHEDULING, states.SCHEDULED, states.SUBMITTING]:
+        for task in tasks:
+            task.state = state
+            table.update(task)
+
+    # Only the latest state of each object is left
+    changes = sorted([(obj.uid, state) for obj, state, _, _, _ in table.changes()])
+    assert changes == sorted([(task.uid, states.SUBMITTING) for task in tasks])
+
+    table.close()
+
+
+def test_state_table_unknown():
+
+    table = StateTable(create_workflow())
+
+    stage = Stage()
+    stage._assign_uid('test.state_table')
+
+    assert stage.uid not in table
+    assert not table.update(stage)
+
+    with pytest.raises(MissingError):
+        table.get(stage.uid)
+
+    with pytest.raises(MissingError):
+        StateTable([Pipeline()])
+
+    table.close()
+
+
+def test_state_table_transition():
+
+    workflow = create_workflow()
+    table = StateTable(workflow)
+    task = list(workflow[0].stages[0].tasks)[0]
+
+    logger = ru.Logger('radical.entk.test')
+    profiler = ru.Profiler('radical.entk.test')
+
+    # Objects known to the table are not synchronized by messages
+    transition(obj=task,
+               obj_type='Task',
+               new_state=states.SCHEDULING,
+               channel=None,
+               queue='test-1-2-3',
+               profiler=profiler,
+               logger=logger,
+               state_table=table)
+
+    assert table.get(task.uid)[0] == states.SCHEDULING
+
+    table.close()